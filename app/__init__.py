@@ -7,6 +7,7 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import config, Config
 
 # Инициализация расширений
@@ -25,6 +26,10 @@ def create_app(config_name='development'):
     else:
         app.config.from_object(config_name)
 
+    # Адрес клиента из X-Forwarded-For прокси Render (для лимитов по IP)
+    if app.config.get('PROXY_FIX_X_FOR'):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
     # Инициализация расширений
     db.init_app(app)
     login_manager.init_app(app)
@@ -49,9 +54,22 @@ def create_app(config_name='development'):
     # Исключаем API из CSRF проверки (для AJAX запросов чатбота)
     csrf.exempt(api_bp)
 
-    # Создание таблиц
+    # Создание таблиц и новых колонок
     with app.app_context():
+        from app.models.schema import upgrade_schema
+        from app.services.blog_search import ensure_search_index
         db.create_all()
+        upgrade_schema(db)
+        ensure_search_index(db)
+
+    # Статика с отпечатками из `flask build-assets` (если сборка есть)
+    from app.services.assets import init_assets
+    init_assets(app)
+
+    # Готовые HTML-файлы из `flask prerender` (если есть) отдаются без рендеринга
+    if app.config.get('PRERENDER_SERVE'):
+        from app.services.prerender import PrerenderMiddleware
+        app.wsgi_app = PrerenderMiddleware(app.wsgi_app, app)
 
     # Контекстные процессоры
     @app.context_processor
@@ -3,15 +3,19 @@
 """
 
 from app.models.page import Page
-from app.models.blog import BlogPost, ContentPlan
-from app.models.chatbot import ChatbotInstruction, ChatSession
+from app.models.blog import BlogPost, ContentPlan, RelatedPost
+from app.models.chatbot import ChatbotInstruction, ChatSession, ChatMessage
 from app.models.user import Admin
+from app.models.mail import OutboxMail
 
 __all__ = [
     'Page',
     'BlogPost', 
     'ContentPlan',
+    'RelatedPost',
     'ChatbotInstruction',
     'ChatSession',
-    'Admin'
+    'ChatMessage',
+    'Admin',
+    'OutboxMail'
 ]
@@ -3,6 +3,7 @@
 """
 
 from datetime import datetime
+from sqlalchemy.orm import load_only
 from app import db
 
 
@@ -10,12 +11,25 @@ class BlogPost(db.Model):
     """Статьи блога."""
     
     __tablename__ = 'blog_posts'
+    __table_args__ = (
+        # Списки блога: фильтр по публикации (и категории), keyset по (published_at, id)
+        db.Index('ix_blog_posts_published', 'is_published', 'published_at', 'id'),
+        db.Index('ix_blog_posts_category_published', 'is_published', 'category', 'published_at', 'id'),
+    )
+    
+    # Категории в навигации блога
+    CATEGORIES = ['Trends', 'Tipps', 'Projekte', 'News']
     
     id = db.Column(db.Integer, primary_key=True)
     slug = db.Column(db.String(255), unique=True, nullable=False, index=True)
     title = db.Column(db.String(255), nullable=False)
     excerpt = db.Column(db.String(500))  # Краткое описание
-    content = db.Column(db.Text, nullable=False)
+    content = db.Column(db.Text, nullable=False)  # Markdown
+    
+    # Готовый HTML и оглавление (считаются при сохранении, см. render_content)
+    content_html = db.Column(db.Text)
+    toc = db.Column(db.JSON)  # [{"id": "...", "name": "...", "level": 2}]
+    reading_time = db.Column(db.Integer)  # минуты
     
     # Медиа
     featured_image = db.Column(db.String(500))
@@ -46,8 +60,16 @@ class BlogPost(db.Model):
         self.is_published = True
         self.published_at = datetime.utcnow()
     
+    def render_content(self):
+        """Пересчитывает content_html, оглавление и время чтения из content."""
+        from app.services.content_renderer import render_content
+        rendered = render_content(self.content)
+        self.content_html = rendered['html']
+        self.toc = rendered['toc']
+        self.reading_time = rendered['reading_time']
+    
     def increment_views(self):
-        """Увеличивает счётчик просмотров."""
+        """Увеличивает счётчик просмотров (в запросах - services.view_counter)."""
         self.views_count += 1
     
     @staticmethod
@@ -61,6 +83,96 @@ class BlogPost(db.Model):
         """Возвращает статьи по категории."""
         return BlogPost.query.filter_by(is_published=True, category=category)\
             .order_by(BlogPost.published_at.desc())
+    
+    # ============ Списки без тела статьи ============
+    # content / content_html весят килобайты, а спискам нужны заголовок,
+    # анонс и даты - остальные колонки загружаются только по обращению
+    
+    @staticmethod
+    def card_columns():
+        """Колонки карточки статьи (блог, главная, похожие статьи)."""
+        return load_only(
+            BlogPost.id, BlogPost.slug, BlogPost.title, BlogPost.excerpt,
+            BlogPost.featured_image, BlogPost.category,
+            BlogPost.published_at, BlogPost.created_at, BlogPost.updated_at
+        )
+    
+    @staticmethod
+    def listing_query(category=None):
+        """Опубликованные статьи (без сортировки - её задаёт пагинация) для карточек."""
+        query = BlogPost.query.filter_by(is_published=True)
+        if category is not None:
+            query = query.filter_by(category=category)
+        return query.options(BlogPost.card_columns())
+    
+    @staticmethod
+    def get_latest(limit=3):
+        """Последние опубликованные статьи для главной."""
+        return BlogPost.query.filter_by(is_published=True)\
+            .options(BlogPost.card_columns())\
+            .order_by(BlogPost.created_at.desc()).limit(limit).all()
+    
+    @staticmethod
+    def get_admin_list():
+        """Все статьи для списка в админке."""
+        return BlogPost.query.options(load_only(
+            BlogPost.id, BlogPost.slug, BlogPost.title, BlogPost.category,
+            BlogPost.is_published, BlogPost.is_auto_generated, BlogPost.created_at
+        )).order_by(BlogPost.created_at.desc()).all()
+    
+    @staticmethod
+    def get_sitemap_entries():
+        """Кортежи (slug, lastmod) опубликованных статей для sitemap.xml."""
+        rows = db.session.query(
+            BlogPost.slug, BlogPost.updated_at, BlogPost.published_at, BlogPost.created_at
+        ).filter(BlogPost.is_published == True)\
+            .order_by(BlogPost.published_at.desc()).all()
+        return [(r.slug, r.updated_at or r.published_at or r.created_at) for r in rows]
+    
+    @staticmethod
+    def listing_state(category=None):
+        """
+        Состояние списка опубликованных статей для ETag/Last-Modified.
+        
+        Returns:
+            (количество, время последнего изменения или None)
+        """
+        query = db.session.query(
+            db.func.count(BlogPost.id),
+            db.func.max(BlogPost.updated_at),
+            db.func.max(BlogPost.published_at)
+        ).filter(BlogPost.is_published == True)
+        if category is not None:
+            query = query.filter(BlogPost.category == category)
+        count, updated, published = query.one()
+        return count, max(filter(None, (updated, published)), default=None)
+    
+    def get_related(self, limit=3):
+        """Похожие опубликованные статьи из таблицы blog_related_posts."""
+        return BlogPost.query.join(RelatedPost, RelatedPost.related_id == BlogPost.id)\
+            .filter(RelatedPost.post_id == self.id, BlogPost.is_published == True)\
+            .options(BlogPost.card_columns())\
+            .order_by(RelatedPost.rank).limit(limit).all()
+    
+    def last_modified(self):
+        """Время последнего изменения статьи."""
+        return max(filter(None, (self.updated_at, self.published_at)), default=None)
+
+
+class RelatedPost(db.Model):
+    """Заранее посчитанные похожие статьи (services/related_posts)."""
+    
+    __tablename__ = 'blog_related_posts'
+    
+    post_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)  # 0 = самая похожая
+    related_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id', ondelete='CASCADE'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+    
+    related = db.relationship('BlogPost', foreign_keys=[related_id])
+    
+    def __repr__(self):
+        return f'<RelatedPost {self.post_id} -> {self.related_id}>'
 
 
 class ContentPlan(db.Model):
@@ -66,44 +66,91 @@ class ChatSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(255), unique=True, nullable=False, index=True)
     
-    # История сообщений
+    # Устаревшая история сообщений (JSON), новые сообщения - в chat_messages
     messages = db.Column(db.JSON)  # [{"role": "user/assistant", "content": "..."}]
     
+    chat_messages = db.relationship(
+        'ChatMessage',
+        backref='chat_session',
+        lazy='dynamic',
+        cascade='all, delete-orphan',
+        order_by='ChatMessage.id'
+    )
+    
     # Контактные данные (если пользователь оставил)
     user_name = db.Column(db.String(255))
     user_email = db.Column(db.String(255))
     user_phone = db.Column(db.String(50))
     
+    # Свёрнутая история: краткое содержание сообщений до summary_until_id
+    summary = db.Column(db.Text)
+    summary_until_id = db.Column(db.Integer)
+    
     # Аналитика
     page_url = db.Column(db.String(500))  # На какой странице начат чат
-    is_lead = db.Column(db.Boolean, default=False)  # Оставил контакты?
+    is_lead = db.Column(db.Boolean, default=False, index=True)  # Оставил контакты?
     
     # Мета
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
         return f'<ChatSession {self.session_id}>'
     
     def add_message(self, role, content):
-        """Добавляет сообщение в историю."""
-        if self.messages is None:
-            self.messages = []
+        """Добавляет сообщение в историю (одна вставка, без перезаписи JSON)."""
+        message = ChatMessage(role=role, content=content)
+        self.chat_messages.append(message)
+        return message
+    
+    def _legacy_messages(self):
+        """Сообщения из старого JSON-поля (до миграции)."""
+        result = []
+        for m in self.messages or []:
+            timestamp = m.get('timestamp')
+            result.append(ChatMessage(
+                role=m['role'],
+                content=m['content'],
+                created_at=datetime.fromisoformat(timestamp) if timestamp else None
+            ))
+        return result
+    
+    def get_messages(self, limit=None, after_id=None):
+        """
+        Возвращает сообщения в хронологическом порядке.
+        
+        Args:
+            limit: Вернуть только последние N сообщений
+            after_id: Только сообщения с id больше указанного
+                (старые JSON-сообщения при этом не возвращаются)
+        """
+        # Новая сессия: записываем её, чтобы получить id
+        if self.id is None and self in db.session:
+            db.session.flush()
+        
+        messages = []
+        if self.id is not None:
+            query = ChatMessage.query.filter_by(session_id=self.id)\
+                .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            if after_id is not None:
+                query = query.filter(ChatMessage.id > after_id)
+            if limit:
+                query = query.limit(limit)
+            messages = list(reversed(query.all()))
         
-        # Создаём новый список чтобы SQLAlchemy увидел изменение
-        new_messages = list(self.messages)
-        new_messages.append({
-            'role': role,
-            'content': content,
-            'timestamp': datetime.utcnow().isoformat()
-        })
-        self.messages = new_messages
-    
-    def get_messages_for_api(self):
+        if self.messages and after_id is None and (not limit or len(messages) < limit):
+            messages = self._legacy_messages() + messages
+            if limit:
+                messages = messages[-limit:]
+        return messages
+    
+    def get_messages_for_api(self, limit=None):
         """Форматирует сообщения для OpenAI API."""
-        if not self.messages:
-            return []
-        return [{'role': m['role'], 'content': m['content']} for m in self.messages]
+        return [{'role': m.role, 'content': m.content} for m in self.get_messages(limit)]
+    
+    def message_count(self):
+        """Количество сообщений в сессии."""
+        return self.chat_messages.count() + len(self.messages or [])
     
     def mark_as_lead(self, name=None, email=None, phone=None):
         """Отмечает сессию как лид."""
@@ -114,3 +161,52 @@ class ChatSession(db.Model):
             self.user_email = email
         if phone:
             self.user_phone = phone
+    
+    @staticmethod
+    def migrate_legacy_messages(batch_size=200):
+        """
+        Переносит сообщения из JSON-поля messages в таблицу chat_messages.
+        
+        Returns:
+            int: Количество перенесённых сообщений
+        """
+        migrated = 0
+        last_id = 0
+        while True:
+            sessions = ChatSession.query.filter(
+                ChatSession.id > last_id,
+                ChatSession.messages.isnot(None)
+            ).order_by(ChatSession.id).limit(batch_size).all()
+            if not sessions:
+                break
+            
+            for chat_session in sessions:
+                legacy = chat_session._legacy_messages()
+                for message in legacy:
+                    message.session_id = chat_session.id
+                    db.session.add(message)
+                chat_session.messages = db.null()  # SQL NULL, не JSON 'null'
+                migrated += len(legacy)
+            
+            last_id = sessions[-1].id
+            db.session.commit()
+        
+        return migrated
+
+
+class ChatMessage(db.Model):
+    """Отдельное сообщение чата (таблица только для вставок)."""
+    
+    __tablename__ = 'chat_messages'
+    __table_args__ = (
+        db.Index('ix_chat_messages_session_created', 'session_id', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('chat_sessions.id', ondelete='CASCADE'), nullable=False)
+    role = db.Column(db.String(20), nullable=False)  # user / assistant
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ChatMessage {self.session_id} {self.role}>'
@@ -0,0 +1,43 @@
+"""
+Модель очереди исходящих писем (outbox)
+"""
+
+from datetime import datetime
+from app import db
+
+
+class OutboxMail(db.Model):
+    """Письмо в очереди; отправляет фоновый отправитель (services/mailer)."""
+
+    __tablename__ = 'mail_outbox'
+    __table_args__ = (
+        db.Index('ix_mail_outbox_status_due', 'status', 'next_attempt_at'),
+    )
+
+    KIND_LEAD = 'lead'          # Новый лид из чата (собираются в дайджест)
+    KIND_CONTACT = 'contact'    # Сообщение из контактной формы
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'    # Попытки исчерпаны
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    recipient = db.Column(db.String(255), nullable=False)
+    reply_to = db.Column(db.String(255))
+    subject = db.Column(db.String(255))
+    body = db.Column(db.Text)
+    payload = db.Column(db.JSON)  # Данные лида для дайджеста
+
+    # Доставка
+    status = db.Column(db.String(20), default=STATUS_PENDING, nullable=False)
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claim_token = db.Column(db.String(36))
+    last_error = db.Column(db.String(500))
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<OutboxMail {self.kind} {self.status}>'
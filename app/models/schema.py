@@ -0,0 +1,44 @@
+"""
+Лёгкое обновление схемы БД
+db.create_all() создаёт только отсутствующие таблицы. Для уже существующих
+таблиц эта функция добавляет новые nullable-колонки моделей через
+ALTER TABLE ... ADD COLUMN и недостающие индексы, чтобы деплой не требовал
+ручных миграций.
+"""
+
+import logging
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade_schema(db):
+    """Добавляет недостающие колонки и индексы в существующие таблицы."""
+    engine = db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = engine.dialect.identifier_preparer
+    
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            
+            existing_columns = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+                
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f'ALTER TABLE {preparer.quote(table.name)} '
+                    f'ADD COLUMN {preparer.quote(column.name)} {column_type}'
+                ))
+                logger.info(f'Added column {table.name}.{column.name}')
+            
+            existing_indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                index.create(conn)
+                logger.info(f'Created index {index.name}')
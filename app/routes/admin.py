@@ -6,6 +6,11 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
 from app.models import Admin, ChatbotInstruction, ContentPlan, BlogPost, ChatSession
+from app.services.knowledge import bump_knowledge_version
+from app.services.vector_index import sync_instruction, sync_blog_post, remove_from_index
+from app.services.related_posts import refresh_related_posts
+from app.services.blog_listing import bump_blog_version
+from app.services import prerender
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -103,6 +108,8 @@ def chatbot_add():
         )
         db.session.add(instruction)
         db.session.commit()
+        bump_knowledge_version()
+        sync_instruction(instruction)
         
         flash('Anweisung erfolgreich hinzugefügt!', 'success')
         return redirect(url_for('admin.chatbot_list'))
@@ -125,6 +132,8 @@ def chatbot_edit(id):
         instruction.is_active = bool(request.form.get('is_active'))
         
         db.session.commit()
+        bump_knowledge_version()
+        sync_instruction(instruction)
         
         flash('Anweisung erfolgreich aktualisiert!', 'success')
         return redirect(url_for('admin.chatbot_list'))
@@ -139,11 +148,39 @@ def chatbot_delete(id):
     instruction = ChatbotInstruction.query.get_or_404(id)
     db.session.delete(instruction)
     db.session.commit()
+    bump_knowledge_version()
+    remove_from_index('instruction', id)
     
     flash('Anweisung gelöscht.', 'info')
     return redirect(url_for('admin.chatbot_list'))
 
 
+@admin_bp.route('/chatbot/stats')
+@login_required
+def chatbot_stats():
+    """Статистика кэша ответов и быстрых ответов чатбота (текущий воркер)."""
+    from app.services.answer_cache import answer_cache
+    from app.services.intents import intent_classifier
+    return {
+        'answer_cache': answer_cache.stats(),
+        'intents': intent_classifier.stats(),
+    }
+
+
+@admin_bp.route('/chatbot/timings')
+@login_required
+def chatbot_timings():
+    """Перцентили времени обработки запросов чатбота (текущий воркер)."""
+    from app.services.answer_cache import answer_cache
+    from app.services.intents import intent_classifier
+    from app.services.tracing import timing_stats
+    
+    return render_template('admin/chatbot/timings.html',
+                          timings=timing_stats.summary(),
+                          answer_cache=answer_cache.stats(),
+                          intents=intent_classifier.stats())
+
+
 # ============ Контент-план ============
 
 @admin_bp.route('/content-plan')
@@ -219,7 +256,7 @@ def content_plan_generate(id):
 @login_required
 def blog_list():
     """Список статей блога."""
-    posts = BlogPost.query.order_by(BlogPost.created_at.desc()).all()
+    posts = BlogPost.get_admin_list()
     return render_template('admin/blog/list.html', posts=posts)
 
 
@@ -234,6 +271,7 @@ def blog_edit(id):
         post.slug = request.form.get('slug')
         post.excerpt = request.form.get('excerpt')
         post.content = request.form.get('content')
+        post.render_content()
         post.category = request.form.get('category')
         post.seo_title = request.form.get('seo_title')
         post.seo_description = request.form.get('seo_description')
@@ -243,6 +281,10 @@ def blog_edit(id):
             flash('Artikel veröffentlicht!', 'success')
         
         db.session.commit()
+        sync_blog_post(post)
+        related_ids = refresh_related_posts(post)
+        bump_blog_version()
+        prerender.refresh_post(post, related_ids)
         flash('Artikel aktualisiert!', 'success')
         return redirect(url_for('admin.blog_list'))
     
@@ -261,6 +303,10 @@ def blog_publish(id):
         post.content_plan.status = ContentPlan.STATUS_PUBLISHED
     
     db.session.commit()
+    sync_blog_post(post)
+    related_ids = refresh_related_posts(post)
+    bump_blog_version()
+    prerender.refresh_post(post, related_ids)
     
     flash('Artikel veröffentlicht!', 'success')
     return redirect(url_for('admin.blog_list'))
@@ -370,6 +416,7 @@ def trends_generate_single():
             is_auto_generated=True,
             is_published=False
         )
+        post.render_content()
         
         db.session.add(post)
         db.session.commit()
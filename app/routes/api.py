@@ -2,79 +2,224 @@
 API маршруты для чатбота
 """
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, g, Response, stream_with_context
+import json
+import logging
 import uuid
 from app import db
 from app.models import ChatSession
+from app.services.chat_store import chat_store
 from app.services.chatbot import ChatbotService
+from app.services.mailer import queue_lead_notification
+from app.services.rate_limit import rate_limited, acquire_llm_slot, release_llm_slot, too_many_requests
+from app.services.tracing import start_trace
+
+logger = logging.getLogger(__name__)
 
 api_bp = Blueprint('api', __name__)
 
 
 @api_bp.route('/chat', methods=['POST'])
+@rate_limited('chat')
 def chat():
     """Обработка сообщений чатбота."""
-    # Отладка - что приходит
-    print("=== CHAT REQUEST ===")
-    print(f"Content-Type: {request.content_type}")
-    print(f"Data: {request.data}")
+    trace = start_trace('chat')
     
     # Получаем JSON данные (force=True игнорирует Content-Type)
     data = request.get_json(force=True, silent=True)
-    print(f"Parsed JSON: {data}")
     
     if not data:
-        return jsonify({'error': 'Invalid JSON data', 'received': str(request.data)}), 400
+        logger.warning(f'Invalid chat payload: content_type={request.content_type} length={request.content_length}')
+        return jsonify({'error': 'Invalid JSON data'}), 400
     
     user_message = data.get('message', '').strip()
     if not user_message:
-        return jsonify({'error': 'Message is required', 'data': data}), 400
+        return jsonify({'error': 'Message is required'}), 400
     
     page_url = data.get('page_url', '')
+    trace.set('message_chars', len(user_message))
     
-    # Получаем или создаём сессию чата
-    session_id = session.get('chat_session_id')
-    if not session_id:
-        session_id = str(uuid.uuid4())
-        session['chat_session_id'] = session_id
+    session_id, is_new = _chat_session_id()
+    slot = None
     
     try:
-        # Находим или создаём запись в БД
-        chat_session = ChatSession.query.filter_by(session_id=session_id).first()
-        if not chat_session:
-            chat_session = ChatSession(session_id=session_id, page_url=page_url)
-            db.session.add(chat_session)
+        # Сессия из памяти воркера; запись в БД - фоновым потоком
+        with trace.phase('session'):
+            chat_session = chat_store.get(session_id, page_url=page_url, is_new=is_new)
+        
+        # Быстрые ответы (интенты, кэш первой фразы) не занимают слот LLM
+        chatbot = ChatbotService()
+        assistant_response = chatbot.quick_response(user_message, _is_first_turn(chat_session))
+        if assistant_response is None:
+            # Глобальный лимит одновременных запросов к LLM: сразу 429 вместо очереди
+            slot = acquire_llm_slot()
+            if slot is None:
+                trace.set('llm', 'rejected')
+                return too_many_requests(2)
         
-        # Добавляем сообщение пользователя
-        chat_session.add_message('user', user_message)
+        with trace.phase('session'):
+            chat_store.append(chat_session, 'user', user_message)
         
         # Получаем ответ от AI
-        chatbot = ChatbotService()
-        assistant_response = chatbot.get_response(
-            user_message=user_message,
-            chat_history=chat_session.get_messages_for_api()
-        )
+        if assistant_response is None:
+            with trace.phase('history'):
+                chat_history, summary = chatbot.prepare_history(chat_session)
+                chat_store.save_summary(chat_session)
+            assistant_response = chatbot.get_response(
+                user_message=user_message,
+                chat_history=chat_history,
+                summary=summary
+            )
         
         # Добавляем ответ ассистента
-        chat_session.add_message('assistant', assistant_response)
-        
-        db.session.commit()
+        chat_store.append(chat_session, 'assistant', assistant_response)
         
+        # fallback: ответ-заглушка (LLM занят или недоступен), а не ответ модели
         return jsonify({
             'response': assistant_response,
-            'session_id': session_id
+            'session_id': session_id,
+            'fallback': chatbot.degraded
         })
     
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        # Подробности - только в лог сервера, посетителю - trace_id для поиска
+        logger.exception(f'Chat request failed (trace {trace.id})')
+        trace.set('error', type(e).__name__)
         return jsonify({
             'response': 'Entschuldigung, es gab einen technischen Fehler. Bitte rufen Sie uns an: 069 90475570',
-            'error': str(e)
+            'error': 'internal_error',
+            'trace_id': trace.id,
+            'fallback': True
         }), 200  # Возвращаем 200 чтобы пользователь увидел сообщение
+    
+    finally:
+        release_llm_slot(slot)
+
+
+def _chat_session_id():
+    """
+    Идентификатор сессии чата (создаётся при необходимости).
+    
+    Returns:
+        (session_id, is_new) - is_new: выдан в этом запросе, в БД его нет
+    """
+    session_id = session.get('chat_session_id')
+    if not session_id:
+        session_id = session['chat_session_id'] = str(uuid.uuid4())
+        return session_id, True
+    # Идентификатор мог выдать rate_limited ради корзины сессии
+    return session_id, g.get('chat_session_new', False)
+
+
+def _is_first_turn(chat_session):
+    """Первая фраза разговора (до добавления сообщения пользователя)."""
+    return not chat_session.messages and not chat_session.summary
+
+
+@api_bp.after_request
+def add_server_timing(response):
+    """Добавляет Server-Timing и завершает трассировку (кроме потоковых ответов)."""
+    trace = g.get('chat_trace')
+    if trace is not None:
+        response.headers['Server-Timing'] = trace.server_timing()
+        if not response.is_streamed:
+            trace.finish()
+    return response
+
+
+def _sse(data, event=None):
+    """Форматирует событие Server-Sent Events."""
+    payload = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f'event: {event}\ndata: {payload}\n\n'
+    return f'data: {payload}\n\n'
+
+
+@api_bp.route('/chat/stream', methods=['POST'])
+@rate_limited('chat')
+def chat_stream():
+    """Потоковый ответ чатбота (SSE): токены отдаются по мере генерации."""
+    data = request.get_json(force=True, silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid JSON data'}), 400
+    
+    user_message = data.get('message', '').strip()
+    if not user_message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    page_url = data.get('page_url', '')
+    
+    # Сессию создаём до начала потока, чтобы cookie попала в заголовки
+    session_id, is_new = _chat_session_id()
+    
+    trace = start_trace('chat_stream')
+    trace.set('message_chars', len(user_message))
+    
+    with trace.phase('session'):
+        chat_session = chat_store.get(session_id, page_url=page_url, is_new=is_new)
+    
+    # Быстрые ответы (интенты, кэш первой фразы) не занимают слот LLM
+    chatbot = ChatbotService()
+    quick_answer = chatbot.quick_response(user_message, _is_first_turn(chat_session))
+    slot = None
+    if quick_answer is None:
+        slot = acquire_llm_slot()
+        if slot is None:
+            trace.set('llm', 'rejected')
+            return too_many_requests(2)
+    
+    try:
+        with trace.phase('session'):
+            chat_store.append(chat_session, 'user', user_message)
+        
+        if quick_answer is None:
+            with trace.phase('history'):
+                chat_history, summary = chatbot.prepare_history(chat_session)
+                chat_store.save_summary(chat_session)
+            tokens = chatbot.stream_response(user_message, chat_history, summary)
+        else:
+            tokens = [quick_answer]
+    except Exception:
+        release_llm_slot(slot)
+        raise
+    
+    def generate():
+        g.chat_trace = trace
+        chunks = []
+        try:
+            for token in tokens:
+                if not chunks:
+                    trace.phases['ttft'] = trace.elapsed()
+                chunks.append(token)
+                yield _sse({'token': token})
+            
+            # Полный ответ сохраняем после окончания потока
+            chat_store.append(chat_session, 'assistant', ''.join(chunks))
+            
+            yield _sse({'session_id': session_id, 'fallback': chatbot.degraded}, event='done')
+        
+        except Exception as e:
+            logger.exception(f'Chat stream failed (trace {trace.id})')
+            trace.set('error', type(e).__name__)
+            yield _sse({
+                'response': 'Entschuldigung, es gab einen technischen Fehler. Bitte rufen Sie uns an: 069 90475570',
+                'error': 'internal_error',
+                'trace_id': trace.id,
+                'fallback': True
+            }, event='error')
+        
+        finally:
+            release_llm_slot(slot)
+            trace.finish()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Отключаем буферизацию в nginx
+    return response
 
 
 @api_bp.route('/chat/lead', methods=['POST'])
+@rate_limited('lead')
 def submit_lead():
     """Сохранение контактных данных из чата."""
     data = request.get_json()
@@ -84,6 +229,9 @@ def submit_lead():
         return jsonify({'error': 'No active chat session'}), 400
     
     chat_session = ChatSession.query.filter_by(session_id=session_id).first()
+    if not chat_session and chat_store.flush():
+        # Сессия могла ещё ждать в очереди записи
+        chat_session = ChatSession.query.filter_by(session_id=session_id).first()
     if not chat_session:
         return jsonify({'error': 'Chat session not found'}), 404
     
@@ -93,10 +241,10 @@ def submit_lead():
         email=data.get('email'),
         phone=data.get('phone')
     )
+    # Уведомление уходит через outbox в той же транзакции
+    queue_lead_notification(chat_session)
     db.session.commit()
     
-    # TODO: Отправить уведомление администратору
-    
     return jsonify({'success': True, 'message': 'Vielen Dank! Wir melden uns bei Ihnen.'})
 
 
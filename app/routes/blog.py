@@ -2,29 +2,68 @@
 Маршруты блога
 """
 
-from flask import Blueprint, render_template, request, abort
+from flask import Blueprint, render_template, request, abort, redirect, url_for
+from app import db
 from app.models import BlogPost
+from app.services.blog_listing import (
+    listing_stats, keyset_page, legacy_page_cursor, decode_cursor
+)
+from app.services.blog_search import search_posts
+from app.services.http_cache import make_etag, not_modified, cached_response
+from app.services.view_counter import view_counter
+from app.services.prerender import ENVIRON_KEY as PRERENDER_ENVIRON_KEY
 
 blog_bp = Blueprint('blog', __name__)
 
 
+def _listing_page(query, per_page, **url_args):
+    """
+    Курсоры страницы из ?nach= / ?vor= (старые ссылки ?page=N - 301 на курсор).
+    
+    Returns:
+        (after, before, редирект или None)
+    """
+    page = request.args.get('page', 1, type=int)
+    if page > 1:
+        cursor = legacy_page_cursor(query, page, per_page)
+        if cursor is None:
+            abort(404)
+        return None, None, redirect(url_for(request.endpoint, nach=cursor, **url_args), 301)
+    
+    after = before = None
+    if 'nach' in request.args:
+        after = decode_cursor(request.args['nach']) or abort(404)
+    elif 'vor' in request.args:
+        before = decode_cursor(request.args['vor']) or abort(404)
+    return after, before, None
+
+
 @blog_bp.route('/')
 def index():
     """Список статей блога."""
-    page = request.args.get('page', 1, type=int)
     per_page = 10
+    query = BlogPost.listing_query()
+    after, before, response = _listing_page(query, per_page)
+    if response:
+        return response
+    
+    # 304 до запроса страницы и рендеринга, если список не менялся
+    count, last_modified = listing_stats()
+    etag = make_etag('index', request.query_string, count, last_modified)
+    response = not_modified(etag, last_modified)
+    if response:
+        return response
     
-    posts = BlogPost.get_published().paginate(
-        page=page, 
-        per_page=per_page, 
-        error_out=False
-    )
+    posts = keyset_page(query, per_page, after=after, before=before, total=count)
+    if not posts.items and (after or before):
+        abort(404)
     
-    categories = ['Trends', 'Tipps', 'Projekte', 'News']
+    categories = BlogPost.CATEGORIES
     
-    return render_template('blog/index.html', 
-                          posts=posts, 
-                          categories=categories)
+    return cached_response(render_template('blog/index.html', 
+                                           posts=posts, 
+                                           categories=categories),
+                           etag, last_modified)
 
 
 @blog_bp.route('/<slug>/')
@@ -32,35 +71,81 @@ def post(slug):
     """Отдельная статья блога."""
     post = BlogPost.query.filter_by(slug=slug, is_published=True).first_or_404()
     
-    # Увеличиваем счётчик просмотров
-    post.increment_views()
-    from app import db
-    db.session.commit()
+    # Просмотр учитывается в памяти, в БД пишется пакетом (пре-рендер - не просмотр)
+    if not request.environ.get(PRERENDER_ENVIRON_KEY):
+        view_counter.record(post.id)
+    
+    # Похожие статьи пересчитываются при публикации любой статьи - список
+    # опубликованных входит в ETag
+    count, listing_modified = listing_stats()
+    last_modified = max(filter(None, (post.last_modified(), listing_modified)), default=None)
+    etag = make_etag('post', post.id, post.last_modified(), count, listing_modified)
+    response = not_modified(etag, last_modified)
+    if response:
+        return response
     
-    # Похожие статьи
-    related = BlogPost.query.filter(
-        BlogPost.is_published == True,
-        BlogPost.category == post.category,
-        BlogPost.id != post.id
-    ).limit(3).all()
+    # Похожие статьи (blog_related_posts); до первого пересчёта - из той же категории
+    related = post.get_related(3)
+    if not related:
+        related = BlogPost.query.filter(
+            BlogPost.is_published == True,
+            BlogPost.category == post.category,
+            BlogPost.id != post.id
+        ).options(BlogPost.card_columns()).limit(3).all()
     
-    return render_template('blog/post.html', post=post, related=related)
+    return cached_response(render_template('blog/post.html', post=post, related=related),
+                           etag, last_modified)
 
 
 @blog_bp.route('/kategorie/<category>/')
 def category(category):
     """Статьи по категории."""
-    page = request.args.get('page', 1, type=int)
+    per_page = 10
+    query = BlogPost.listing_query(category)
+    after, before, response = _listing_page(query, per_page, category=category)
+    if response:
+        return response
+    
+    count, last_modified = listing_stats(category)
+    etag = make_etag('category', category, request.query_string, count, last_modified)
+    response = not_modified(etag, last_modified)
+    if response:
+        return response
+    
+    posts = keyset_page(query, per_page, after=after, before=before, total=count)
+    if not posts.items and (after or before):
+        abort(404)
+    
+    return cached_response(render_template('blog/category.html', 
+                                           posts=posts, 
+                                           pagination=posts,
+                                           category=category),
+                           etag, last_modified)
+
+
+@blog_bp.route('/suche/')
+def search():
+    """Полнотекстовый поиск по статьям."""
+    query = request.args.get('q', '').strip()[:200]
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = 10
     
-    posts = BlogPost.get_by_category(category).paginate(
-        page=page,
-        per_page=10,
-        error_out=False
-    )
+    # Результаты меняются только вместе со списком опубликованных статей
+    count, last_modified = listing_stats()
+    etag = make_etag('search', query, page, count, last_modified)
+    response = not_modified(etag, last_modified)
+    if response:
+        return response
     
-    if not posts.items and page > 1:
+    total, results = search_posts(db, query, page, per_page) if query else (0, [])
+    pages = (total + per_page - 1) // per_page
+    if page > 1 and page > pages:
         abort(404)
     
-    return render_template('blog/category.html', 
-                          posts=posts, 
-                          category=category)
+    return cached_response(render_template('blog/search.html',
+                                           query=query,
+                                           results=results,
+                                           total=total,
+                                           page=page,
+                                           pages=pages),
+                           etag, last_modified)
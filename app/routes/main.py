@@ -3,17 +3,22 @@
 """
 
 from flask import Blueprint, render_template, request, flash, redirect, url_for, Response, send_from_directory, current_app
+from app import db
 from app.models import Page, BlogPost
+from app.services.mailer import queue_contact_message
 from datetime import datetime
 
 main_bp = Blueprint('main', __name__)
 
+# Города с отдельными страницами /fliesen/<city>/
+CITIES = ['offenbach', 'hanau', 'maintal', 'darmstadt', 'aschaffenburg']
+
 
 @main_bp.route('/')
 def home():
     """Главная страница."""
     page = Page.query.filter_by(slug='home').first()
-    latest_posts = BlogPost.query.filter_by(is_published=True).order_by(BlogPost.created_at.desc()).limit(3).all()
+    latest_posts = BlogPost.get_latest(3)
     return render_template('pages/home.html', page=page, latest_posts=latest_posts)
 
 
@@ -27,8 +32,7 @@ def fliesen():
 @main_bp.route('/fliesen/<city>/')
 def fliesen_city(city):
     """Страницы Fliesen по городам."""
-    valid_cities = ['offenbach', 'hanau', 'maintal', 'darmstadt', 'aschaffenburg']
-    if city not in valid_cities:
+    if city not in CITIES:
         return render_template('errors/404.html'), 404
     
     page = Page.query.filter_by(slug=f'fliesen-{city}').first()
@@ -124,8 +128,9 @@ def contact():
         phone = request.form.get('phone')
         message = request.form.get('message')
         
-        # TODO: Отправка email
-        # send_contact_email(name, email, phone, message)
+        # Письмо отправит фоновый отправитель (outbox)
+        queue_contact_message(name, email, phone, message)
+        db.session.commit()
         
         flash('Vielen Dank für Ihre Nachricht! Wir werden uns in Kürze bei Ihnen melden.', 'success')
         return redirect(url_for('main.contact'))
@@ -236,8 +241,7 @@ def sitemap():
     ]
     
     # Города
-    cities = ['offenbach', 'hanau', 'maintal', 'darmstadt', 'aschaffenburg']
-    for city in cities:
+    for city in CITIES:
         static_pages.append({
             'url': f'/fliesen/{city}/',
             'priority': '0.7',
@@ -245,7 +249,7 @@ def sitemap():
         })
     
     # Динамические страницы (блог)
-    blog_posts = BlogPost.query.filter_by(is_published=True).order_by(BlogPost.published_at.desc()).all()
+    blog_posts = BlogPost.get_sitemap_entries()
     
     xml = ['<?xml version="1.0" encoding="UTF-8"?>']
     xml.append('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">')
@@ -259,10 +263,9 @@ def sitemap():
         xml.append('  </url>')
     
     # Блог посты
-    for post in blog_posts:
-        lastmod = post.updated_at or post.published_at or post.created_at
+    for slug, lastmod in blog_posts:
         xml.append('  <url>')
-        xml.append(f'    <loc>{base_url}/blog/{post.slug}/</loc>')
+        xml.append(f'    <loc>{base_url}/blog/{slug}/</loc>')
         xml.append(f'    <lastmod>{lastmod.strftime("%Y-%m-%d")}</lastmod>')
         xml.append('    <changefreq>monthly</changefreq>')
         xml.append('    <priority>0.6</priority>')
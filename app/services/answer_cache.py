@@ -0,0 +1,100 @@
+"""
+Кэш ответов чатбота на повторяющиеся первые вопросы
+Большая часть трафика - кнопки quick-reply с одинаковым текстом. Ответы
+хранятся в памяти воркера (LRU + TTL) и привязаны к версии базы знаний и
+версии блога: изменение инструкций в админке и публикация, правка или
+удаление статей (ответы ссылаются на статьи) сразу делают их недействительными.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCT_RE = re.compile(r'[^\w\s]', re.UNICODE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_question(text):
+    """Нормализует вопрос: регистр, пунктуация, пробелы."""
+    text = _PUNCT_RE.sub(' ', (text or '').lower())
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+class AnswerCache:
+    """LRU-кэш с TTL и счётчиками попаданий/промахов."""
+    
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _check_version(self, version):
+        # Новая версия базы знаний или блога - старые ответы больше не нужны
+        if version != self.version:
+            self._data.clear()
+            self.version = version
+    
+    def get(self, question, version):
+        """Возвращает сохранённый ответ или None."""
+        key = normalize_question(question)
+        with self._lock:
+            self._check_version(version)
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+    
+    def set(self, question, version, answer):
+        """Сохраняет ответ, вытесняя самый старый при переполнении."""
+        key = normalize_question(question)
+        if not key:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._data[key] = (time.monotonic() + self.ttl, answer)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        """Очищает кэш."""
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self):
+        """Статистика кэша для админки."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+def answer_cache_version():
+    """Версия для кэша: база знаний + список статей (ссылки в ответах)."""
+    from app.services.blog_listing import get_blog_version
+    from app.services.knowledge import get_knowledge_version
+    return f'{get_knowledge_version()}:{get_blog_version()}'
+
+
+# Кэш процесса (воркера)
+answer_cache = AnswerCache(
+    maxsize=int(os.environ.get('CHATBOT_ANSWER_CACHE_SIZE', 256)),
+    ttl=int(os.environ.get('CHATBOT_ANSWER_CACHE_TTL', 3600)),
+)
@@ -0,0 +1,164 @@
+"""
+Статика с отпечатками (fingerprint)
+`flask build-assets` копирует файлы static/ в static/build/ с хэшем
+содержимого в имени (css/style.css -> build/css/style.3f2a9c1b7e4d.css),
+пишет рядом .gz/.br и манифест исходное имя -> имя с хэшем.
+
+url_for('static', filename='css/style.css') выдаёт имя из манифеста, а
+такие файлы отдаются с Cache-Control: immutable на год и в сжатом виде по
+Accept-Encoding. Без сборки (разработка) всё работает как раньше.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:  # .br не пишутся, отдаётся gzip
+        brotli = None
+
+BUILD_DIR = 'build'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+
+# Загружаемые файлы меняются без сборки и не получают отпечаток
+SKIP_DIRS = {BUILD_DIR, 'uploads'}
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.xml', '.html', '.ico', '.map'}
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_CSS_URL_RE = re.compile(r'''url\((['"]?)/static/([^'")?#]+)\1\)''')
+
+
+# ============ Сборка ============
+
+def _hashed_name(name, data):
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    base, ext = os.path.splitext(name)
+    return f'{base}.{digest}{ext}'
+
+
+def _source_files(static_folder):
+    for root, dirs, files in os.walk(static_folder):
+        relative_root = os.path.relpath(root, static_folder)
+        if relative_root == '.':
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for filename in files:
+            if filename.endswith(('.gz', '.br')) or filename.startswith('.'):
+                continue
+            path = os.path.join(root, filename)
+            yield os.path.relpath(path, static_folder).replace(os.sep, '/'), path
+
+
+def _write_compressed(path, data):
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build_assets(static_folder):
+    """
+    Собирает static/build/ заново (во временной папке, затем замена).
+
+    Returns:
+        dict: манифест {исходное имя: имя с хэшем относительно static/}
+    """
+    build_path = os.path.join(static_folder, BUILD_DIR)
+    tmp_path = f'{build_path}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+    sources = sorted(_source_files(static_folder))
+    # CSS - последним: ссылки url(/static/...) в нём заменяются на имена с хэшем
+    sources.sort(key=lambda item: item[0].endswith('.css'))
+
+    manifest = {}
+    for name, path in sources:
+        with open(path, 'rb') as f:
+            data = f.read()
+        if name.endswith('.css'):
+            data = _CSS_URL_RE.sub(
+                lambda m: f'url({m.group(1)}/static/{manifest.get(m.group(2), m.group(2))}{m.group(1)})',
+                data.decode('utf-8')
+            ).encode('utf-8')
+
+        hashed = f'{BUILD_DIR}/{_hashed_name(name, data)}'
+        target = os.path.join(tmp_path, *hashed.split('/')[1:])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+            _write_compressed(target, data)
+        manifest[name] = hashed
+
+    with open(os.path.join(tmp_path, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+    old_path = f'{build_path}.{os.getpid()}.old'
+    if os.path.exists(build_path):
+        os.replace(build_path, old_path)
+    os.replace(tmp_path, build_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """Манифест сборки или пустой словарь (сборки нет)."""
+    try:
+        with open(os.path.join(static_folder, BUILD_DIR, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+# ============ Flask ============
+
+def init_assets(app):
+    """Подключает манифест к url_for('static') и отдачу сжатых файлов."""
+    app.extensions['asset_manifest'] = load_manifest(app.static_folder)
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        # url_for('static', filename='css/style.css') -> build/css/style.<hash>.css
+        if endpoint == 'static':
+            filename = values.get('filename')
+            hashed = current_app.extensions['asset_manifest'].get(filename)
+            if hashed:
+                values['filename'] = hashed
+
+    if app.static_folder and 'static' in app.view_functions:
+        app.view_functions['static'] = serve_static
+
+
+def serve_static(filename):
+    """Статика; файлы сборки - immutable и в сжатом виде по Accept-Encoding."""
+    if not filename.startswith(BUILD_DIR + '/'):
+        return current_app.send_static_file(filename)
+
+    static_folder = current_app.static_folder
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accepted = request.accept_encodings
+    encoding, served = None, filename
+    for name, suffix in ENCODINGS:
+        if accepted[name] and os.path.isfile(os.path.join(static_folder, filename + suffix)):
+            encoding, served = name, filename + suffix
+            break
+
+    max_age = current_app.config.get('STATIC_IMMUTABLE_MAX_AGE', 31536000)
+    # ETag считается по отдаваемому файлу - у .gz/.br он свой
+    response = send_from_directory(static_folder, served, mimetype=mimetype, max_age=max_age)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -6,9 +6,13 @@ import os
 import re
 from datetime import datetime
 from slugify import slugify
-from openai import OpenAI
 from app import db
 from app.models import BlogPost
+from app.services.openai_client import get_openai_client
+from app.services.vector_index import sync_blog_post, remove_from_index
+from app.services.related_posts import refresh_related_posts, remove_related_posts
+from app.services.blog_listing import bump_blog_version
+from app.services import prerender
 
 
 class BlogGenerator:
@@ -111,7 +115,7 @@ Antworte NUR mit dem Titel, ohne Anführungszeichen."""
         api_key = os.environ.get('OPENAI_API_KEY')
         if not api_key:
             raise ValueError("OPENAI_API_KEY nicht gesetzt")
-        self.client = OpenAI(api_key=api_key)
+        self.client = get_openai_client()
         self.model = os.environ.get('BLOG_MODEL', 'gpt-4o-mini')
     
     def generate_title_from_trend(self, trend: dict) -> str:
@@ -249,6 +253,7 @@ Antworte NUR mit dem Titel, ohne Anführungszeichen."""
             is_auto_generated=True,
             is_published=False  # Muss manuell freigegeben werden
         )
+        post.render_content()
         
         db.session.add(post)
         db.session.commit()
@@ -326,6 +331,12 @@ class ContentScheduler:
             BlogPost.created_at.asc()
         ).limit(to_delete).all()
         
+        deleted_ids = [post.id for post in old_posts]
+        deleted_slugs = [post.slug for post in old_posts]
+        # Похожие статьи пересчитываем до удаления: на PostgreSQL строки
+        # blog_related_posts уходят каскадом вместе со статьёй
+        related_ids = remove_related_posts(deleted_ids)
+        
         deleted_count = 0
         for post in old_posts:
             db.session.delete(post)
@@ -333,6 +344,11 @@ class ContentScheduler:
         
         db.session.commit()
         
+        for post_id in deleted_ids:
+            remove_from_index('post', post_id)
+        bump_blog_version()
+        prerender.remove_posts(deleted_slugs, related_ids)
+        
         import logging
         logging.info(f"Удалено {deleted_count} старых статей. Осталось {max_articles}.")
         
@@ -419,10 +435,17 @@ class ContentScheduler:
                 
                 if auto_publish:
                     post.published_at = datetime.utcnow()
+                post.render_content()
                 
                 db.session.add(post)
                 db.session.commit()
                 
+                if auto_publish:
+                    sync_blog_post(post)
+                    related_ids = refresh_related_posts(post)
+                    bump_blog_version()
+                    prerender.refresh_post(post, related_ids)
+                
                 created_posts.append(post)
                 
             except Exception as e:
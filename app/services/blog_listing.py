@@ -0,0 +1,166 @@
+"""
+Списки статей блога: keyset-пагинация и кэш состояния списка
+
+Страницы листаются курсором по (published_at, id) вместо OFFSET, поэтому
+сотая страница стоит столько же, сколько первая (составные индексы
+ix_blog_posts_published*). Количество статей и время последнего изменения
+(для счётчика и ETag) кэшируются в воркере; версия списка хранится в файле
+(instance/blog.version), как версия базы знаний, и меняется при публикации,
+правке и удалении статей.
+
+Файл сбрасывает кэш только в процессах на том же диске. Изменения, сделанные
+на другой машине (второй инстанс, внешний cron), становятся видны по
+истечении BLOG_LISTING_CACHE_TTL.
+"""
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models import BlogPost
+
+CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
+
+_lock = threading.Lock()
+_version = {'path': None, 'mtime': None, 'version': '0'}
+_stats = {}  # (версия, категория) -> (время записи, количество, последнее изменение)
+
+
+# ============ Версия списка ============
+
+def _version_file():
+    return current_app.config.get('BLOG_VERSION_FILE') or \
+        os.path.join(current_app.instance_path, 'blog.version')
+
+
+def get_blog_version():
+    """Текущая версия списка статей (один stat() на запрос)."""
+    path = _version_file()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return '0'
+
+    if _version['path'] == path and _version['mtime'] == mtime:
+        return _version['version']
+
+    with _lock:
+        try:
+            with open(path, encoding='utf-8') as f:
+                version = f.read().strip() or '0'
+        except FileNotFoundError:
+            return '0'
+        _version.update(path=path, mtime=mtime, version=version)
+        return version
+
+
+def bump_blog_version():
+    """Сбрасывает кэш списков во всех воркерах на этом диске (вызывать после commit)."""
+    path = _version_file()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    version = uuid.uuid4().hex
+
+    with _lock:
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(tmp_path, path)
+        _version.update(path=path, mtime=os.stat(path).st_mtime_ns, version=version)
+        _stats.clear()
+
+    return version
+
+
+def listing_stats(category=None):
+    """
+    Кэшированный BlogPost.listing_state(category).
+
+    Returns:
+        (количество, время последнего изменения или None)
+    """
+    key = (get_blog_version(), category)
+    ttl = current_app.config.get('BLOG_LISTING_CACHE_TTL', 300)
+    cached = _stats.get(key)
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1], cached[2]
+
+    count, last_modified = BlogPost.listing_state(category)
+    with _lock:
+        if len(_stats) > 256:
+            _stats.clear()
+        _stats[key] = (time.monotonic(), count, last_modified)
+    return count, last_modified
+
+
+# ============ Keyset-пагинация ============
+
+def encode_cursor(post):
+    return f'{post.published_at.strftime(CURSOR_FORMAT)}-{post.id}'
+
+
+def decode_cursor(value):
+    """'20250102103000000000-42' -> (datetime, id) или None, если курсор битый."""
+    try:
+        stamp, post_id = value.split('-', 1)
+        return datetime.strptime(stamp, CURSOR_FORMAT), int(post_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    """Страница списка статей с курсорами соседних страниц."""
+
+    def __init__(self, items, has_prev, has_next, total, per_page):
+        self.items = items
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.total = total
+        self.per_page = per_page
+        self.prev_cursor = encode_cursor(items[0]) if has_prev and items else None
+        self.next_cursor = encode_cursor(items[-1]) if has_next and items else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def keyset_page(query, per_page, after=None, before=None, total=0):
+    """
+    Страница опубликованных статей (query - отфильтрованный BlogPost.query
+    без сортировки), от новых к старым.
+
+    Args:
+        after: Курсор - статьи старше него (следующая страница)
+        before: Курсор - статьи новее него (предыдущая страница)
+        total: Общее количество (для вывода, см. listing_stats)
+    """
+    key = db.tuple_(BlogPost.published_at, BlogPost.id)
+    if before:
+        # Назад: ближайшие новее курсора, затем в обычном порядке
+        rows = query.filter(key > before)\
+            .order_by(BlogPost.published_at.asc(), BlogPost.id.asc())\
+            .limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        return KeysetPage(items, has_prev, True, total, per_page)
+
+    if after:
+        query = query.filter(key < after)
+    rows = query.order_by(BlogPost.published_at.desc(), BlogPost.id.desc())\
+        .limit(per_page + 1).all()
+    return KeysetPage(rows[:per_page], after is not None, len(rows) > per_page, total, per_page)
+
+
+def legacy_page_cursor(query, page, per_page):
+    """
+    Курсор для старых ссылок ?page=N: последняя статья страницы N-1.
+    Один запрос по индексу - только для редиректа.
+    """
+    row = query.with_entities(BlogPost.published_at, BlogPost.id)\
+        .order_by(BlogPost.published_at.desc(), BlogPost.id.desc())\
+        .offset((page - 1) * per_page - 1).limit(1).first()
+    if row is None:
+        return None
+    return f'{row.published_at.strftime(CURSOR_FORMAT)}-{row.id}'
@@ -0,0 +1,187 @@
+"""
+Полнотекстовый поиск по блогу
+PostgreSQL: генерируемая колонка blog_posts.search_vector (tsvector,
+конфигурация 'german') с GIN-индексом. SQLite (разработка, тесты):
+виртуальная таблица FTS5 blog_posts_fts с триггерами.
+
+В обоих случаях индекс обновляет сама БД при INSERT/UPDATE/DELETE, поэтому
+он не расходится со статьями ни в админке, ни в генераторе, ни при
+массовом удалении старых статей.
+"""
+
+import logging
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Маркеры подсветки: БД вставляет их в фрагмент, а экранируем мы сами
+_START, _STOP = '\x01', '\x02'
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+MAX_QUERY_WORDS = 8
+
+# ============ PostgreSQL ============
+
+_PG_DDL = [
+    """
+    ALTER TABLE blog_posts ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('german', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('german', coalesce(excerpt, '')), 'B') ||
+        setweight(to_tsvector('german', coalesce(content, '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX IF NOT EXISTS ix_blog_posts_search_vector ON blog_posts USING GIN (search_vector)',
+]
+
+_PG_SEARCH = text(f"""
+    SELECT p.id,
+           ts_rank_cd(p.search_vector, q) AS rank,
+           ts_headline('german', coalesce(p.excerpt, '') || ' ' || p.content, q,
+                       'StartSel={_START}, StopSel={_STOP}, MaxWords=35, MinWords=15, '
+                       'MaxFragments=2, FragmentDelimiter=" … "') AS snippet
+    FROM (
+        SELECT id, search_vector, excerpt, content, published_at
+        FROM blog_posts, websearch_to_tsquery('german', :query) q
+        WHERE is_published AND search_vector @@ q
+        ORDER BY ts_rank_cd(search_vector, q) DESC, published_at DESC
+        LIMIT :limit OFFSET :offset
+    ) p, websearch_to_tsquery('german', :query) q
+    ORDER BY rank DESC, p.published_at DESC
+""")
+
+_PG_COUNT = text("""
+    SELECT count(*) FROM blog_posts
+    WHERE is_published AND search_vector @@ websearch_to_tsquery('german', :query)
+""")
+
+# ============ SQLite FTS5 ============
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS blog_posts_fts USING fts5(
+        title, excerpt, content,
+        content='blog_posts', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_posts_fts_insert AFTER INSERT ON blog_posts BEGIN
+        INSERT INTO blog_posts_fts(rowid, title, excerpt, content)
+        VALUES (new.id, new.title, new.excerpt, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_posts_fts_delete AFTER DELETE ON blog_posts BEGIN
+        INSERT INTO blog_posts_fts(blog_posts_fts, rowid, title, excerpt, content)
+        VALUES ('delete', old.id, old.title, old.excerpt, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_posts_fts_update
+    AFTER UPDATE OF title, excerpt, content ON blog_posts BEGIN
+        INSERT INTO blog_posts_fts(blog_posts_fts, rowid, title, excerpt, content)
+        VALUES ('delete', old.id, old.title, old.excerpt, old.content);
+        INSERT INTO blog_posts_fts(rowid, title, excerpt, content)
+        VALUES (new.id, new.title, new.excerpt, new.content);
+    END
+    """,
+]
+
+# bm25: чем меньше, тем релевантнее; заголовок весит больше текста
+_SQLITE_SEARCH = text(f"""
+    SELECT p.id,
+           -bm25(blog_posts_fts, 10.0, 4.0, 1.0) AS rank,
+           snippet(blog_posts_fts, -1, '{_START}', '{_STOP}', ' … ', 30) AS snippet
+    FROM blog_posts_fts
+    JOIN blog_posts p ON p.id = blog_posts_fts.rowid
+    WHERE blog_posts_fts MATCH :query AND p.is_published = 1
+    ORDER BY bm25(blog_posts_fts, 10.0, 4.0, 1.0), p.published_at DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+_SQLITE_COUNT = text("""
+    SELECT count(*)
+    FROM blog_posts_fts
+    JOIN blog_posts p ON p.id = blog_posts_fts.rowid
+    WHERE blog_posts_fts MATCH :query AND p.is_published = 1
+""")
+
+
+def ensure_search_index(db):
+    """Создаёт колонку/индекс (PostgreSQL) или таблицу FTS5 с триггерами (SQLite)."""
+    engine = db.engine
+    dialect = engine.dialect.name
+    try:
+        if dialect == 'postgresql':
+            with engine.begin() as conn:
+                for statement in _PG_DDL:
+                    conn.execute(text(statement))
+        elif dialect == 'sqlite':
+            with engine.begin() as conn:
+                created = not conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'blog_posts_fts'"
+                )).first()
+                for statement in _SQLITE_DDL:
+                    conn.execute(text(statement))
+                if created:
+                    # Индексируем статьи, созданные до появления поиска
+                    conn.execute(text("INSERT INTO blog_posts_fts(blog_posts_fts) VALUES ('rebuild')"))
+    except Exception as e:
+        # Сайт должен работать и без поиска (например, SQLite без FTS5)
+        logger.error(f'Blog search index unavailable: {e}')
+
+
+def _sqlite_query(query):
+    """Запрос посетителя -> выражение FTS5 (все слова, поиск по началу слова)."""
+    words = _WORD_RE.findall(query.lower())[:MAX_QUERY_WORDS]
+    # Префиксный поиск заменяет стемминг: "fliese" находит "fliesen"
+    return ' '.join(f'"{w}"*' for w in words)
+
+
+def highlight(snippet):
+    """Фрагмент с маркерами -> безопасный HTML с <mark>."""
+    html = str(escape(snippet or ''))
+    return Markup(html.replace(_START, '<mark>').replace(_STOP, '</mark>'))
+
+
+def search_posts(db, query, page=1, per_page=10):
+    """
+    Ищет опубликованные статьи.
+
+    Returns:
+        (total, [{'post': BlogPost, 'rank': float, 'snippet': Markup}, ...])
+    """
+    from app.models import BlogPost
+
+    query = (query or '').strip()
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        params = {'query': query}
+        search_sql, count_sql = _PG_SEARCH, _PG_COUNT
+    elif dialect == 'sqlite':
+        params = {'query': _sqlite_query(query)}
+        search_sql, count_sql = _SQLITE_SEARCH, _SQLITE_COUNT
+    else:
+        return 0, []
+    if not params['query']:
+        return 0, []
+
+    try:
+        total = db.session.execute(count_sql, params).scalar() or 0
+        if not total:
+            return 0, []
+        rows = db.session.execute(search_sql, dict(
+            params, limit=per_page, offset=(page - 1) * per_page
+        )).all()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'Blog search failed: {e}')
+        return 0, []
+
+    posts = {p.id: p for p in BlogPost.query.filter(BlogPost.id.in_([r.id for r in rows]))}
+    return total, [
+        {'post': posts[r.id], 'rank': float(r.rank or 0), 'snippet': highlight(r.snippet)}
+        for r in rows if r.id in posts
+    ]
@@ -0,0 +1,252 @@
+"""
+Хранение и архивирование сессий чата
+Сессии без контактов (не лиды) старше N дней выгружаются в сжатые JSONL-файлы
+и удаляются пакетами. На PostgreSQL таблицу chat_sessions можно разбить на
+помесячные партиции по created_at; пустые старые партиции тогда удаляются
+целиком.
+"""
+
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import inspect, text
+from app import db
+from app.models import ChatSession, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def get_archive_dir():
+    """Каталог архива (по умолчанию instance/chat_archive)."""
+    path = current_app.config.get('CHAT_ARCHIVE_DIR') or \
+        os.path.join(current_app.instance_path, 'chat_archive')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _archive_record(chat_session, messages):
+    legacy = [
+        {'role': m.role, 'content': m.content, 'created_at': _isoformat(m.created_at)}
+        for m in chat_session._legacy_messages()
+    ]
+    return {
+        'id': chat_session.id,
+        'session_id': chat_session.session_id,
+        'page_url': chat_session.page_url,
+        'summary': chat_session.summary,
+        'created_at': _isoformat(chat_session.created_at),
+        'updated_at': _isoformat(chat_session.updated_at),
+        'messages': legacy + [
+            {'role': m.role, 'content': m.content, 'created_at': _isoformat(m.created_at)}
+            for m in messages
+        ],
+    }
+
+
+def archive_chat_sessions(days=90, batch_size=500, dry_run=False):
+    """
+    Архивирует и удаляет сессии без контактов старше days дней.
+
+    Каждая пакетная транзакция удаляет строки только после того, как они
+    записаны в архив на диск. Лиды не трогаются.
+
+    Returns:
+        (количество сессий, путь к архиву или None)
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    expired = ChatSession.query.filter(
+        db.or_(ChatSession.is_lead == db.false(), ChatSession.is_lead.is_(None)),
+        ChatSession.created_at < cutoff
+    )
+    if dry_run:
+        return expired.count(), None
+
+    path = os.path.join(
+        get_archive_dir(),
+        f'chat_sessions-{datetime.utcnow():%Y%m%d-%H%M%S}.jsonl.gz'
+    )
+    archived = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as archive:
+        while True:
+            # Удалённые строки выпадают из выборки, поэтому всегда первая страница
+            sessions = expired.order_by(ChatSession.id).limit(batch_size).all()
+            if not sessions:
+                break
+            ids = [s.id for s in sessions]
+
+            messages = {}
+            for message in ChatMessage.query.filter(ChatMessage.session_id.in_(ids))\
+                    .order_by(ChatMessage.id):
+                messages.setdefault(message.session_id, []).append(message)
+
+            for chat_session in sessions:
+                record = _archive_record(chat_session, messages.get(chat_session.id, []))
+                archive.write(json.dumps(record, ensure_ascii=False) + '\n')
+            archive.flush()
+            os.fsync(archive.fileno())
+
+            # Массовое удаление без загрузки объектов в ORM
+            ChatMessage.query.filter(ChatMessage.session_id.in_(ids))\
+                .delete(synchronize_session=False)
+            ChatSession.query.filter(ChatSession.id.in_(ids))\
+                .delete(synchronize_session=False)
+            db.session.commit()
+            db.session.expunge_all()
+            archived += len(ids)
+
+    if not archived:
+        os.remove(path)
+        return 0, None
+
+    if is_partitioned():
+        drop_empty_partitions(cutoff)
+    logger.info(f'Archived {archived} chat sessions to {path}')
+    return archived, path
+
+
+# ============ Партиции PostgreSQL ============
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _partition_name(month):
+    return f'chat_sessions_{month:%Y_%m}'
+
+
+def is_partitioned():
+    """Разбита ли chat_sessions на партиции (только PostgreSQL)."""
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'chat_sessions' AND pg_table_is_visible(c.oid)"
+    )).first() is not None
+
+
+def _partitions():
+    rows = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'chat_sessions' AND pg_table_is_visible(p.oid)"
+    ))
+    return {row[0] for row in rows}
+
+
+def ensure_partitions(months_ahead=3):
+    """
+    Создаёт партиции текущего месяца и months_ahead следующих
+    (запускать раз в месяц, например по cron).
+
+    Returns:
+        list: Имена созданных партиций
+    """
+    created = _create_partitions(datetime.utcnow(), months_ahead)
+    db.session.commit()
+    return created
+
+
+def _create_partitions(start, months_ahead):
+    existing = _partitions()
+    month = _month_start(start)
+    last = _month_start(datetime.utcnow())
+    for _ in range(months_ahead):
+        last = _next_month(last)
+
+    created = []
+    while month <= last:
+        name = _partition_name(month)
+        if name not in existing:
+            db.session.execute(text(
+                f'CREATE TABLE {name} PARTITION OF chat_sessions '
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+            ))
+            created.append(name)
+        month = _next_month(month)
+    return created
+
+
+def drop_empty_partitions(cutoff):
+    """Удаляет пустые партиции, целиком лежащие до cutoff."""
+    dropped = []
+    for name in sorted(_partitions()):
+        try:
+            month = datetime.strptime(name, 'chat_sessions_%Y_%m')
+        except ValueError:
+            continue  # chat_sessions_default
+        if _next_month(month) > cutoff:
+            continue
+        if db.session.execute(text(f'SELECT 1 FROM {name} LIMIT 1')).first():
+            continue  # остались лиды
+        db.session.execute(text(f'ALTER TABLE chat_sessions DETACH PARTITION {name}'))
+        db.session.execute(text(f'DROP TABLE {name}'))
+        dropped.append(name)
+    db.session.commit()
+    return dropped
+
+
+def partition_chat_sessions(months_ahead=3):
+    """
+    Переводит chat_sessions на помесячные партиции по created_at (PostgreSQL).
+
+    Первичный ключ становится (id, created_at), поэтому внешний ключ
+    chat_messages.session_id и уникальность session_id на уровне БД
+    снимаются: идентификаторы сессий - UUID, а сообщения удаляет
+    archive_chat_sessions. Строки копируются в одной транзакции.
+
+    Returns:
+        list: Имена созданных партиций
+    """
+    if db.engine.dialect.name != 'postgresql':
+        raise RuntimeError('Partitioning is only supported on PostgreSQL')
+    if is_partitioned():
+        return ensure_partitions(months_ahead)
+
+    for fk in inspect(db.engine).get_foreign_keys('chat_messages'):
+        if fk['referred_table'] == 'chat_sessions':
+            db.session.execute(text(f'ALTER TABLE chat_messages DROP CONSTRAINT {fk["name"]}'))
+
+    statements = [
+        'UPDATE chat_sessions SET created_at = now() WHERE created_at IS NULL',
+        'ALTER TABLE chat_sessions RENAME TO chat_sessions_legacy',
+        'ALTER TABLE chat_sessions_legacy RENAME CONSTRAINT chat_sessions_pkey '
+        'TO chat_sessions_legacy_pkey',
+        # Последовательность id переживает удаление старой таблицы
+        "ALTER SEQUENCE chat_sessions_id_seq OWNED BY NONE",
+        'CREATE TABLE chat_sessions (LIKE chat_sessions_legacy INCLUDING DEFAULTS) '
+        'PARTITION BY RANGE (created_at)',
+        'ALTER TABLE chat_sessions ADD PRIMARY KEY (id, created_at)',
+        'CREATE TABLE chat_sessions_default PARTITION OF chat_sessions DEFAULT',
+    ]
+    for statement in statements:
+        db.session.execute(text(statement))
+    for index in ChatSession.__table__.indexes:
+        columns = ', '.join(c.name for c in index.columns)
+        db.session.execute(text(
+            f'ALTER INDEX IF EXISTS {index.name} RENAME TO {index.name}_legacy'
+        ))
+        db.session.execute(text(f'CREATE INDEX {index.name} ON chat_sessions ({columns})'))
+
+    oldest = db.session.execute(text('SELECT min(created_at) FROM chat_sessions_legacy')).scalar()
+    created = _create_partitions(oldest or datetime.utcnow(), months_ahead)
+
+    db.session.execute(text('INSERT INTO chat_sessions SELECT * FROM chat_sessions_legacy'))
+    db.session.execute(text('DROP TABLE chat_sessions_legacy'))
+    db.session.execute(text(
+        'ALTER SEQUENCE chat_sessions_id_seq OWNED BY chat_sessions.id'
+    ))
+    db.session.commit()
+    return created
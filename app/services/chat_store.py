@@ -0,0 +1,330 @@
+"""
+Отложенная запись (write-behind) истории чата
+Активные сессии держатся в LRU воркера, новые сообщения и сводки ставятся
+в очередь и записываются фоновым потоком пакетными транзакциями. Запрос
+чата ждёт БД только при первой загрузке уже существующей сессии.
+
+При нескольких воркерах сессию из LRU мог продолжить другой воркер: перед
+выдачей из LRU сверяется max(id) её сообщений в БД, и при расхождении
+сессия (история и сводка) перечитывается.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models import ChatSession, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class StoredMessage:
+    """Сообщение в памяти; id появляется после записи в БД (0 - старый JSON)."""
+
+    __slots__ = ('id', 'role', 'content', 'created_at')
+
+    def __init__(self, role, content, id=None, created_at=None):
+        self.id = id
+        self.role = role
+        self.content = content
+        self.created_at = created_at or datetime.utcnow()
+
+
+class ChatSessionState:
+    """Снимок сессии чата в памяти воркера (интерфейс как у ChatSession)."""
+
+    def __init__(self, session_id, page_url=None, db_id=None, messages=None,
+                 summary=None, summary_until_id=None):
+        self.session_id = session_id
+        self.page_url = page_url
+        self.db_id = db_id
+        self.messages = messages or []
+        self.summary = summary
+        self.summary_until_id = summary_until_id
+        self.saved_summary_until_id = summary_until_id
+        self.loaded_at = time.monotonic()
+
+    def get_messages(self, limit=None, after_id=None):
+        """Сообщения в хронологическом порядке (как ChatSession.get_messages)."""
+        messages = self.messages
+        if after_id is not None:
+            messages = [m for m in messages if m.id is None or m.id > after_id]
+        if limit:
+            messages = messages[-limit:]
+        return list(messages)
+
+    def is_dirty(self):
+        """Есть ли данные, ещё не записанные в БД."""
+        return self.db_id is None or any(m.id is None for m in self.messages)
+
+    def last_message_id(self):
+        """Последний известный id сообщения (свёрнутые в сводку - до summary_until_id)."""
+        ids = [m.id for m in self.messages if m.id]
+        return max(ids + [self.summary_until_id or 0])
+
+
+class ChatStore:
+    """LRU горячих сессий и очередь записи с фоновым сбросом."""
+
+    def __init__(self):
+        self.cache_size = 1000
+        self.cache_ttl = 600
+        self.max_messages = 40
+        self.flush_interval = 0.5
+        self.batch_size = 200
+        self.write_behind = True
+        self._app = None
+        self._sessions = OrderedDict()
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+    def configure(self, app):
+        """Читает настройки из конфигурации приложения."""
+        config = app.config
+        self.cache_size = config.get('CHAT_SESSION_CACHE_SIZE', self.cache_size)
+        self.cache_ttl = config.get('CHAT_SESSION_CACHE_TTL', self.cache_ttl)
+        self.max_messages = config.get('CHAT_SESSION_CACHE_MESSAGES', self.max_messages)
+        self.flush_interval = config.get('CHAT_FLUSH_INTERVAL', self.flush_interval)
+        self.batch_size = config.get('CHAT_FLUSH_BATCH_SIZE', self.batch_size)
+        self.write_behind = config.get('CHAT_WRITE_BEHIND', self.write_behind)
+        self._app = app
+
+    def _ensure_started(self):
+        # Поток создаётся в каждом воркере заново (после fork его нет)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.configure(current_app._get_current_object())
+            self._sessions.clear()
+            self._pending.clear()
+            self._stopping = False
+            if self.write_behind:
+                self._thread = threading.Thread(
+                    target=self._run, name='chat-store-flush', daemon=True
+                )
+                self._thread.start()
+            self._pid = os.getpid()
+        atexit.register(self.shutdown)
+
+    # ============ Сессии ============
+
+    def get(self, session_id, page_url=None, is_new=False):
+        """
+        Возвращает сессию из LRU или загружает её из БД.
+
+        Args:
+            is_new: Идентификатор только что выдан - запрос к БД не нужен
+        """
+        self._ensure_started()
+        with self._lock:
+            state = self._sessions.get(session_id)
+            # Несохранённую сессию нельзя перечитывать: потеряем очередь
+            if state is not None and state.is_dirty():
+                self._sessions.move_to_end(session_id)
+                return state
+
+        if state is not None:
+            if time.monotonic() - state.loaded_at < self.cache_ttl and self._is_current(state):
+                with self._lock:
+                    if session_id in self._sessions:
+                        self._sessions.move_to_end(session_id)
+                return state
+            with self._lock:
+                if self._sessions.get(session_id) is state and not state.is_dirty():
+                    del self._sessions[session_id]
+
+        if is_new:
+            state = ChatSessionState(session_id, page_url=page_url)
+        else:
+            state = self._load(session_id, page_url)
+
+        with self._lock:
+            # Параллельный запрос мог успеть раньше
+            state = self._sessions.setdefault(session_id, state)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.cache_size:
+                self._sessions.popitem(last=False)
+        return state
+
+    @staticmethod
+    def _is_current(state):
+        """Не писал ли в сессию другой воркер (один запрос по индексу)."""
+        last_id = db.session.query(db.func.max(ChatMessage.id))\
+            .filter(ChatMessage.session_id == state.db_id).scalar()
+        return (last_id or 0) <= state.last_message_id()
+
+    def _load(self, session_id, page_url):
+        chat_session = ChatSession.query.filter_by(session_id=session_id).first()
+        if chat_session is None:
+            return ChatSessionState(session_id, page_url=page_url)
+
+        messages = [
+            StoredMessage(m.role, m.content, id=m.id or 0, created_at=m.created_at)
+            for m in chat_session.get_messages(
+                limit=self.max_messages,
+                after_id=chat_session.summary_until_id
+            )
+        ]
+        return ChatSessionState(
+            session_id,
+            page_url=chat_session.page_url,
+            db_id=chat_session.id,
+            messages=messages,
+            summary=chat_session.summary,
+            summary_until_id=chat_session.summary_until_id
+        )
+
+    def append(self, state, role, content):
+        """Добавляет сообщение в сессию и ставит его в очередь записи."""
+        self._ensure_started()
+        message = StoredMessage(role, content)
+        with self._lock:
+            state.messages.append(message)
+            if len(state.messages) > self.max_messages:
+                del state.messages[:-self.max_messages]
+            self._pending.append(('message', state, message))
+        self._after_enqueue()
+        return message
+
+    def save_summary(self, state):
+        """Ставит в очередь изменённую сводку сессии."""
+        if state.summary_until_id == state.saved_summary_until_id:
+            return
+        self._ensure_started()
+        with self._lock:
+            state.saved_summary_until_id = state.summary_until_id
+            self._pending.append(('summary', state, state.summary, state.summary_until_id))
+        self._after_enqueue()
+
+    def _after_enqueue(self):
+        if not self.write_behind:
+            self.flush()
+        elif len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    # ============ Запись ============
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def flush(self):
+        """
+        Синхронно записывает всю очередь.
+
+        Returns:
+            int: Количество записанных операций
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [
+                        self._pending.popleft()
+                        for _ in range(min(self.batch_size, len(self._pending)))
+                    ]
+                if not batch:
+                    return written
+                try:
+                    # Своя сессия БД, не связанная с текущим запросом
+                    with self._app.app_context():
+                        self._write(batch)
+                except Exception:
+                    with self._lock:
+                        self._pending.extendleft(reversed(batch))
+                    raise
+                written += len(batch)
+
+    def _write(self, batch):
+        states = {op[1].session_id: op[1] for op in batch}
+
+        # Идентификаторы строк chat_sessions (новые сессии создаём)
+        session_ids = {s.session_id: s.db_id for s in states.values() if s.db_id is not None}
+        missing = [s for s in states.values() if s.db_id is None]
+        if missing:
+            rows = ChatSession.query.filter(
+                ChatSession.session_id.in_([s.session_id for s in missing])
+            ).all()
+            session_ids.update((row.session_id, row.id) for row in rows)
+            created = []
+            for state in missing:
+                if state.session_id not in session_ids:
+                    row = ChatSession(session_id=state.session_id, page_url=state.page_url)
+                    db.session.add(row)
+                    created.append(row)
+            db.session.flush()
+            session_ids.update((row.session_id, row.id) for row in created)
+
+        inserted = []
+        summaries = {}
+        for op in batch:
+            state = op[1]
+            if op[0] == 'message':
+                message = op[2]
+                row = ChatMessage(
+                    session_id=session_ids[state.session_id],
+                    role=message.role,
+                    content=message.content,
+                    created_at=message.created_at
+                )
+                db.session.add(row)
+                inserted.append((message, row))
+            else:
+                summaries[session_ids[state.session_id]] = (op[2], op[3])
+
+        db.session.flush()
+        message_ids = [(message, row.id) for message, row in inserted]
+
+        for db_id, (summary, until_id) in summaries.items():
+            ChatSession.query.filter_by(id=db_id).update(
+                {'summary': summary, 'summary_until_id': until_id},
+                synchronize_session=False
+            )
+        db.session.commit()
+
+        # id раздаём только после успешного коммита
+        for state in states.values():
+            state.db_id = session_ids[state.session_id]
+        for message, message_id in message_ids:
+            message.id = message_id
+
+    def _run(self):
+        failures = 0
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                failures = 0
+            except Exception:
+                failures += 1
+                logger.exception(
+                    'Chat write-behind flush failed (%d pending)', self.pending_count()
+                )
+                time.sleep(min(30, 2 ** failures))
+
+    def shutdown(self):
+        """Останавливает фоновый поток и записывает остаток очереди."""
+        if self._pid != os.getpid():
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Chat write-behind: %d operations lost on shutdown',
+                             self.pending_count())
+
+
+chat_store = ChatStore()
@@ -2,9 +2,21 @@
 Сервис чатбота с OpenAI
 """
 
+import itertools
 import os
-from openai import OpenAI
+import logging
+import threading
+import time
 from app.models import ChatbotInstruction
+from app.services.answer_cache import answer_cache, answer_cache_version
+from app.services.conversation import window_messages, summarize_messages
+from app.services.intents import intent_classifier
+from app.services.knowledge import KnowledgeIndex, get_knowledge_version
+from app.services.openai_client import get_openai_client
+from app.services.tracing import get_trace
+from app.services.vector_index import get_vector_index
+
+logger = logging.getLogger(__name__)
 
 
 class ChatbotService:
@@ -130,80 +142,347 @@ BEISPIEL-ANTWORTEN:
 {instructions}
 """
     
+    # Индекс и шаблон промпта на воркер: {'version': ..., 'index': ..., 'template': ...}
+    _prompt_cache = {}
+    _prompt_lock = threading.Lock()
+    
+    # Ограничение одновременных запросов к OpenAI на воркер
+    _llm_slots = threading.BoundedSemaphore(int(os.environ.get('CHATBOT_MAX_CONCURRENCY', 8)))
+    QUEUE_TIMEOUT = float(os.environ.get('CHATBOT_QUEUE_TIMEOUT', 10))
+    
+    # Поиск по базе знаний: сколько записей и токенов добавлять в промпт
+    KNOWLEDGE_TOP_K = int(os.environ.get('CHATBOT_KNOWLEDGE_TOP_K', 5))
+    KNOWLEDGE_TOKEN_BUDGET = int(os.environ.get('CHATBOT_KNOWLEDGE_TOKENS', 1200))
+    
+    # Семантический поиск: статьи блога в ответе и порог сходства
+    ARTICLE_TOP_K = int(os.environ.get('CHATBOT_ARTICLE_TOP_K', 2))
+    SEMANTIC_MIN_SCORE = float(os.environ.get('CHATBOT_SEMANTIC_MIN_SCORE', 0.15))
+    
+    # Окно истории: бюджет токенов для свежих реплик и для резюме старых
+    HISTORY_TOKEN_BUDGET = int(os.environ.get('CHATBOT_HISTORY_TOKENS', 1500))
+    SUMMARY_TOKEN_BUDGET = int(os.environ.get('CHATBOT_SUMMARY_TOKENS', 300))
+    HISTORY_MAX_MESSAGES = int(os.environ.get('CHATBOT_HISTORY_MAX_MESSAGES', 40))
+    
     def __init__(self):
         """Initialisiert den Chatbot-Service."""
-        self.client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+        self.client = get_openai_client()
         self.model = os.environ.get('CHATBOT_MODEL', 'gpt-4o-mini')
+        # True, wenn statt einer LLM-Antwort FALLBACK_/BUSY_RESPONSE kam
+        self.degraded = False
     
-    def get_knowledge_base(self):
-        """Lädt die Wissensbasis aus der Datenbank."""
-        instructions = ChatbotInstruction.get_all_active()
+    def get_knowledge_index(self):
+        """
+        Liefert den Suchindex und die vorbereitete Prompt-Vorlage.
         
-        if not instructions:
-            return "Keine spezifischen Produktinformationen geladen."
+        Beides wird pro Worker zwischengespeichert und nur neu aufgebaut,
+        wenn sich die Version der Wissensbasis ändert.
+        """
+        version = get_knowledge_version()
+        cached = ChatbotService._prompt_cache
+        if cached.get('version') == version:
+            get_trace().set('prompt_cache', 'hit')
+            return cached
+        
+        get_trace().set('prompt_cache', 'miss')
+        with ChatbotService._prompt_lock:
+            cached = ChatbotService._prompt_cache
+            if cached.get('version') == version:
+                return cached
+            
+            index = KnowledgeIndex(ChatbotInstruction.get_all_active())
+            template = self.SYSTEM_PROMPT.format(
+                knowledge_base='{knowledge_base}',
+                instructions=self.get_instructions(index)
+            )
+            cached = {'version': version, 'index': index, 'template': template}
+            ChatbotService._prompt_cache = cached
+            return cached
+    
+    def semantic_search(self, user_message, kind, top_k):
+        """Semantische Suche im lokalen Vektorindex (Fehler werden ignoriert)."""
+        if not user_message:
+            return []
+        try:
+            return get_vector_index().search(
+                user_message,
+                top_k=top_k,
+                kind=kind,
+                min_score=self.SEMANTIC_MIN_SCORE
+            )
+        except Exception as e:
+            logger.error(f'Semantic search failed: {e}')
+            return []
+    
+    def get_knowledge_base(self, user_message=None):
+        """Wählt die zur Nachricht passenden Einträge der Wissensbasis aus."""
+        index = self.get_knowledge_index()['index']
+        related = self.semantic_search(user_message, 'instruction', self.KNOWLEDGE_TOP_K)
+        entries = index.select(
+            user_message,
+            top_k=self.KNOWLEDGE_TOP_K,
+            token_budget=self.KNOWLEDGE_TOKEN_BUDGET,
+            related_ids=[meta['id'] for _, meta in related]
+        )
+        
+        knowledge = [e['context'] for e in entries]
+        
+        # Passende Magazin-Artikel mit Link
+        articles = self.semantic_search(user_message, 'post', self.ARTICLE_TOP_K)
+        if articles:
+            lines = ["PASSENDE ARTIKEL AUS UNSEREM MAGAZIN (bei Bedarf mit Link empfehlen):"]
+            for _, meta in articles:
+                lines.append(f"• {meta['title']} ({meta['url']}): {meta['snippet']}")
+            knowledge.append("\n".join(lines))
         
-        knowledge = []
-        for inst in instructions:
-            knowledge.append(inst.to_context())
+        if not knowledge:
+            return "Keine spezifischen Produktinformationen geladen."
         
         return "\n\n".join(knowledge)
     
-    def get_instructions(self):
-        """Lädt zusätzliche Anweisungen."""
-        instructions = ChatbotInstruction.get_by_type('instruction')
+    def get_instructions(self, index):
+        """Liefert zusätzliche Anweisungen aus dem Index."""
+        instructions = index.entries_of_type('instruction')
         
         if not instructions:
             return "Keine zusätzlichen Anweisungen."
         
-        return "\n".join([i.content for i in instructions])
+        return "\n".join([i['content'] for i in instructions])
     
-    def build_system_prompt(self):
-        """Erstellt den System-Prompt mit aktuellem Wissen."""
-        return self.SYSTEM_PROMPT.format(
-            knowledge_base=self.get_knowledge_base(),
-            instructions=self.get_instructions()
-        )
+    def build_system_prompt(self, user_message=None):
+        """Erstellt den System-Prompt mit dem zur Nachricht passenden Wissen."""
+        template = self.get_knowledge_index()['template']
+        return template.replace('{knowledge_base}', self.get_knowledge_base(user_message))
+    
+    FALLBACK_RESPONSE = (
+        "Entschuldigung, ich habe gerade technische Schwierigkeiten. "
+        "Bitte kontaktieren Sie uns direkt unter 069 90475570 oder "
+        "info@hermitage-frankfurt.de. Wir helfen Ihnen gerne! 🙏"
+    )
     
-    def get_response(self, user_message, chat_history=None):
+    BUSY_RESPONSE = (
+        "Im Moment sind sehr viele Anfragen bei mir eingegangen. "
+        "Bitte versuchen Sie es in einem Augenblick erneut oder rufen Sie "
+        "uns an: 069 90475570 😊"
+    )
+    
+    def prepare_history(self, chat_session):
         """
-        Generiert eine Antwort auf die Benutzernachricht.
+        Liefert die Historie für den Prompt und aktualisiert die Zusammenfassung.
+        
+        Die jüngsten Nachrichten füllen das Token-Budget; ältere werden in
+        die gespeicherte Zusammenfassung der Sitzung gefaltet.
         
         Args:
-            user_message: Die Nachricht des Benutzers
-            chat_history: Bisherige Konversation [{"role": "...", "content": "..."}]
+            chat_session: ChatSessionState aus dem chat_store
         
         Returns:
-            Die Antwort des Assistenten als String
+            (chat_history, summary)
         """
+        messages = chat_session.get_messages(
+            limit=self.HISTORY_MAX_MESSAGES,
+            after_id=chat_session.summary_until_id
+        )
+        kept, dropped = window_messages(messages, self.HISTORY_TOKEN_BUDGET)
+        
+        # Noch nicht gespeicherte Nachrichten (id None) erst nach dem Flush falten
+        dropped = list(itertools.takewhile(lambda m: m.id is not None, dropped))
+        if dropped:
+            chat_session.summary = summarize_messages(
+                chat_session.summary, dropped, self.SUMMARY_TOKEN_BUDGET
+            )
+            # Alte JSON-Nachrichten haben id 0: 0 = alle gefaltet
+            chat_session.summary_until_id = max(m.id for m in dropped)
+        
+        history = [{'role': m.role, 'content': m.content} for m in kept]
+        return history, chat_session.summary
+    
+    def build_messages(self, user_message, chat_history=None, summary=None):
+        """Stellt die Nachrichtenliste für die OpenAI API zusammen."""
         messages = [
-            {"role": "system", "content": self.build_system_prompt()}
+            {"role": "system", "content": self.build_system_prompt(user_message)}
         ]
         
-        # Füge Chat-Historie hinzu (letzte 10 Nachrichten)
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": f"Bisheriger Gesprächsverlauf (Zusammenfassung):\n{summary}"
+            })
+        
+        # Füge Chat-Historie im Token-Budget hinzu
         if chat_history:
-            messages.extend(chat_history[-10:])
+            kept, _ = window_messages(chat_history, self.HISTORY_TOKEN_BUDGET)
+            messages.extend(kept)
         
         # Füge aktuelle Nachricht hinzu (falls nicht schon in Historie)
         if not chat_history or chat_history[-1].get('content') != user_message:
             messages.append({"role": "user", "content": user_message})
         
+        return messages
+    
+    def quick_response(self, user_message, first_turn=False):
+        """
+        Antwort ohne LLM auf die erste Frage: einfache Fragen (Öffnungszeiten,
+        Adresse, ...) und die zwischengespeicherte Antwort (Quick-Reply).
+        Im laufenden Gespräch hängt die Bedeutung vom Verlauf ab - dort
+        antwortet immer das LLM.
+        
+        Wird vor get_response/stream_response aufgerufen, damit solche
+        Antworten keinen LLM-Slot belegen.
+        
+        Args:
+            user_message: Die Nachricht des Benutzers
+            first_turn: Erste Nachricht der Konversation
+        
+        Returns:
+            Die Antwort oder None, wenn das LLM gebraucht wird
+        """
+        if not first_turn:
+            return None
+        trace = get_trace()
+        
+        quick_answer = intent_classifier.answer(user_message)
+        trace.set('intent_fast_path', 'hit' if quick_answer else 'miss')
+        if quick_answer:
+            return quick_answer
+        
+        cached = answer_cache.get(user_message, answer_cache_version())
+        trace.set('answer_cache', 'hit' if cached else 'miss')
+        return cached
+    
+    def get_response(self, user_message, chat_history=None, summary=None):
+        """
+        Generiert eine Antwort des LLM auf die Benutzernachricht.
+        
+        Args:
+            user_message: Die Nachricht des Benutzers
+            chat_history: Bisherige Konversation [{"role": "...", "content": "..."}]
+            summary: Zusammenfassung älterer Nachrichten
+        
+        Returns:
+            Die Antwort des Assistenten als String
+        """
+        trace = get_trace()
+        
+        # Antwort auf die erste Frage kommt in den Cache (siehe quick_response)
+        first_turn = not summary and self.is_first_turn(user_message, chat_history)
+        version = answer_cache_version() if first_turn else None
+        
+        with trace.phase('prompt'):
+            messages = self.build_messages(user_message, chat_history, summary)
+        
+        # Kein freier Slot: schnell antworten statt den Worker zu blockieren
+        with trace.phase('queue'):
+            acquired = self._llm_slots.acquire(timeout=self.QUEUE_TIMEOUT)
+        if not acquired:
+            trace.set('llm', 'busy')
+            self.degraded = True
+            return self.BUSY_RESPONSE
+        
+        try:
+            with trace.phase('llm'):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.7,
+                )
+            self._record_usage(trace, response.usage)
+            
+            answer = response.choices[0].message.content
+            if first_turn and answer:
+                answer_cache.set(user_message, version, answer)
+            return answer
+        
+        except Exception as e:
+            # Fallback bei API-Fehler
+            logger.error(f'OpenAI request failed: {e}')
+            trace.set('llm', 'error')
+            self.degraded = True
+            return self.FALLBACK_RESPONSE
+        
+        finally:
+            self._llm_slots.release()
+    
+    def stream_response(self, user_message, chat_history=None, summary=None):
+        """
+        Generiert die Antwort des LLM als Stream von Text-Fragmenten.
+        
+        Args:
+            user_message: Die Nachricht des Benutzers
+            chat_history: Bisherige Konversation [{"role": "...", "content": "..."}]
+            summary: Zusammenfassung älterer Nachrichten
+        
+        Yields:
+            Text-Fragmente der Antwort, sobald sie von OpenAI eintreffen
+        """
+        trace = get_trace()
+        
+        first_turn = not summary and self.is_first_turn(user_message, chat_history)
+        version = answer_cache_version() if first_turn else None
+        
+        with trace.phase('prompt'):
+            messages = self.build_messages(user_message, chat_history, summary)
+        received = []
+        
+        with trace.phase('queue'):
+            acquired = self._llm_slots.acquire(timeout=self.QUEUE_TIMEOUT)
+        if not acquired:
+            trace.set('llm', 'busy')
+            self.degraded = True
+            yield self.BUSY_RESPONSE
+            return
+        
+        llm_started = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
+            stream = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 max_tokens=500,
                 temperature=0.7,
+                stream=True,
+                stream_options={"include_usage": True},
             )
             
-            return response.choices[0].message.content
+            for chunk in stream:
+                # Letztes Fragment enthält nur die Token-Statistik
+                if getattr(chunk, 'usage', None):
+                    self._record_usage(trace, chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    received.append(delta)
+                    yield delta
+            
+            if first_turn and received:
+                answer_cache.set(user_message, version, ''.join(received))
         
         except Exception as e:
-            # Fallback bei API-Fehler
-            return (
-                "Entschuldigung, ich habe gerade technische Schwierigkeiten. "
-                "Bitte kontaktieren Sie uns direkt unter 069 90475570 oder "
-                "info@hermitage-frankfurt.de. Wir helfen Ihnen gerne! 🙏"
-            )
+            # Fallback nur, wenn noch nichts beim Besucher angekommen ist
+            logger.error(f'OpenAI stream failed: {e}')
+            trace.set('llm', 'error')
+            self.degraded = True
+            if not received:
+                yield self.FALLBACK_RESPONSE
+        
+        finally:
+            self._llm_slots.release()
+            trace.phases['llm'] = (time.perf_counter() - llm_started) * 1000
+    
+    @staticmethod
+    def _record_usage(trace, usage):
+        """Überträgt die Token-Statistik von OpenAI in das Trace."""
+        if usage is None:
+            return
+        trace.set('prompt_tokens', usage.prompt_tokens)
+        trace.set('completion_tokens', usage.completion_tokens)
+    
+    @staticmethod
+    def is_first_turn(user_message, chat_history=None):
+        """Prüft, ob es die erste Nachricht der Konversation ist."""
+        if not chat_history:
+            return True
+        return len(chat_history) == 1 and chat_history[0].get('content') == user_message
     
     def is_lead_intent(self, message):
         """Prüft, ob der Benutzer Kontaktdaten hinterlassen möchte."""
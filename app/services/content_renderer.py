@@ -0,0 +1,78 @@
+"""
+Рендеринг статей блога: Markdown -> безопасный HTML
+Выполняется один раз при сохранении статьи (генератор, админка, CLI),
+а не при каждом просмотре. Заодно строится оглавление по заголовкам
+H2/H3 и оценивается время чтения.
+"""
+
+import html
+import math
+import re
+import markdown
+import nh3
+from markdown.extensions.toc import slugify_unicode
+
+WORDS_PER_MINUTE = 200
+
+ALLOWED_TAGS = {
+    'p', 'br', 'hr', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'strong', 'em', 'b', 'i', 'u', 's', 'sub', 'sup', 'mark', 'small',
+    'ul', 'ol', 'li', 'dl', 'dt', 'dd', 'blockquote', 'code', 'pre',
+    'a', 'img', 'figure', 'figcaption',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height', 'loading'},
+    'h2': {'id'}, 'h3': {'id'}, 'h4': {'id'}, 'h5': {'id'}, 'h6': {'id'},
+    'th': {'colspan', 'rowspan'}, 'td': {'colspan', 'rowspan'},
+}
+URL_SCHEMES = {'http', 'https', 'mailto', 'tel'}
+
+_H1_RE = re.compile(r'<(/?)h1\b', re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def _flatten_toc(tokens, result):
+    for token in tokens:
+        result.append({
+            'id': token['id'],
+            'name': html.unescape(token['name']),
+            'level': token['level'],
+        })
+        _flatten_toc(token['children'], result)
+    return result
+
+
+def reading_time(text):
+    """Время чтения в минутах (не меньше 1)."""
+    words = len(_TAG_RE.sub(' ', text or '').split())
+    return max(1, math.ceil(words / WORDS_PER_MINUTE))
+
+
+def render_content(text):
+    """
+    Преобразует Markdown (или старый HTML) статьи.
+
+    Returns:
+        dict: html, toc ([{'id', 'name', 'level'}]), reading_time
+    """
+    md = markdown.Markdown(
+        extensions=['extra', 'sane_lists', 'toc'],
+        extension_configs={'toc': {'slugify': slugify_unicode, 'toc_depth': '2-3'}}
+    )
+    rendered = md.convert(text or '')
+    # Заголовок H1 на странице один - название статьи
+    rendered = _H1_RE.sub(r'<\1h2', rendered)
+    clean = nh3.clean(
+        rendered,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        url_schemes=URL_SCHEMES,
+        clean_content_tags={'script', 'style'},
+    )
+    return {
+        'html': clean,
+        'toc': _flatten_toc(md.toc_tokens, []),
+        'reading_time': reading_time(clean),
+    }
@@ -0,0 +1,69 @@
+"""
+Окно истории чата по бюджету токенов и скользящее краткое содержание
+Свежие реплики попадают в промпт целиком, пока хватает бюджета; более
+старые сворачиваются в компактное резюме, которое хранится в ChatSession.
+Резюме строится локально (без запроса к LLM), поэтому не добавляет задержки.
+"""
+
+import re
+from app.services.knowledge import estimate_tokens
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+ROLE_LABELS = {
+    'user': 'Kunde',
+    'assistant': 'Berater',
+}
+
+
+def window_messages(messages, token_budget):
+    """
+    Делит сообщения на свежие (в пределах бюджета) и вытесненные.
+    
+    Последнее сообщение попадает в окно всегда.
+    
+    Args:
+        messages: Сообщения в хронологическом порядке (объекты или dict)
+        token_budget: Бюджет токенов для окна
+    
+    Returns:
+        (kept, dropped) - оба списка в хронологическом порядке
+    """
+    used = 0
+    split = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        tokens = estimate_tokens(_content(messages[i])) + 4  # служебные токены роли
+        if used + tokens > token_budget and split < len(messages):
+            break
+        used += tokens
+        split = i
+    return messages[split:], messages[:split]
+
+
+def summarize_messages(previous_summary, messages, token_budget, line_chars=160):
+    """
+    Дополняет резюме вытесненными сообщениями (экстрактивно).
+    
+    Каждая реплика сокращается до первого предложения; при превышении
+    бюджета отбрасываются самые старые строки резюме.
+    """
+    lines = previous_summary.splitlines() if previous_summary else []
+    for message in messages:
+        content = ' '.join(_content(message).split())
+        first = _SENTENCE_RE.split(content, maxsplit=1)[0]
+        if len(first) > line_chars:
+            first = first[:line_chars].rsplit(' ', 1)[0] + '…'
+        label = ROLE_LABELS.get(_role(message), _role(message))
+        lines.append(f'- {label}: {first}')
+    
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > token_budget:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+def _content(message):
+    return message['content'] if isinstance(message, dict) else message.content
+
+
+def _role(message):
+    return message['role'] if isinstance(message, dict) else message.role
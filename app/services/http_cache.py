@@ -0,0 +1,111 @@
+"""
+Условные GET-запросы (ETag / Last-Modified)
+Валидаторы считаются из дешёвых запросов к БД до рендеринга шаблона:
+если клиент (браузер, краулер) уже имеет актуальную версию, страница
+не рендерится, а отдаётся 304 Not Modified.
+"""
+
+import hashlib
+import os
+from datetime import datetime, timezone
+from flask import current_app, request, make_response
+
+_release = {}
+
+
+def _files_mtime():
+    """Время последнего изменения файлов приложения (код, шаблоны, статика)."""
+    if 'mtime' not in _release:
+        latest = 0.0
+        for root, dirs, files in os.walk(current_app.root_path):
+            dirs[:] = [d for d in dirs if d != '__pycache__']
+            for name in files:
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+        _release['mtime'] = int(latest)
+    return _release['mtime']
+
+
+def get_release_id():
+    """
+    Версия выкладки: меняется с кодом, шаблонами и статикой.
+
+    RELEASE_ID (или RENDER_GIT_COMMIT на Render.com); иначе - время
+    последнего изменения файлов приложения.
+    """
+    release = current_app.config.get('RELEASE_ID')
+    if release:
+        return release
+    return str(_files_mtime())
+
+
+def get_release_time():
+    """
+    Время выкладки (UTC): последнее изменение файлов приложения.
+
+    При выкладке файлы пишутся заново (клон, build-assets), поэтому время
+    не раньше деплоя и одинаково во всех воркерах.
+    """
+    return datetime.fromtimestamp(_files_mtime(), timezone.utc)
+
+
+def make_etag(*parts):
+    """Сильный ETag из частей состояния и версии выкладки."""
+    raw = '|'.join(str(p) for p in parts + (get_release_id(),))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+
+def _utc(value):
+    # В БД время хранится без зоны (UTC); HTTP-даты - с точностью до секунды
+    if value is None:
+        return None
+    return value.replace(microsecond=0, tzinfo=timezone.utc)
+
+
+def _last_modified(value):
+    # Новая выкладка меняет HTML без изменений в БД: Last-Modified не раньше
+    # неё, иначе If-Modified-Since давал бы 304 на страницу старых шаблонов
+    if value is None:
+        return None
+    return max(_utc(value), get_release_time())
+
+
+def _cache_control(response, max_age):
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.must_revalidate = True
+
+
+def not_modified(etag, last_modified=None):
+    """
+    Ответ 304, если у клиента актуальная версия, иначе None.
+
+    If-None-Match имеет приоритет над If-Modified-Since (RFC 9110).
+    ETag включает версию выкладки (make_etag), Last-Modified - не раньше
+    времени выкладки.
+    """
+    last_modified = _last_modified(last_modified)
+    if request.if_none_match:
+        matched = request.if_none_match.contains(etag)
+    elif request.if_modified_since and last_modified:
+        matched = last_modified <= request.if_modified_since
+    else:
+        matched = False
+    if not matched:
+        return None
+
+    response = make_response('', 304)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    _cache_control(response, current_app.config.get('BLOG_CACHE_MAX_AGE', 300))
+    return response
+
+
+def cached_response(body, etag, last_modified=None):
+    """Ответ с валидаторами и Cache-Control."""
+    response = make_response(body)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = _last_modified(last_modified)
+    _cache_control(response, current_app.config.get('BLOG_CACHE_MAX_AGE', 300))
+    return response
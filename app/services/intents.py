@@ -0,0 +1,221 @@
+"""
+Быстрый путь для простых вопросов чатбота
+Приветствия, часы работы, адрес, парковка и телефон распознаются локально
+(скомпилированные шаблоны + простая модель оценки) и получают готовый ответ
+за микросекунды. Всё остальное уходит в ChatbotService.get_response.
+
+Интент засчитывается, только если в сообщении есть его опорный термин
+(ANCHORS); просьбы о звонке и вопросы о товарах (NEGATIVE) всегда уходят
+в LLM. Быстрый путь работает только для первой фразы разговора.
+"""
+
+import re
+import threading
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# «Wo seid ihr?», «Wo finde ich Sie?», «Wo ist euer Showroom?» - но не «Wo sind die Preise?»
+_WHERE_ARE_YOU = (
+    r'\bwo\s+(seid\s+ihr|sind\s+sie|finde\w*\s+(ich\s+|man\s+)?(euch|sie)'
+    r'|befinde[nt]?\s+(ihr|sie)(\s+sich)?'
+    r'|(ist|liegt)\s+(der|das|ihr|euer|eure)\s+(showroom|laden|geschäft|ausstellung))\b'
+)
+
+# Слова, которые не мешают распознаванию («Wann habt ihr denn offen?»)
+STOPWORDS = {
+    'und', 'oder', 'aber', 'auch', 'noch', 'denn', 'mal', 'bitte', 'danke',
+    'ich', 'wir', 'ihr', 'sie', 'euch', 'ihnen', 'man', 'es', 'du', 'dich',
+    'der', 'die', 'das', 'den', 'dem', 'ein', 'eine', 'einen', 'ist', 'sind',
+    'hat', 'habt', 'haben', 'gibt', 'gibts', 'kann', 'können', 'könnte',
+    'wie', 'was', 'wo', 'wann', 'welche', 'welcher', 'ihre', 'eure', 'euer',
+    'bei', 'zu', 'zum', 'zur', 'im', 'in', 'an', 'am', 'auf', 'für', 'von',
+    'mit', 'vor', 'da', 'dort', 'hier', 'so', 'sehr', 'gerne', 'gern',
+    'schon', 'heute', 'morgen', 'ja', 'nein', 'kurz', 'frage', 'eine',
+    'hermitage', 'showroom', 'laden', 'geschäft', 'ausstellung',
+    'please', 'the', 'your', 'you', 'is', 'are', 'what', 'where', 'do', 'have',
+}
+
+
+class IntentClassifier:
+    """Классификатор интентов: шаблоны с весами и штраф за «лишние» слова."""
+    
+    # intent -> [(шаблон, вес)]
+    PATTERNS = {
+        'greeting': [
+            (r'^\W*(hallo|hi|hey|moin|servus|guten\s+(tag|morgen|abend)|gr[üu](ß|ss)\s*gott|hello)\b', 1.0),
+        ],
+        'opening_hours': [
+            (r'öffnungszeit\w*|oeffnungszeit\w*|opening\s+hours', 2.0),
+            (r'geöffnet|geoeffnet', 1.0),
+            (r'\boffen\b|\bauf\b|\bopen\b', 0.6),
+            (r'\bwann\b.*\b(offen|auf|geöffnet)\b', 1.0),
+            (r'\b(heute|morgen|samstag|sonntag|wochenende|feiertag\w*|uhrzeit\w*|uhr)\b', 0.5),
+        ],
+        'address': [
+            (r'\b(adresse|anschrift|standort|anfahrt|wegbeschreibung|address|location)\b', 2.0),
+            (_WHERE_ARE_YOU, 2.0),
+            (r'\bwie\s+komme\s+ich\s+(zu\s+(euch|ihnen)|hin)\b|\bhinkommen\b|\bnavi\w*', 1.5),
+        ],
+        'parking': [
+            (r'parkpl(a|ä|ae)tz\w*|\bparken\b|parkmöglichkeit\w*|\bparking\b', 2.0),
+        ],
+        'phone': [
+            (r'telefon\w*|\brufnummer\b|\bhotline\b|\bphone\b', 2.0),
+            (r'\bnummer\b|\banrufen\b', 1.0),
+        ],
+    }
+    
+    # Без опорного термина интент не засчитывается («Wo finde ich Marmor?»)
+    ANCHORS = {
+        'greeting': PATTERNS['greeting'][0][0],
+        'opening_hours': (
+            r'öffnungszeit\w*|oeffnungszeit\w*|opening\s+hours|geöffnet|geoeffnet'
+            r'|\boffen\b|\bopen\b|\bwann\b.*\bauf\b|\bauf\W*$'
+        ),
+        'address': (
+            r'\b(adresse|anschrift|standort|anfahrt|wegbeschreibung|address|location)\b'
+            r'|' + _WHERE_ARE_YOU + r'|\bwie\s+komme\s+ich\s+(zu\s+(euch|ihnen)|hin)\b|\bhinkommen\b'
+        ),
+        'parking': PATTERNS['parking'][0][0],
+        'phone': (
+            r'telefon\w*|\brufnummer\b|\bhotline\b|\bphone\b'
+            r'|\b(eure|ihre)\s+nummer\b|\b(euch|sie)\s+anrufen\b'
+        ),
+    }
+    
+    # Просьба перезвонить (это лид) и вопросы о товарах и ценах - всегда LLM
+    NEGATIVE = (
+        r'\b(mich|uns)\b.*\b(anrufen|anruf|zurückrufen|zurueckrufen|kontaktieren|melden)\b'
+        r'|\brückruf\w*|\brueckruf\w*|\bzurückruf\w*|\bruf\w*\s+(sie\s+)?(mich|uns)\b',
+        r'fliese\w*|\bmarmor\w*|\bparkett\w*|\bvinyl\w*|\blaminat\w*|\bmosaik\w*'
+        r'|\bfeinsteinzeug\w*|\bkeramik\w*|\bnaturstein\w*|\bplatte\w*|\bprodukt\w*|\bartikel\w*'
+        r'|\bmuster\w*|\bkatalog\w*|\bpreis\w*|\bkosten\b|\bkostet\b|\bangebot\w*|\brabatt\w*',
+    )
+    
+    THRESHOLD = 1.0
+    MAX_UNCOVERED_WORDS = 1
+    
+    TEMPLATES = {
+        'greeting': (
+            "Hallo und herzlich willkommen bei Hermitage Frankfurt! 👋 "
+            "Wie kann ich Ihnen helfen? Planen Sie ein neues Bad, eine Küche "
+            "oder suchen Sie Fliesen für ein anderes Projekt?"
+        ),
+        'opening_hours': (
+            "Unsere Öffnungszeiten im Showroom:\n"
+            "• Montag - Freitag: 10:00 - 18:00 Uhr\n"
+            "• Samstag: 10:00 - 14:00 Uhr\n"
+            "• Sonntag: geschlossen\n"
+            "Ein Termin ist nicht nötig – kommen Sie einfach vorbei! 😊"
+        ),
+        'address': (
+            "Sie finden uns in der Hanauer Landstraße 421, 60314 Frankfurt am Main – "
+            "über 1.000 m² Ausstellungsfläche! Tipp: Geben Sie einfach "
+            "\"Hermitage Frankfurt\" bei Google Maps ein."
+        ),
+        'parking': (
+            "Kostenlose Parkplätze gibt es direkt vor unserem Showroom in der "
+            "Hanauer Landstraße 421. 🅿️"
+        ),
+        'phone': (
+            "Sie erreichen uns telefonisch unter 069 90475570 "
+            "oder per E-Mail an info@hermitage-frankfurt.de."
+        ),
+    }
+    
+    ORDER = ('opening_hours', 'address', 'parking', 'phone')
+    
+    def __init__(self):
+        self.patterns = {
+            intent: [(re.compile(p, re.IGNORECASE | re.UNICODE), w) for p, w in patterns]
+            for intent, patterns in self.PATTERNS.items()
+        }
+        self.anchors = {
+            intent: re.compile(p, re.IGNORECASE | re.UNICODE)
+            for intent, p in self.ANCHORS.items()
+        }
+        self.negative = [re.compile(p, re.IGNORECASE | re.UNICODE) for p in self.NEGATIVE]
+        self.hits = {intent: 0 for intent in self.PATTERNS}
+        self.handled = 0
+        self.fallthrough = 0
+        self._lock = threading.Lock()
+    
+    def score(self, message):
+        """
+        Оценивает сообщение.
+        
+        Returns:
+            (scores, uncovered) - баллы по интентам и число слов, которые
+            не объясняются ни одним шаблоном и не являются стоп-словами
+        """
+        text = (message or '').strip().lower()
+        covered = [False] * len(text)
+        scores = {}
+        
+        for intent, patterns in self.patterns.items():
+            for pattern, weight in patterns:
+                for match in pattern.finditer(text):
+                    scores[intent] = scores.get(intent, 0.0) + weight
+                    for i in range(*match.span()):
+                        covered[i] = True
+        
+        uncovered = 0
+        for word in _WORD_RE.finditer(text):
+            if word.group() in STOPWORDS or word.group().isdigit():
+                continue
+            if not any(covered[word.start():word.end()]):
+                uncovered += 1
+        return scores, uncovered
+    
+    def classify(self, message):
+        """Возвращает список распознанных интентов (пустой - нужен LLM)."""
+        text = (message or '').strip().lower()
+        if any(pattern.search(text) for pattern in self.negative):
+            return []
+        scores, uncovered = self.score(text)
+        if uncovered > self.MAX_UNCOVERED_WORDS:
+            return []
+        return [intent for intent in ('greeting',) + self.ORDER
+                if scores.get(intent, 0.0) >= self.THRESHOLD and self.anchors[intent].search(text)]
+    
+    def answer(self, message):
+        """
+        Отвечает по шаблону, если сообщение простое, иначе None.
+        
+        Счётчики попаданий ведутся по интентам для статистики в админке.
+        """
+        intents = self.classify(message)
+        with self._lock:
+            if not intents:
+                self.fallthrough += 1
+                return None
+            self.handled += 1
+            for intent in intents:
+                self.hits[intent] += 1
+        
+        topical = [i for i in intents if i != 'greeting']
+        if not topical:
+            return self.TEMPLATES['greeting']
+        
+        parts = [self.TEMPLATES[i] for i in topical]
+        if 'greeting' in intents:
+            parts.insert(0, "Hallo! 👋")
+        return "\n\n".join(parts)
+    
+    def stats(self):
+        """
+        Статистика: попадания по интентам и доля сообщений без LLM
+        (сообщение с несколькими интентами считается один раз).
+        """
+        with self._lock:
+            total = self.handled + self.fallthrough
+            return {
+                'hits': dict(self.hits),
+                'handled': self.handled,
+                'fallthrough': self.fallthrough,
+                'handled_rate': round(self.handled / total, 3) if total else 0.0,
+            }
+
+
+# Классификатор процесса (воркера)
+intent_classifier = IntentClassifier()
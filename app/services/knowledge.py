@@ -0,0 +1,193 @@
+"""
+Версия и поиск по базе знаний чатбота
+Метка версии хранится в файле (instance/knowledge.version), поэтому её видят
+все воркеры gunicorn, а проверка стоит один stat() вместо запроса к БД.
+"""
+
+import os
+import re
+import threading
+import uuid
+from flask import current_app
+
+_lock = threading.Lock()
+_state = {'path': None, 'mtime': None, 'version': '0'}
+
+
+def _version_file():
+    """Путь к файлу с версией базы знаний."""
+    return current_app.config.get('KNOWLEDGE_VERSION_FILE') or \
+        os.path.join(current_app.instance_path, 'knowledge.version')
+
+
+def get_knowledge_version():
+    """Возвращает текущую версию базы знаний."""
+    path = _version_file()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return '0'
+
+    if _state['path'] == path and _state['mtime'] == mtime:
+        return _state['version']
+
+    with _lock:
+        try:
+            with open(path, encoding='utf-8') as f:
+                version = f.read().strip() or '0'
+        except FileNotFoundError:
+            return '0'
+        _state.update(path=path, mtime=mtime, version=version)
+        return version
+
+
+def bump_knowledge_version():
+    """Меняет версию базы знаний (вызывать после commit изменений инструкций)."""
+    path = _version_file()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    version = uuid.uuid4().hex
+
+    with _lock:
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(tmp_path, path)
+        _state.update(path=path, mtime=os.stat(path).st_mtime_ns, version=version)
+
+    return version
+
+
+# ============ Поиск по базе знаний ============
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_SUFFIXES = ('ungen', 'en', 'er', 'es', 'e', 'n', 's')
+
+
+def estimate_tokens(text):
+    """Грубая локальная оценка числа токенов (~4 символа на токен)."""
+    if not text:
+        return 0
+    return len(text) // 4 + 1
+
+
+def _stem(word):
+    """Упрощённый стемминг для немецкого: отрезает частые окончания."""
+    for suffix in _SUFFIXES:
+        if len(word) - len(suffix) >= 4 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """Разбивает текст на нормализованные основы слов."""
+    return [_stem(w) for w in _WORD_RE.findall((text or '').lower()) if len(w) > 2]
+
+
+class KnowledgeIndex:
+    """
+    Инвертированный индекс по ключевым словам и заголовкам инструкций.
+    
+    Хранит снимок активных инструкций (без ORM-объектов), поэтому его можно
+    держать в памяти воркера до смены версии базы знаний.
+    """
+    
+    KEYWORD_WEIGHT = 3.0
+    TITLE_WEIGHT = 1.0
+    COMPOUND_MIN_LENGTH = 8
+    
+    # Типы, которые попадают в промпт всегда, независимо от запроса
+    ALWAYS_ON_TYPES = ('company',)
+    
+    def __init__(self, instructions):
+        self.entries = []
+        self.always_on = []
+        self.postings = {}   # основа слова -> {номер записи: вес}
+        self.phrases = []    # (фраза из нескольких слов, номер записи)
+        
+        for inst in instructions:
+            entry = {
+                'id': inst.id,
+                'type': inst.instruction_type,
+                'title': inst.title,
+                'content': inst.content,
+                'priority': inst.priority or 0,
+                'context': inst.to_context(),
+            }
+            entry['tokens'] = estimate_tokens(entry['context'])
+            idx = len(self.entries)
+            self.entries.append(entry)
+            
+            # Поведенческие инструкции идут в отдельный раздел промпта
+            if inst.instruction_type == 'instruction':
+                continue
+            if inst.instruction_type in self.ALWAYS_ON_TYPES:
+                self.always_on.append(idx)
+                continue
+            
+            for keyword in inst.keywords or []:
+                keyword = (keyword or '').strip().lower()
+                if not keyword:
+                    continue
+                stems = tokenize(keyword)
+                if len(stems) > 1:
+                    self.phrases.append((keyword, idx))
+                for stem in stems:
+                    self._add_posting(stem, idx, self.KEYWORD_WEIGHT)
+            
+            for stem in tokenize(inst.title):
+                self._add_posting(stem, idx, self.TITLE_WEIGHT)
+    
+    def _add_posting(self, stem, idx, weight):
+        postings = self.postings.setdefault(stem, {})
+        postings[idx] = max(postings.get(idx, 0), weight)
+    
+    def entries_of_type(self, instruction_type):
+        """Возвращает записи заданного типа (в порядке приоритета)."""
+        return [e for e in self.entries if e['type'] == instruction_type]
+    
+    def search(self, query, top_k=5):
+        """Возвращает номера записей, отсортированные по релевантности."""
+        scores = {}
+        for token in set(tokenize(query)):
+            stems = [token]
+            # Немецкие сложные слова: "marmorfliesen" содержит "marmor"
+            if token not in self.postings and len(token) >= self.COMPOUND_MIN_LENGTH:
+                stems = [s for s in self.postings if len(s) >= 4 and s in token]
+            for stem in stems:
+                for idx, weight in self.postings.get(stem, {}).items():
+                    scores[idx] = scores.get(idx, 0) + weight
+        
+        query_lower = (query or '').lower()
+        for phrase, idx in self.phrases:
+            if phrase in query_lower:
+                scores[idx] = scores.get(idx, 0) + self.KEYWORD_WEIGHT
+        
+        ranked = sorted(
+            scores,
+            key=lambda i: (scores[i], self.entries[i]['priority']),
+            reverse=True
+        )
+        return ranked[:top_k]
+    
+    def select(self, query, top_k=5, token_budget=1200, related_ids=()):
+        """
+        Подбирает записи для промпта: сначала обязательные, затем найденные
+        по ключевым словам, затем related_ids (id инструкций из семантического
+        поиска), пока не исчерпан бюджет токенов.
+        """
+        by_id = {e['id']: i for i, e in enumerate(self.entries)}
+        related = [by_id[i] for i in related_ids if i in by_id]
+        
+        selected = []
+        used = 0
+        for idx in self.always_on + self.search(query, top_k) + related:
+            if self.entries[idx]['type'] == 'instruction':
+                continue
+            entry = self.entries[idx]
+            if idx in selected:
+                continue
+            if used + entry['tokens'] > token_budget and selected:
+                continue
+            selected.append(idx)
+            used += entry['tokens']
+        return [self.entries[i] for i in selected]
@@ -0,0 +1,337 @@
+"""
+Асинхронная отправка писем через очередь в БД (outbox)
+Запросы только добавляют строку в mail_outbox в своей транзакции. Фоновый
+поток воркера забирает созревшие письма, отправляет их через одно SMTP-
+соединение на пакет и повторяет неудачные с нарастающей задержкой.
+Лиды из чата ждут MAIL_LEAD_DIGEST_DELAY секунд и уходят одним дайджестом.
+
+Локальная проверка без настоящего SMTP:
+    python -m aiosmtpd -n -l localhost:1025
+    MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=false flask send-mail
+"""
+
+import logging
+import os
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from flask import current_app
+from app import db
+from app.models import OutboxMail, ChatSession
+
+logger = logging.getLogger(__name__)
+
+
+# ============ Постановка в очередь ============
+
+def queue_contact_message(name, email, phone, message):
+    """Ставит в очередь письмо из контактной формы (коммит - за вызывающим)."""
+    config = current_app.config
+    body = (
+        f'Neue Nachricht über das Kontaktformular\n\n'
+        f'Name: {name or "-"}\n'
+        f'E-Mail: {email or "-"}\n'
+        f'Telefon: {phone or "-"}\n\n'
+        f'{message or ""}\n'
+    )
+    mail = OutboxMail(
+        kind=OutboxMail.KIND_CONTACT,
+        recipient=config['CONTACT_EMAIL'],
+        reply_to=email or None,
+        subject=f'Kontaktanfrage von {name or email or "Website"}',
+        body=body
+    )
+    db.session.add(mail)
+    start_sender()
+    return mail
+
+
+def queue_lead_notification(chat_session):
+    """Ставит в очередь уведомление о лиде; близкие по времени лиды объединяются."""
+    config = current_app.config
+    mail = OutboxMail(
+        kind=OutboxMail.KIND_LEAD,
+        recipient=config['CONTACT_EMAIL'],
+        reply_to=chat_session.user_email or None,
+        payload={
+            'chat_session_id': chat_session.id,
+            'name': chat_session.user_name,
+            'email': chat_session.user_email,
+            'phone': chat_session.user_phone,
+            'page_url': chat_session.page_url,
+        },
+        next_attempt_at=datetime.utcnow() + timedelta(
+            seconds=config.get('MAIL_LEAD_DIGEST_DELAY', 300)
+        )
+    )
+    db.session.add(mail)
+    start_sender()
+    return mail
+
+
+# ============ Сборка писем ============
+
+def _lead_text(payload):
+    lines = [
+        f'Name: {payload.get("name") or "-"}',
+        f'E-Mail: {payload.get("email") or "-"}',
+        f'Telefon: {payload.get("phone") or "-"}',
+        f'Seite: {payload.get("page_url") or "-"}',
+    ]
+    chat_session = db.session.get(ChatSession, payload['chat_session_id']) \
+        if payload.get('chat_session_id') else None
+    messages = chat_session.get_messages(limit=6) if chat_session is not None else []
+    if messages:
+        lines.append('Letzte Nachrichten:')
+        for message in messages:
+            label = 'Kunde' if message.role == 'user' else 'Bot'
+            lines.append(f'  {label}: {message.content[:300]}')
+    return '\n'.join(lines)
+
+
+def _header(value):
+    """Значение заголовка от посетителя: без CR/LF (иначе EmailMessage падает)."""
+    return ' '.join(str(value).split())
+
+
+def group_mails(mails):
+    """
+    Делит пакет на письма: лиды одному получателю - в дайджест.
+
+    Returns:
+        list: [[OutboxMail, ...], ...]
+    """
+    groups = []
+    leads = {}
+    for mail in mails:
+        if mail.kind == OutboxMail.KIND_LEAD:
+            leads.setdefault(mail.recipient, []).append(mail)
+        else:
+            groups.append([mail])
+    return groups + list(leads.values())
+
+
+def build_message(group, sender):
+    """EmailMessage для группы из group_mails."""
+    message = EmailMessage()
+    message['From'] = sender
+    message['To'] = group[0].recipient
+    if len(group) == 1 and group[0].reply_to:
+        message['Reply-To'] = _header(group[0].reply_to)
+
+    mail = group[0]
+    if mail.kind != OutboxMail.KIND_LEAD:
+        message['Subject'] = _header(mail.subject)
+        message.set_content(mail.body or '')
+    elif len(group) == 1:
+        payload = mail.payload or {}
+        name = payload.get('name') or payload.get('email') or '-'
+        message['Subject'] = f'Neuer Lead aus dem Chat: {_header(name)}'
+        message.set_content('Neuer Lead aus dem Website-Chat\n\n' + _lead_text(payload) + '\n')
+    else:
+        message['Subject'] = f'{len(group)} neue Leads aus dem Chat'
+        parts = [
+            f'Lead {i}\n{_lead_text(mail.payload or {})}'
+            for i, mail in enumerate(group, 1)
+        ]
+        message.set_content(
+            f'{len(group)} neue Leads aus dem Website-Chat\n\n' + '\n\n'.join(parts) + '\n'
+        )
+    return message
+
+
+# ============ Отправка ============
+
+class MailSender:
+    """Отправляет созревшие письма из outbox пакетами."""
+
+    LEASE = timedelta(minutes=5)  # Сколько письмо закреплено за отправителем
+
+    def __init__(self, config):
+        self.server = config['MAIL_SERVER']
+        self.port = config['MAIL_PORT']
+        self.use_tls = config['MAIL_USE_TLS']
+        self.username = config.get('MAIL_USERNAME')
+        self.password = config.get('MAIL_PASSWORD')
+        self.sender = config['MAIL_DEFAULT_SENDER']
+        self.timeout = config.get('MAIL_TIMEOUT', 30)
+        self.batch_size = config.get('MAIL_OUTBOX_BATCH_SIZE', 50)
+        self.max_attempts = config.get('MAIL_MAX_ATTEMPTS', 8)
+        self.retry_base = config.get('MAIL_RETRY_BASE', 60)
+
+    def claim(self):
+        """
+        Закрепляет созревшие письма за этим вызовом.
+
+        Закрепление - это перенос next_attempt_at на срок аренды, поэтому
+        письма упавшего процесса снова станут доступны. Второй воркер не
+        получит те же строки: UPDATE повторно проверяет условие.
+        """
+        now = datetime.utcnow()
+        token = str(uuid.uuid4())
+        due = db.session.query(OutboxMail.id).filter(
+            OutboxMail.status == OutboxMail.STATUS_PENDING,
+            OutboxMail.next_attempt_at <= now
+        ).order_by(OutboxMail.next_attempt_at).limit(self.batch_size)
+        OutboxMail.query.filter(
+            OutboxMail.id.in_(due.scalar_subquery()),
+            OutboxMail.status == OutboxMail.STATUS_PENDING,
+            OutboxMail.next_attempt_at <= now
+        ).update({
+            'claim_token': token,
+            'next_attempt_at': now + self.LEASE
+        }, synchronize_session=False)
+
+        # Созрел хотя бы один лид - забираем и остальные ожидающие в дайджест
+        if OutboxMail.query.filter_by(claim_token=token, kind=OutboxMail.KIND_LEAD).first():
+            OutboxMail.query.filter(
+                OutboxMail.status == OutboxMail.STATUS_PENDING,
+                OutboxMail.kind == OutboxMail.KIND_LEAD,
+                OutboxMail.claim_token.is_(None),
+                OutboxMail.attempts == 0
+            ).update({
+                'claim_token': token,
+                'next_attempt_at': now + self.LEASE
+            }, synchronize_session=False)
+        db.session.commit()
+        return OutboxMail.query.filter_by(claim_token=token).order_by(OutboxMail.id).all()
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    def _failed(self, mails, error, permanent=False):
+        now = datetime.utcnow()
+        for mail in mails:
+            mail.attempts = (mail.attempts or 0) + 1
+            mail.last_error = str(error)[:500]
+            mail.claim_token = None
+            if permanent or mail.attempts >= self.max_attempts:
+                mail.status = OutboxMail.STATUS_FAILED
+                logger.error(f'Mail {mail.id} failed permanently: {error}')
+            else:
+                # 1, 2, 4, ... минут, не больше 6 часов
+                delay = min(self.retry_base * 2 ** (mail.attempts - 1), 6 * 3600)
+                mail.next_attempt_at = now + timedelta(seconds=delay)
+
+    def _build(self, group):
+        """
+        [(EmailMessage, группа)]. Письмо, которое нельзя собрать, помечается
+        failed само по себе: дайджест пересобирается без него по одному лиду.
+        """
+        try:
+            return [(build_message(group, self.sender), group)]
+        except (ValueError, TypeError) as e:
+            if len(group) > 1:
+                return [item for mail in group for item in self._build([mail])]
+            logger.error(f'Mail {group[0].id} cannot be built: {e}')
+            self._failed(group, e, permanent=True)
+            return []
+
+    def send_pending(self):
+        """
+        Отправляет один пакет через одно SMTP-соединение.
+
+        Returns:
+            (отправлено, с ошибкой)
+        """
+        mails = self.claim()
+        if not mails:
+            return 0, 0
+
+        batch = [item for group in group_mails(mails) for item in self._build(group)]
+        sent = 0
+        failed = len(mails) - sum(len(group) for _, group in batch)
+        if not batch:
+            db.session.commit()
+            return 0, failed
+        try:
+            smtp = self._connect()
+        except (smtplib.SMTPException, OSError) as e:
+            logger.warning(f'SMTP connection to {self.server}:{self.port} failed: {e}')
+            for _, group in batch:
+                self._failed(group, e)
+            db.session.commit()
+            return 0, len(mails)
+
+        try:
+            for index, (message, group) in enumerate(batch):
+                try:
+                    smtp.send_message(message)
+                except smtplib.SMTPServerDisconnected as e:
+                    # Соединение потеряно: остаток пакета - на следующую попытку
+                    for _, rest in batch[index:]:
+                        self._failed(rest, e)
+                        failed += len(rest)
+                    break
+                except smtplib.SMTPException as e:
+                    self._failed(group, e)
+                    failed += len(group)
+                    continue
+                for mail in group:
+                    mail.status = OutboxMail.STATUS_SENT
+                    mail.sent_at = datetime.utcnow()
+                    mail.claim_token = None
+                sent += len(group)
+        finally:
+            db.session.commit()
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        return sent, failed
+
+    def send_all(self):
+        """Отправляет все созревшие письма (для CLI)."""
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = self.send_pending()
+            total_sent += sent
+            total_failed += failed
+            if not sent and not failed:
+                return total_sent, total_failed
+
+
+# ============ Фоновый поток ============
+
+_lock = threading.Lock()
+_started_pid = None
+
+
+def start_sender():
+    """
+    Запускает фоновый отправитель в текущем воркере (один раз).
+    Вызывается при старте воркера gunicorn (post_worker_init) - письма,
+    оставшиеся в очереди после перезапуска, уходят без новых заявок -
+    и при постановке письма в очередь (сервер разработки).
+    """
+    global _started_pid
+    app = current_app._get_current_object()
+    if _started_pid == os.getpid() or not app.config.get('MAIL_OUTBOX_SENDER', True):
+        return
+    with _lock:
+        if _started_pid == os.getpid():
+            return
+        thread = threading.Thread(
+            target=_run, args=(app,), name='mail-outbox', daemon=True
+        )
+        thread.start()
+        _started_pid = os.getpid()
+
+
+def _run(app):
+    interval = app.config.get('MAIL_OUTBOX_INTERVAL', 30)
+    while True:
+        time.sleep(interval)
+        try:
+            with app.app_context():
+                MailSender(app.config).send_all()
+        except Exception:
+            logger.exception('Mail outbox run failed')
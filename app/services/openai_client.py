@@ -0,0 +1,68 @@
+"""
+Общий клиент OpenAI для всех сервисов
+Один клиент на процесс (воркер): пул HTTP-соединений с keep-alive
+переиспользуется чатботом и генератором блога, поэтому TLS-рукопожатие
+и DNS-запрос не повторяются на каждый запрос.
+"""
+
+import os
+import threading
+import httpx
+from openai import OpenAI
+
+_lock = threading.Lock()
+_state = {'client': None, 'pid': None}
+
+# Наибольшая пауза SDK openai между повторами (экспоненциальная, с потолком)
+MAX_RETRY_DELAY = 8.0
+
+
+def _timeout_settings():
+    """(тайм-аут, тайм-аут соединения, число повторов) из окружения."""
+    return (
+        float(os.environ.get('OPENAI_TIMEOUT', 60)),
+        float(os.environ.get('OPENAI_CONNECT_TIMEOUT', 5)),
+        int(os.environ.get('OPENAI_MAX_RETRIES', 2)),
+    )
+
+
+def max_request_seconds():
+    """Худшее время запроса к OpenAI: все попытки по тайм-ауту и паузы между ними."""
+    timeout, connect, retries = _timeout_settings()
+    return (connect + timeout) * (retries + 1) + MAX_RETRY_DELAY * retries
+
+
+def _build_client():
+    """Создаёт клиент OpenAI с настроенным пулом соединений."""
+    limits = httpx.Limits(
+        max_connections=int(os.environ.get('OPENAI_MAX_CONNECTIONS', 20)),
+        max_keepalive_connections=int(os.environ.get('OPENAI_MAX_KEEPALIVE', 10)),
+        keepalive_expiry=float(os.environ.get('OPENAI_KEEPALIVE_EXPIRY', 60)),
+    )
+    read_timeout, connect_timeout, max_retries = _timeout_settings()
+    timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+    return OpenAI(
+        api_key=os.environ.get('OPENAI_API_KEY'),
+        max_retries=max_retries,
+        timeout=timeout,
+        http_client=httpx.Client(limits=limits, timeout=timeout),
+    )
+
+
+def get_openai_client():
+    """
+    Возвращает общий клиент OpenAI текущего процесса.
+    
+    Клиент создаётся лениво при первом обращении и пересоздаётся после
+    fork(), чтобы воркеры gunicorn не делили сокеты родителя.
+    """
+    pid = os.getpid()
+    client = _state['client']
+    if client is not None and _state['pid'] == pid:
+        return client
+
+    with _lock:
+        if _state['client'] is None or _state['pid'] != pid:
+            _state['client'] = _build_client()
+            _state['pid'] = pid
+        return _state['client']
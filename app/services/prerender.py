@@ -0,0 +1,476 @@
+"""
+Статический пре-рендер публичных страниц
+`flask prerender` сохраняет HTML страниц main, статей блога, первых страниц
+списков и sitemap.xml в instance/prerender (рядом - .gz и .br), а
+PrerenderMiddleware отдаёт эти файлы без Flask, шаблонов и запросов к БД.
+
+При публикации и правке статьи (или правке Page) перерисовываются только
+затронутые файлы. Файлы прошлой выкладки (другой RELEASE_ID / шаблоны) не
+отдаются - до следующего `flask prerender` работает обычный рендеринг.
+
+Экспорт, сделанный до запуска сервера (при сборке или прошлым запуском), тоже
+не отдаётся: на бесплатном плане Render диск сбрасывается при перезапуске
+вместе с перерисовками, сделанными после публикаций, и такие файлы могут
+не совпадать с БД. Воркер при старте делает полный экспорт заново
+(start_prerender), до его окончания работает обычный рендеринг.
+"""
+
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from flask import current_app
+from werkzeug.wrappers import Request, Response
+from app.services.http_cache import get_release_id
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:  # .br не пишутся, отдаётся gzip
+        brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Windows (разработка)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+ENVIRON_KEY = 'hermitage.prerender'
+
+# Время запуска сервера (ставит gunicorn.conf.py on_starting); без него
+# (flask run, CLI) отдаётся любой экспорт текущей выкладки
+STARTED_AT_ENV = 'PRERENDER_STARTED_AT'
+
+# Эндпоинты main без пре-рендера: форма с CSRF-токеном и файлы из static
+SKIP_ENDPOINTS = {
+    'main.contact', 'main.robots', 'main.llms', 'main.ai_plugin',
+    'main.ai_txt', 'main.security_txt', 'main.humans',
+}
+
+# Page.slug -> путь страницы (остальные slug совпадают с путём)
+PAGE_PATHS = {
+    'home': '/',
+    'about': '/ueber-uns/',
+}
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.xml': 'application/xml',
+}
+
+_lock = threading.Lock()
+
+
+# ============ Файлы ============
+
+def _root():
+    return current_app.config.get('PRERENDER_DIR') or \
+        os.path.join(current_app.instance_path, 'prerender')
+
+
+def file_for_path(root, path):
+    """URL -> файл ('/blog/x/' -> root/blog/x/index.html) или None."""
+    if not path.startswith('/') or '..' in path or '\\' in path or '\x00' in path:
+        return None
+    # Только страницы и sitemap - не манифест и не сжатые варианты
+    if not (path.endswith('/') or path.endswith('.xml')):
+        return None
+    relative = path.lstrip('/')
+    if not relative or path.endswith('/'):
+        relative += 'index.html'
+    return os.path.join(root, *relative.split('/'))
+
+
+def _write_atomic(filename, data):
+    tmp_path = f'{filename}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, filename)
+
+
+def _write_variants(filename, body):
+    """Пишет файл и его сжатые варианты."""
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    _write_atomic(filename, body)
+    # mtime=0 - одинаковое содержимое даёт одинаковый .gz
+    _write_atomic(filename + '.gz', gzip.compress(body, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_atomic(filename + '.br', brotli.compress(body, quality=11))
+
+
+def _remove_variants(filename):
+    for suffix in ('', '.gz', '.br'):
+        try:
+            os.remove(filename + suffix)
+        except FileNotFoundError:
+            pass
+
+
+# ============ Манифест ============
+
+class _ManifestLock:
+    """Межпроцессная блокировка манифеста (воркеры, CLI)."""
+
+    def __init__(self, root):
+        self.path = os.path.join(root, '.lock')
+        self.file = None
+
+    def __enter__(self):
+        _lock.acquire()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, 'a')
+        if fcntl:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+        _lock.release()
+
+
+def _read_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_manifest(root, manifest):
+    _write_atomic(os.path.join(root, MANIFEST),
+                  json.dumps(manifest, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+
+
+def _started_at():
+    try:
+        return float(os.environ.get(STARTED_AT_ENV) or 0)
+    except ValueError:
+        return 0.0
+
+
+def is_current(manifest, release=None):
+    """Экспорт текущей выкладки, сделанный после запуска сервера."""
+    return bool(manifest) \
+        and manifest.get('release') == (release or get_release_id()) \
+        and manifest.get('generated_at', 0) >= _started_at()
+
+
+# ============ Рендеринг ============
+
+def public_paths():
+    """Пути страниц main без параметров и городские страницы."""
+    from app.routes.main import CITIES
+
+    paths = []
+    for rule in current_app.url_map.iter_rules():
+        if not rule.endpoint.startswith('main.') or rule.endpoint in SKIP_ENDPOINTS:
+            continue
+        if rule.arguments or 'GET' not in rule.methods:
+            continue
+        paths.append(rule.rule)
+    paths += [f'/fliesen/{city}/' for city in CITIES]
+    return sorted(set(paths))
+
+
+def listing_paths():
+    """Первые страницы списков блога (меняются при публикации)."""
+    from app.models import BlogPost
+    return ['/', '/blog/', '/sitemap.xml'] + \
+        [f'/blog/kategorie/{category}/' for category in BlogPost.CATEGORIES]
+
+
+def _post_path(slug):
+    return f'/blog/{slug}/'
+
+
+def _render(client, root, path):
+    """
+    Рендерит путь через приложение и сохраняет результат.
+
+    Returns:
+        bool: True, если файл записан (200); иначе файл удаляется
+    """
+    filename = file_for_path(root, path)
+    # Абсолютные ссылки (request.url, _external) - на боевой домен, не localhost
+    response = client.get(path, base_url=current_app.config.get('PRERENDER_BASE_URL'),
+                          environ_overrides={ENVIRON_KEY: True})
+    if response.status_code != 200:
+        _remove_variants(filename)
+        return False
+    _write_variants(filename, response.get_data())
+    return True
+
+
+def _render_paths(root, paths, manifest):
+    client = current_app.test_client()
+    count = 0
+    for path in paths:
+        try:
+            if _render(client, root, path):
+                count += 1
+            else:
+                manifest['posts'].pop(path, None)
+        except Exception as e:
+            logger.error(f'Prerender of {path} failed: {e}')
+    return count
+
+
+def prerender_all(clean=False, if_stale=False):
+    """
+    Полный экспорт: страницы main, списки блога, все опубликованные
+    статьи и sitemap.xml. Возвращает число записанных файлов.
+
+    Args:
+        if_stale: Пропустить, если актуальный экспорт уже есть (его мог
+            сделать другой воркер, пока этот ждал блокировку)
+    """
+    from app.models import BlogPost
+
+    root = _root()
+    with _ManifestLock(root):
+        if if_stale and is_current(_read_manifest(root)):
+            return 0
+        if clean:
+            for name in os.listdir(root):
+                if name in ('.lock',):
+                    continue
+                path = os.path.join(root, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+
+        posts = {
+            _post_path(slug): post_id for post_id, slug in
+            BlogPost.query.filter_by(is_published=True).with_entities(BlogPost.id, BlogPost.slug)
+        }
+        # Время начала: изменения во время рендеринга перерисует _refresh
+        manifest = {'release': get_release_id(), 'generated_at': time.time(), 'posts': dict(posts)}
+        paths = sorted(set(public_paths() + listing_paths())) + sorted(posts)
+        count = _render_paths(root, paths, manifest)
+        _write_manifest(root, manifest)
+    return count
+
+
+def _refresh(paths, posts=None, removed=()):
+    """
+    Перерисовывает пути, если экспорт уже сделан (есть манифест).
+
+    Args:
+        posts: {путь: id статьи} - новые и изменённые статьи
+        removed: Пути удалённых и снятых с публикации статей
+    """
+    root = _root()
+    manifest = _read_manifest(root)
+    # Нет экспорта или он устарел (не отдаётся) - ждём полного экспорта
+    if not is_current(manifest):
+        return 0
+    try:
+        with _ManifestLock(root):
+            manifest = _read_manifest(root)
+            if not is_current(manifest):
+                return 0
+            for path in removed:
+                manifest['posts'].pop(path, None)
+                _remove_variants(file_for_path(root, path))
+            manifest['posts'].update(posts or {})
+            count = _render_paths(root, sorted(set(paths)), manifest)
+            _write_manifest(root, manifest)
+        return count
+    except Exception as e:
+        # Ошибка пре-рендера не должна ломать сохранение в админке
+        logger.error(f'Prerender refresh failed: {e}')
+        return 0
+
+
+def refresh_post(post, related_ids=()):
+    """
+    Перерисовывает статью, списки и статьи с изменившимися похожими.
+    Неопубликованная статья удаляется из пре-рендера.
+    """
+    from app.models import BlogPost
+
+    root = _root()
+    manifest = _read_manifest(root)
+    if manifest is None:
+        return 0
+
+    # Старый адрес при смене slug
+    removed = [path for path, post_id in manifest['posts'].items()
+               if post_id == post.id and path != _post_path(post.slug)]
+    paths = listing_paths()
+    posts = {}
+    if post.is_published:
+        posts[_post_path(post.slug)] = post.id
+        paths.append(_post_path(post.slug))
+    else:
+        removed.append(_post_path(post.slug))
+
+    others = set(related_ids) - {post.id}
+    if others:
+        paths += [
+            _post_path(slug) for (slug,) in
+            BlogPost.query.filter(BlogPost.id.in_(others), BlogPost.is_published == True)
+            .with_entities(BlogPost.slug)
+        ]
+    return _refresh(paths, posts, removed)
+
+
+def remove_posts(slugs, related_ids=()):
+    """Удаляет файлы удалённых статей и перерисовывает списки и соседей."""
+    from app.models import BlogPost
+
+    paths = listing_paths()
+    if related_ids:
+        paths += [
+            _post_path(slug) for (slug,) in
+            BlogPost.query.filter(BlogPost.id.in_(list(related_ids)), BlogPost.is_published == True)
+            .with_entities(BlogPost.slug)
+        ]
+    return _refresh(paths, removed=[_post_path(slug) for slug in slugs])
+
+
+def refresh_page(page):
+    """Перерисовывает страницу после правки Page (slug -> путь)."""
+    slug = page if isinstance(page, str) else page.slug
+    if slug in PAGE_PATHS:
+        path = PAGE_PATHS[slug]
+    elif slug.startswith('fliesen-'):
+        path = f'/fliesen/{slug[len("fliesen-"):]}/'
+    else:
+        path = f'/{slug}/'
+    if path not in public_paths():
+        return 0
+    return _refresh([path])
+
+
+def start_prerender():
+    """
+    Полный экспорт в фоновом потоке при старте воркера, если актуального нет.
+    Вызывается в контексте приложения (gunicorn.conf.py post_worker_init).
+    """
+    if not current_app.config.get('PRERENDER_SERVE'):
+        return None
+    if is_current(_read_manifest(_root())):
+        return None
+    app = current_app._get_current_object()
+
+    def run():
+        try:
+            with app.app_context():
+                count = prerender_all(clean=True, if_stale=True)
+            if count:
+                logger.info(f'Prerendered {count} files on worker start')
+        except Exception as e:
+            logger.error(f'Prerender on worker start failed: {e}')
+
+    thread = threading.Thread(target=run, name='prerender', daemon=True)
+    thread.start()
+    return thread
+
+
+# ============ Отдача ============
+
+class PrerenderMiddleware:
+    """
+    WSGI-обёртка: GET/HEAD без query string отдаются из пре-рендера, если
+    файл есть и сделан для текущей выкладки после запуска сервера;
+    остальное - приложению.
+
+    Просмотры статей учитываются через view_counter (id из манифеста).
+    """
+
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, wsgi_app, app):
+        self.wsgi_app = wsgi_app
+        self.app = app
+        self.root = app.config.get('PRERENDER_DIR') or os.path.join(app.instance_path, 'prerender')
+        self.max_age = app.config.get('BLOG_CACHE_MAX_AGE', 300)
+        self._release = None
+        self._manifest = {'mtime': None, 'data': None}
+
+    def _current_manifest(self):
+        path = os.path.join(self.root, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if self._manifest['mtime'] != mtime:
+            self._manifest.update(mtime=mtime, data=_read_manifest(self.root))
+        return self._manifest['data']
+
+    def _release_id(self):
+        if self._release is None:
+            with self.app.app_context():
+                self._release = get_release_id()
+        return self._release
+
+    def __call__(self, environ, start_response):
+        if environ.get(ENVIRON_KEY) or environ.get('REQUEST_METHOD') not in ('GET', 'HEAD') \
+                or environ.get('QUERY_STRING'):
+            return self.wsgi_app(environ, start_response)
+
+        path = environ.get('PATH_INFO') or '/'
+        filename = file_for_path(self.root, path)
+        if filename is None or not os.path.isfile(filename):
+            return self.wsgi_app(environ, start_response)
+        manifest = self._current_manifest()
+        if not is_current(manifest, self._release_id()):
+            return self.wsgi_app(environ, start_response)
+
+        request = Request(environ)
+        response = self._file_response(request, filename)
+        if response is None:
+            return self.wsgi_app(environ, start_response)
+
+        post_id = manifest['posts'].get(path)
+        if post_id is not None and request.method == 'GET' and response.status_code == 200:
+            self._record_view(post_id)
+        return response(environ, start_response)
+
+    def _file_response(self, request, filename):
+        encoding, served = None, filename
+        accepted = request.accept_encodings
+        for name, suffix in self.ENCODINGS:
+            if accepted[name] and os.path.isfile(filename + suffix):
+                encoding, served = name, filename + suffix
+                break
+        try:
+            with open(served, 'rb') as f:
+                body = f.read()
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            return None  # файл перерисовывается прямо сейчас
+
+        response = Response(body, content_type=CONTENT_TYPES.get(
+            os.path.splitext(filename)[1], 'application/octet-stream'
+        ))
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        # ETag по несжатому файлу, у сжатых вариантов - свой суффикс
+        response.set_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}' + (f'-{encoding}' if encoding else ''))
+        response.last_modified = int(stat.st_mtime)
+        response.cache_control.public = True
+        response.cache_control.max_age = self.max_age
+        response.cache_control.must_revalidate = True
+        response.headers['X-Prerendered'] = '1'
+        return response.make_conditional(request)
+
+    def _record_view(self, post_id):
+        from app.services.view_counter import view_counter
+        try:
+            with self.app.app_context():
+                view_counter.record(post_id)
+        except Exception as e:
+            logger.error(f'View count for prerendered post {post_id} failed: {e}')
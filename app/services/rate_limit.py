@@ -0,0 +1,229 @@
+"""
+Ограничение частоты запросов к чатботу (token bucket)
+Состояние хранится в локальной SQLite-базе (instance/ratelimit.sqlite3),
+поэтому лимиты общие для всех воркеров gunicorn на машине. Кроме корзин
+по IP и по сессии здесь же ведётся глобальный счётчик одновременных
+запросов к LLM.
+"""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from functools import wraps
+from flask import current_app, g, jsonify, request, session
+
+
+class RateLimiter:
+    """Token bucket и счётчик in-flight запросов в общей SQLite-базе."""
+    
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # WAL - вне транзакции: внутри BEGIN IMMEDIATE SQLite не меняет режим журнала
+        # (ошибки нет, запрос просто возвращает прежний режим)
+        self._connection().execute('PRAGMA journal_mode=WAL')
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS buckets '
+                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS inflight '
+                '(slot TEXT PRIMARY KEY, acquired REAL NOT NULL)'
+            )
+    
+    def _connection(self):
+        # Отдельное соединение на поток (sqlite3 не разделяет их между потоками)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+    
+    def _connect(self):
+        return _Transaction(self._connection())
+    
+    def consume(self, key, rate, burst, cost=1.0):
+        """
+        Списывает cost токенов из корзины key.
+        
+        Args:
+            key: Ключ корзины (например, 'ip:1.2.3.4')
+            rate: Пополнение, токенов в секунду
+            burst: Ёмкость корзины
+        
+        Returns:
+            (allowed, retry_after) - retry_after в секундах, если отказано
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                'INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                (key, tokens, now)
+            )
+        
+        if allowed:
+            return True, 0
+        return False, max(1, int((cost - tokens) / rate + 0.999))
+    
+    def acquire_slot(self, limit, ttl):
+        """
+        Занимает слот для запроса к LLM.
+        
+        Слоты старше ttl секунд (упавший воркер) освобождаются автоматически,
+        поэтому ttl не должен быть короче самого долгого запроса.
+        
+        Returns:
+            Идентификатор слота или None, если все слоты заняты
+        """
+        now = time.time()
+        slot = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute('DELETE FROM inflight WHERE acquired < ?', (now - ttl,))
+            (count,) = conn.execute('SELECT COUNT(*) FROM inflight').fetchone()
+            if count >= limit:
+                return None
+            conn.execute('INSERT INTO inflight (slot, acquired) VALUES (?, ?)', (slot, now))
+        return slot
+    
+    def release_slot(self, slot):
+        """Освобождает слот."""
+        if slot is None:
+            return
+        with self._connect() as conn:
+            conn.execute('DELETE FROM inflight WHERE slot = ?', (slot,))
+    
+    def cleanup(self, max_age=3600):
+        """Удаляет давно неиспользуемые корзины."""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM buckets WHERE updated < ?', (time.time() - max_age,))
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT: чтение и запись корзины атомарны между процессами."""
+    
+    def __init__(self, conn):
+        self.conn = conn
+    
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+_lock = threading.Lock()
+_limiters = {}
+
+
+def get_rate_limiter():
+    """Возвращает лимитер для файла из конфигурации."""
+    path = current_app.config.get('RATE_LIMIT_DB') or \
+        os.path.join(current_app.instance_path, 'ratelimit.sqlite3')
+    limiter = _limiters.get(path)
+    if limiter is None:
+        with _lock:
+            limiter = _limiters.get(path) or RateLimiter(path)
+            _limiters[path] = limiter
+    return limiter
+
+
+def too_many_requests(retry_after):
+    """Быстрый ответ 429 с Retry-After."""
+    response = jsonify({
+        'error': 'Too many requests',
+        'response': (
+            'Sie senden gerade sehr viele Nachrichten. Bitte warten Sie einen '
+            'Moment oder rufen Sie uns an: 069 90475570'
+        ),
+        'retry_after': retry_after,
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def client_ip():
+    """
+    IP клиента. За прокси Render remote_addr выставляет ProxyFix (PROXY_FIX_X_FOR)
+    по адресу, который добавил сам прокси, - подделать его заголовком нельзя.
+    """
+    return request.remote_addr or 'unknown'
+
+
+def rate_limited(scope):
+    """
+    Декоратор: проверяет корзины по IP и по сессии чата.
+    
+    Лимиты берутся из конфигурации: RATE_LIMIT_<SCOPE>_PER_MINUTE и
+    RATE_LIMIT_<SCOPE>_BURST (для IP и для сессии отдельно).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            config = current_app.config
+            if not config.get('RATE_LIMIT_ENABLED', True):
+                return view(*args, **kwargs)
+            
+            limiter = get_rate_limiter()
+            if random.random() < 0.001:
+                limiter.cleanup()
+            prefix = f'RATE_LIMIT_{scope.upper()}'
+            keys = [('IP', f'{scope}:ip:{client_ip()}')]
+            if config.get(f'{prefix}_SESSION_PER_MINUTE'):
+                session_id = session.get('chat_session_id')
+                if not session_id:
+                    # Без cookie корзина сессии тоже нужна: идентификатор выдаём сразу
+                    session_id = session['chat_session_id'] = str(uuid.uuid4())
+                    g.chat_session_new = True
+                keys.append(('SESSION', f'{scope}:session:{session_id}'))
+            
+            for kind, key in keys:
+                per_minute = config.get(f'{prefix}_{kind}_PER_MINUTE')
+                burst = config.get(f'{prefix}_{kind}_BURST')
+                if not per_minute or not burst:
+                    continue
+                allowed, retry_after = limiter.consume(key, per_minute / 60.0, burst)
+                if not allowed:
+                    return too_many_requests(retry_after)
+            
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def acquire_llm_slot():
+    """
+    Занимает глобальный слот для запроса к LLM.
+    
+    Returns:
+        Идентификатор слота, '' если лимит выключен, None если слотов нет
+    """
+    from app.services.chatbot import ChatbotService
+    from app.services.openai_client import max_request_seconds
+    
+    limit = current_app.config.get('CHAT_MAX_INFLIGHT')
+    if not limit or not current_app.config.get('RATE_LIMIT_ENABLED', True):
+        return ''
+    # Слот держится, пока запрос ждёт семафор чатбота и все попытки OpenAI:
+    # меньший ttl освобождал бы слоты ещё идущих запросов
+    ttl = current_app.config.get('CHAT_INFLIGHT_TTL') or \
+        ChatbotService.QUEUE_TIMEOUT + max_request_seconds()
+    return get_rate_limiter().acquire_slot(limit, ttl)
+
+
+def release_llm_slot(slot):
+    """Освобождает глобальный слот LLM."""
+    if slot:
+        get_rate_limiter().release_slot(slot)
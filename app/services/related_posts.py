@@ -0,0 +1,240 @@
+"""
+Похожие статьи блога
+Сходство = TF-IDF косинус по тексту + пересечение тегов (Жаккар).
+Результат хранится в таблице blog_related_posts и пересчитывается при
+публикации, снятии с публикации и удалении статьи - страница статьи
+делает один индексированный запрос вместо подбора на лету.
+
+При изменении одной статьи переписываются только её строки и строки тех
+статей, в чей топ она входит или входила. Это приближение: IDF зависит от
+всех статей, поэтому сходство остальных пар тоже немного сдвигается, а их
+строки остаются прежними. Расхождение копится только от таких точечных
+обновлений, поэтому первое изменение после RELATED_POSTS_REBUILD_INTERVAL
+(и первое после старта воркера) пересчитывает таблицу целиком.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import Counter
+import numpy as np
+from flask import current_app
+from app import db
+from app.models import BlogPost, RelatedPost
+from app.services.knowledge import tokenize
+
+logger = logging.getLogger(__name__)
+
+TEXT_LIMIT = 6000
+
+_lock = threading.Lock()
+_last_rebuild = {'at': None}  # time.monotonic() последнего полного пересчёта
+
+
+def _settings():
+    config = current_app.config
+    return (
+        config.get('RELATED_POSTS_COUNT', 3),
+        config.get('RELATED_POSTS_TAG_WEIGHT', 0.4),
+    )
+
+
+def _post_terms(post):
+    tags = ' '.join(t for t in post.tags or [] if t)
+    # Заголовок и теги весят больше основного текста
+    text = f'{post.title}\n{post.title}\n{tags}\n{tags}\n{post.excerpt or ""}\n{(post.content or "")[:TEXT_LIMIT]}'
+    return Counter(tokenize(text))
+
+
+def _post_tags(post):
+    return {t.strip().lower() for t in post.tags or [] if t and t.strip()}
+
+
+class SimilarityMatrix:
+    """Матрица попарного сходства опубликованных статей."""
+
+    def __init__(self, posts, tag_weight):
+        self.ids = [p.id for p in posts]
+        self.position = {post_id: i for i, post_id in enumerate(self.ids)}
+        self.scores = self._build(posts, tag_weight)
+
+    @staticmethod
+    def _build(posts, tag_weight):
+        n = len(posts)
+        if not n:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        terms = [_post_terms(p) for p in posts]
+        vocabulary = {}
+        for counts in terms:
+            for term in counts:
+                vocabulary.setdefault(term, len(vocabulary))
+
+        tf = np.zeros((n, max(1, len(vocabulary))), dtype=np.float32)
+        for row, counts in enumerate(terms):
+            for term, count in counts.items():
+                tf[row, vocabulary[term]] = 1.0 + math.log(count)
+        # Сглаженный IDF: термы из всех статей почти ничего не весят
+        df = np.count_nonzero(tf, axis=0)
+        tfidf = tf * (np.log((1.0 + n) / (1.0 + df)) + 1.0)
+        norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        tfidf /= norms
+        cosine = tfidf @ tfidf.T
+
+        tags = [_post_tags(p) for p in posts]
+        jaccard = np.zeros((n, n), dtype=np.float32)
+        for i in range(n):
+            if not tags[i]:
+                continue
+            for j in range(i + 1, n):
+                if tags[j]:
+                    union = len(tags[i] | tags[j])
+                    jaccard[i, j] = jaccard[j, i] = len(tags[i] & tags[j]) / union
+
+        scores = (1.0 - tag_weight) * cosine + tag_weight * jaccard
+        np.fill_diagonal(scores, -np.inf)
+        return scores
+
+    def top(self, post_id, k):
+        """[(related_id, score), ...] по убыванию сходства."""
+        row = self.scores[self.position[post_id]]
+        k = min(k, len(row) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-row, k - 1)[:k]
+        top = top[np.argsort(-row[top])]
+        return [(self.ids[i], float(row[i])) for i in top if row[i] > 0]
+
+    def score(self, post_id, other_id):
+        return float(self.scores[self.position[post_id], self.position[other_id]])
+
+
+def _load_matrix(exclude=()):
+    count, tag_weight = _settings()
+    query = BlogPost.query.filter_by(is_published=True)
+    if exclude:
+        query = query.filter(BlogPost.id.notin_(exclude))
+    posts = query.order_by(BlogPost.id).all()
+    return SimilarityMatrix(posts, tag_weight), count
+
+
+def _write_rows(matrix, post_ids, count):
+    """Переписывает строки указанных статей по матрице."""
+    if not post_ids:
+        return
+    RelatedPost.query.filter(RelatedPost.post_id.in_(post_ids))\
+        .delete(synchronize_session=False)
+    for post_id in post_ids:
+        if post_id not in matrix.position:
+            continue
+        for rank, (related_id, score) in enumerate(matrix.top(post_id, count)):
+            db.session.add(RelatedPost(post_id=post_id, rank=rank, related_id=related_id, score=score))
+
+
+def _current_lists():
+    """{post_id: [(related_id, score), ...]} из таблицы."""
+    lists = {}
+    for row in RelatedPost.query.order_by(RelatedPost.post_id, RelatedPost.rank):
+        lists.setdefault(row.post_id, []).append((row.related_id, row.score))
+    return lists
+
+
+def update_related_posts(post):
+    """
+    Пересчитывает похожие статьи после публикации или изменения статьи.
+    Неопубликованная статья убирается из таблицы. Коммит - за вызывающим.
+    
+    Returns:
+        set: id статей, чьи списки изменились (включая саму статью)
+    """
+    if not post.is_published:
+        return remove_related_posts([post.id]) | {post.id}
+
+    db.session.flush()
+    matrix, count = _load_matrix()
+    lists = _current_lists()
+    affected = {post.id}
+    for other_id in matrix.ids:
+        if other_id == post.id:
+            continue
+        related = lists.get(other_id, [])
+        score = matrix.score(other_id, post.id)
+        # Статья уже в топе (сходство могло измениться) или входит в него
+        if any(related_id == post.id for related_id, _ in related) or \
+                (score > 0 and (len(related) < count or score > related[-1][1])):
+            affected.add(other_id)
+    _write_rows(matrix, sorted(affected), count)
+    return affected
+
+
+def remove_related_posts(post_ids):
+    """
+    Убирает статьи из таблицы и пересчитывает статьи, у которых они были
+    в топе. Вызывается при снятии с публикации и до удаления статей (на
+    PostgreSQL строки удаляются каскадом вместе со статьёй). Коммит - за
+    вызывающим.
+    
+    Returns:
+        set: id оставшихся статей, чьи списки изменились
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return set()
+    affected = {
+        row.post_id for row in
+        RelatedPost.query.filter(RelatedPost.related_id.in_(post_ids))
+    } - set(post_ids)
+    RelatedPost.query.filter(
+        RelatedPost.post_id.in_(post_ids) | RelatedPost.related_id.in_(post_ids)
+    ).delete(synchronize_session=False)
+    if not affected:
+        return set()
+    matrix, count = _load_matrix(exclude=post_ids)
+    _write_rows(matrix, sorted(affected), count)
+    return affected
+
+
+def _rebuild_due():
+    interval = current_app.config.get('RELATED_POSTS_REBUILD_INTERVAL', 86400)
+    last = _last_rebuild['at']
+    return last is None or time.monotonic() - last >= interval
+
+
+def refresh_related_posts(post):
+    """
+    update_related_posts с коммитом - вызывается после сохранения статьи.
+    Раз в RELATED_POSTS_REBUILD_INTERVAL вместо точечного обновления
+    делается полный пересчёт. Ошибка не ломает сохранение в админке и
+    генераторе.
+    
+    Returns:
+        set: id статей, чьи списки изменились (пустое при ошибке)
+    """
+    try:
+        if _rebuild_due():
+            return set(_rebuild()) | {post.id}
+        affected = update_related_posts(post)
+        db.session.commit()
+        return affected
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'Related posts update failed for post {post.id}: {e}')
+        return set()
+
+
+def _rebuild():
+    """Переписывает таблицу целиком и коммитит. Возвращает id статей."""
+    matrix, count = _load_matrix()
+    RelatedPost.query.delete(synchronize_session=False)
+    _write_rows(matrix, matrix.ids, count)
+    db.session.commit()
+    with _lock:
+        _last_rebuild['at'] = time.monotonic()
+    return matrix.ids
+
+
+def rebuild_related_posts():
+    """Полностью перестраивает таблицу. Возвращает число статей."""
+    return len(_rebuild())
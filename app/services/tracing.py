@@ -0,0 +1,163 @@
+"""
+Трассировка запросов чатбота
+Замеряет фазы обработки /api/chat (сессия, история, промпт, OpenAI, commit),
+считает токены и исходы кэшей. Результат уходит в заголовок Server-Timing,
+в скользящую статистику воркера (перцентили для админки) и в выборочный
+структурированный лог.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from flask import g, has_app_context
+
+logger = logging.getLogger(__name__)
+
+LOG_SAMPLE_RATE = float(os.environ.get('CHAT_LOG_SAMPLE_RATE', 0.1))
+
+
+class ChatTrace:
+    """Замеры одного запроса к чатботу."""
+    
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        # Идентификатор для сопоставления ответа посетителю с логом сервера
+        self.id = uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.phases = {}   # фаза -> миллисекунды
+        self.meta = {}     # токены, исходы кэшей и т.п.
+        self.finished = False
+    
+    @contextmanager
+    def phase(self, name):
+        """Замеряет длительность блока кода."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+    
+    def set(self, key, value):
+        """Сохраняет значение (токены, исход кэша)."""
+        self.meta[key] = value
+    
+    def elapsed(self):
+        """Миллисекунды с начала запроса."""
+        return (time.perf_counter() - self.started) * 1000
+    
+    def server_timing(self):
+        """Значение заголовка Server-Timing."""
+        parts = [f'{name};dur={ms:.1f}' for name, ms in self.phases.items()]
+        parts.append(f'total;dur={self.elapsed():.1f}')
+        return ', '.join(parts)
+    
+    def finish(self):
+        """Завершает трассировку: статистика и выборочный лог."""
+        if self.finished:
+            return
+        self.finished = True
+        self.phases['total'] = self.elapsed()
+        timing_stats.add(self)
+        
+        if random.random() < LOG_SAMPLE_RATE:
+            logger.info(json.dumps({
+                'event': 'chat_request',
+                'trace_id': self.id,
+                'endpoint': self.endpoint,
+                'phases_ms': {k: round(v, 1) for k, v in self.phases.items()},
+                **self.meta,
+            }, ensure_ascii=False))
+
+
+class _NullTrace:
+    """Заглушка вне запроса чатбота (CLI, фоновые задачи)."""
+    
+    @property
+    def phases(self):
+        return {}
+    
+    @contextmanager
+    def phase(self, name):
+        yield
+    
+    def set(self, key, value):
+        pass
+
+
+_null_trace = _NullTrace()
+
+
+def start_trace(endpoint):
+    """Начинает трассировку текущего запроса."""
+    trace = ChatTrace(endpoint)
+    g.chat_trace = trace
+    return trace
+
+
+def get_trace():
+    """Текущая трассировка или заглушка."""
+    if has_app_context():
+        return g.get('chat_trace') or _null_trace
+    return _null_trace
+
+
+class TimingStats:
+    """Скользящая статистика последних запросов воркера."""
+    
+    PERCENTILES = (50, 95, 99)
+    
+    def __init__(self, maxlen=500):
+        self._traces = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+    
+    def add(self, trace):
+        with self._lock:
+            self._traces.append((trace.endpoint, dict(trace.phases), dict(trace.meta)))
+    
+    @staticmethod
+    def _percentile(sorted_values, p):
+        index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+        return sorted_values[index]
+    
+    def summary(self):
+        """Перцентили по фазам и доли исходов кэшей."""
+        with self._lock:
+            traces = list(self._traces)
+        
+        phases = {}
+        outcomes = {}
+        for _, trace_phases, meta in traces:
+            for name, ms in trace_phases.items():
+                phases.setdefault(name, []).append(ms)
+            for key, value in meta.items():
+                if key.endswith(('_cache', '_path')):
+                    outcomes.setdefault(key, {}).setdefault(value, 0)
+                    outcomes[key][value] += 1
+        
+        result = {}
+        for name, values in phases.items():
+            values.sort()
+            result[name] = {
+                'count': len(values),
+                **{f'p{p}': round(self._percentile(values, p), 1) for p in self.PERCENTILES},
+            }
+        
+        tokens = [meta for _, _, meta in traces if 'prompt_tokens' in meta]
+        return {
+            'requests': len(traces),
+            'phases': result,
+            'cache_outcomes': outcomes,
+            'avg_prompt_tokens': round(sum(m['prompt_tokens'] for m in tokens) / len(tokens)) if tokens else 0,
+            'avg_completion_tokens': round(sum(m.get('completion_tokens', 0) for m in tokens) / len(tokens)) if tokens else 0,
+        }
+
+
+# Статистика процесса (воркера)
+timing_stats = TimingStats()
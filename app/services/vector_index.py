@@ -0,0 +1,356 @@
+"""
+Локальный векторный индекс для семантического поиска чатбота
+Матрица эмбеддингов (NumPy) по инструкциям чатбота и опубликованным статьям.
+Индекс обновляется точечно при изменениях и хранится на диске
+(instance/vector_index.npz), поэтому воркеры загружают его, а не строят заново.
+Если файла нет (диск Render очищается при каждой выкладке), первый запрос
+строит индекс из БД под той же блокировкой, что и запись.
+"""
+
+import json
+import logging
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+import numpy as np
+from flask import current_app
+from app.services.knowledge import tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows (разработка)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+# ============ Эмбеддеры ============
+
+class HashingEmbedder:
+    """
+    Полностью локальный эмбеддер: хэширование признаков (слова и биграммы)
+    с сублинейным TF и L2-нормализацией. Не требует обучения и сети,
+    поэтому индекс можно дополнять по одной записи.
+    """
+    
+    name = 'hashing'
+    
+    def __init__(self, dim=1024):
+        self.dim = dim
+    
+    def _features(self, text):
+        tokens = tokenize(text)
+        return tokens + [f'{a}_{b}' for a, b in zip(tokens, tokens[1:])]
+    
+    def embed(self, texts):
+        """Возвращает матрицу (len(texts), dim) с нормированными строками."""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                matrix[row, h % self.dim] += sign
+        # Сублинейный TF: log(1 + |tf|) с сохранением знака
+        np.copysign(np.log1p(np.abs(matrix)), matrix, out=matrix)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class OpenAIEmbedder:
+    """Эмбеддинги OpenAI (опционально, требует OPENAI_API_KEY)."""
+    
+    name = 'openai'
+    
+    def __init__(self, model='text-embedding-3-small', dim=512):
+        self.model = model
+        self.dim = dim
+    
+    def embed(self, texts):
+        from app.services.openai_client import get_openai_client
+        response = get_openai_client().embeddings.create(
+            model=self.model,
+            input=[t[:8000] for t in texts],
+            dimensions=self.dim,
+        )
+        matrix = np.array([d.embedding for d in response.data], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+EMBEDDERS = {
+    'hashing': HashingEmbedder,
+    'openai': OpenAIEmbedder,
+}
+
+
+def get_embedder():
+    """Создаёт эмбеддер, выбранный в CHATBOT_EMBEDDER (по умолчанию hashing)."""
+    name = os.environ.get('CHATBOT_EMBEDDER', 'hashing')
+    return EMBEDDERS.get(name, HashingEmbedder)()
+
+
+# ============ Индекс ============
+
+class VectorIndex:
+    """Матрица эмбеддингов с метаданными и поиском top-k по косинусу."""
+    
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.keys = []
+        self.meta = []
+        self.matrix = np.zeros((0, embedder.dim), dtype=np.float32)
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def upsert(self, key, text, meta):
+        """Добавляет или заменяет запись."""
+        vector = self.embedder.embed([text])[0]
+        if key in self.keys:
+            row = self.keys.index(key)
+            self.matrix[row] = vector
+            self.meta[row] = meta
+        else:
+            self.keys.append(key)
+            self.meta.append(meta)
+            self.matrix = np.vstack([self.matrix, vector[np.newaxis, :]])
+    
+    def remove(self, key):
+        """Удаляет запись (если есть)."""
+        if key not in self.keys:
+            return
+        row = self.keys.index(key)
+        del self.keys[row]
+        del self.meta[row]
+        self.matrix = np.delete(self.matrix, row, axis=0)
+    
+    def search(self, query, top_k=5, kind=None, min_score=0.0):
+        """
+        Возвращает [(score, meta), ...] по убыванию косинусного сходства.
+        
+        Args:
+            query: Текст запроса
+            top_k: Сколько записей вернуть
+            kind: Фильтр по типу записи ('instruction' / 'post')
+            min_score: Минимальное сходство
+        """
+        if not self.keys or not query:
+            return []
+        
+        scores = self.matrix @ self.embedder.embed([query])[0]
+        if kind:
+            mask = np.fromiter((m['kind'] == kind for m in self.meta), dtype=bool, count=len(self.meta))
+            scores = np.where(mask, scores, -np.inf)
+        
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (float(scores[i]), self.meta[i])
+            for i in top
+            if scores[i] > min_score
+        ]
+    
+    def save(self, path):
+        """Атомарно сохраняет индекс в .npz."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = json.dumps({
+            'embedder': self.embedder.name,
+            'dim': self.embedder.dim,
+            'keys': self.keys,
+            'meta': self.meta,
+        }, ensure_ascii=False)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, matrix=self.matrix, header=np.array(header))
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path, embedder, strict=False):
+        """
+        Загружает индекс; при несовпадении эмбеддера возвращает пустой.
+        
+        Args:
+            strict: Вернуть None вместо пустого индекса, если файла нет
+                или он построен другим эмбеддером
+        """
+        index = None if strict else cls(embedder)
+        if not os.path.exists(path):
+            return index
+        
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data['header']))
+            if header['embedder'] != embedder.name or header['dim'] != embedder.dim:
+                if not strict:
+                    logger.warning('Vector index built with another embedder - run "flask rebuild-vector-index"')
+                return index
+            index = cls(embedder)
+            index.keys = header['keys']
+            index.meta = header['meta']
+            index.matrix = data['matrix'].astype(np.float32)
+        return index
+
+
+# ============ Индекс процесса ============
+
+_lock = threading.Lock()
+_state = {'path': None, 'mtime': None, 'index': None}
+
+
+def _index_file():
+    """Путь к файлу индекса."""
+    return current_app.config.get('VECTOR_INDEX_FILE') or \
+        os.path.join(current_app.instance_path, 'vector_index.npz')
+
+
+def get_vector_index():
+    """Возвращает индекс процесса, перечитывая файл, если его обновил другой воркер."""
+    path = _index_file()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    
+    if _state['index'] is not None and _state['path'] == path and _state['mtime'] == mtime:
+        return _state['index']
+    
+    if mtime is None:
+        return _build_missing(path)
+    
+    with _lock:
+        index = VectorIndex.load(path, get_embedder())
+        _state.update(path=path, mtime=mtime, index=index)
+        return index
+
+
+@contextmanager
+def _locked(path):
+    """Блокировка файла индекса: потоки воркера и воркеры между собой (flock)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _lock, open(f'{path}.lock', 'w') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def _save(index, path):
+    index.save(path)
+    _state.update(path=path, mtime=os.stat(path).st_mtime_ns, index=index)
+
+
+def _build_missing(path):
+    """Строит индекс из БД, если файла нет (один воркер, остальные ждут и читают)."""
+    with _locked(path):
+        if os.path.exists(path):
+            index = VectorIndex.load(path, get_embedder())
+            _state.update(path=path, mtime=os.stat(path).st_mtime_ns, index=index)
+            return index
+        index = _build_index()
+        _save(index, path)
+        logger.info(f'Vector index file missing - rebuilt with {len(index)} entries')
+        return index
+
+
+def _update_index(apply):
+    """Применяет изменение к актуальной копии индекса и сохраняет её."""
+    path = _index_file()
+    with _locked(path):
+        index = VectorIndex.load(path, get_embedder(), strict=True)
+        if index is None:
+            # Нет файла или другой эмбеддер: изменение из пустого индекса дало бы
+            # индекс из одной записи - строим весь (изменение уже в БД)
+            index = _build_index()
+            logger.info(f'Vector index missing or stale - rebuilt with {len(index)} entries')
+        else:
+            apply(index)
+        _save(index, path)
+
+
+def _instruction_entry(instruction):
+    keywords = ' '.join(k for k in instruction.keywords or [] if k)
+    text = f'{instruction.title}\n{keywords}\n{instruction.content}'
+    meta = {
+        'kind': 'instruction',
+        'id': instruction.id,
+        'title': instruction.title,
+    }
+    return f'instruction:{instruction.id}', text, meta
+
+
+def _post_entry(post):
+    text = f'{post.title}\n{post.excerpt or ""}\n{(post.content or "")[:4000]}'
+    meta = {
+        'kind': 'post',
+        'id': post.id,
+        'title': post.title,
+        'url': f'/blog/{post.slug}/',
+        'snippet': post.excerpt or (post.content or '')[:200],
+    }
+    return f'post:{post.id}', text, meta
+
+
+def sync_instruction(instruction):
+    """Обновляет инструкцию в индексе (неактивные удаляются)."""
+    key, text, meta = _instruction_entry(instruction)
+    
+    def apply(index):
+        if instruction.is_active:
+            index.upsert(key, text, meta)
+        else:
+            index.remove(key)
+    
+    _safe_update(apply)
+
+
+def sync_blog_post(post):
+    """Обновляет статью в индексе (неопубликованные удаляются)."""
+    key, text, meta = _post_entry(post)
+    
+    def apply(index):
+        if post.is_published:
+            index.upsert(key, text, meta)
+        else:
+            index.remove(key)
+    
+    _safe_update(apply)
+
+
+def remove_from_index(kind, object_id):
+    """Удаляет запись из индекса ('instruction' / 'post')."""
+    _safe_update(lambda index: index.remove(f'{kind}:{object_id}'))
+
+
+def _safe_update(apply):
+    # Ошибка индекса не должна ломать сохранение в админке
+    try:
+        _update_index(apply)
+    except Exception as e:
+        logger.error(f'Vector index update failed: {e}')
+
+
+def _build_index():
+    """Индекс всех активных инструкций и опубликованных статей из БД."""
+    from app.models import BlogPost, ChatbotInstruction
+    
+    embedder = get_embedder()
+    index = VectorIndex(embedder)
+    entries = [_instruction_entry(i) for i in ChatbotInstruction.get_all_active()]
+    entries += [_post_entry(p) for p in BlogPost.get_published().all()]
+    
+    if entries:
+        index.keys = [e[0] for e in entries]
+        index.meta = [e[2] for e in entries]
+        index.matrix = embedder.embed([e[1] for e in entries]).astype(np.float32)
+    return index
+
+
+def rebuild_vector_index():
+    """Полностью перестраивает индекс из БД. Возвращает число записей."""
+    index = _build_index()
+    path = _index_file()
+    with _locked(path):
+        _save(index, path)
+    return len(index)
@@ -0,0 +1,104 @@
+"""
+Буферизованный счётчик просмотров статей
+Просмотры копятся в памяти воркера и периодически записываются одним
+пакетом атомарных UPDATE views_count = views_count + n, поэтому чтение
+статьи не блокирует строку и параллельные просмотры не теряются.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from flask import current_app
+from sqlalchemy import text
+from app import db
+
+logger = logging.getLogger(__name__)
+
+_UPDATE = text(
+    'UPDATE blog_posts SET views_count = COALESCE(views_count, 0) + :n WHERE id = :id'
+)
+
+
+class ViewCounter:
+    """Счётчики просмотров по id статьи с фоновым сбросом в БД."""
+
+    def __init__(self):
+        self.interval = 30
+        self._app = None
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        # После fork поток и накопленные счётчики родителя не наследуются
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._app = current_app._get_current_object()
+            self.interval = self._app.config.get('VIEW_COUNT_FLUSH_INTERVAL', self.interval)
+            self._counts.clear()
+            if self.interval > 0:
+                threading.Thread(target=self._run, name='view-counter', daemon=True).start()
+            self._pid = os.getpid()
+        atexit.register(self.shutdown)
+
+    def record(self, post_id):
+        """Учитывает один просмотр статьи."""
+        self._ensure_started()
+        with self._lock:
+            self._counts[post_id] = self._counts.get(post_id, 0) + 1
+        if self.interval <= 0:
+            self.flush()
+
+    def pending(self, post_id):
+        """Ещё не записанные просмотры статьи."""
+        return self._counts.get(post_id, 0)
+
+    def flush(self):
+        """
+        Записывает накопленные просмотры одной транзакцией.
+
+        Returns:
+            int: Количество записанных просмотров
+        """
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts = self._counts, {}
+            if not counts:
+                return 0
+            try:
+                with self._app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(_UPDATE, [{'id': k, 'n': n} for k, n in counts.items()])
+            except Exception:
+                # Возвращаем в буфер, запишем в следующий раз
+                with self._lock:
+                    for post_id, n in counts.items():
+                        self._counts[post_id] = self._counts.get(post_id, 0) + n
+                raise
+            return sum(counts.values())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('View count flush failed')
+
+    def shutdown(self):
+        """Записывает остаток при остановке воркера."""
+        if self._pid != os.getpid():
+            return
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('View counts lost on shutdown')
+
+
+view_counter = ViewCounter()
@@ -169,25 +169,16 @@ class HermitageChatbot {
         // Показываем индикатор набора
         this.showTyping();
         
+        const payload = JSON.stringify({
+            message: message,
+            page_url: window.location.pathname
+        });
+        
         try {
-            const response = await fetch('/api/chat', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    message: message,
-                    page_url: window.location.pathname
-                })
-            });
-            
-            this.hideTyping();
-            
-            if (response.ok) {
-                const data = await response.json();
-                this.addMessage(data.response);
-            } else {
-                this.addMessage('Entschuldigung, es gab einen Fehler. Bitte versuchen Sie es später erneut oder rufen Sie uns an: 069 90475570');
+            // Потоковый ответ (SSE), при отсутствии поддержки - обычный запрос
+            const streamed = await this.streamMessage(payload);
+            if (!streamed) {
+                await this.fetchMessage(payload);
             }
         } catch (error) {
             console.error('Chat error:', error);
@@ -199,6 +190,107 @@ class HermitageChatbot {
             this.inputField.focus();
         }
     }
+    
+    async fetchMessage(payload) {
+        const response = await fetch('/api/chat', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: payload
+        });
+        
+        this.hideTyping();
+        
+        if (response.ok || response.status === 429) {
+            const data = await response.json();
+            this.addMessage(data.response);
+        } else {
+            this.addMessage('Entschuldigung, es gab einen Fehler. Bitte versuchen Sie es später erneut oder rufen Sie uns an: 069 90475570');
+        }
+    }
+    
+    async streamMessage(payload) {
+        if (!window.ReadableStream || !window.TextDecoder) {
+            return false;
+        }
+        
+        const response = await fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: payload
+        });
+        
+        // Лимит запросов: показываем ответ сервера без повторной попытки
+        if (response.status === 429) {
+            const data = await response.json();
+            this.hideTyping();
+            this.addMessage(data.response);
+            return true;
+        }
+        
+        if (!response.ok || !response.body) {
+            return false;
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+        let contentDiv = null;
+        
+        const render = (content) => {
+            if (!contentDiv) {
+                this.hideTyping();
+                this.addMessage('');
+                contentDiv = this.messagesContainer.lastElementChild.querySelector('.message-content');
+            }
+            contentDiv.innerHTML = this.formatMessage(content);
+            this.scrollToBottom();
+        };
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            
+            buffer += decoder.decode(value, { stream: true });
+            
+            // События SSE разделяются пустой строкой
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let eventType = 'message';
+                let data = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        eventType = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        data += line.slice(5).trim();
+                    }
+                });
+                
+                if (!data) continue;
+                const parsed = JSON.parse(data);
+                
+                if (eventType === 'error') {
+                    render(parsed.response);
+                } else if (parsed.token) {
+                    text += parsed.token;
+                    render(text);
+                }
+            }
+        }
+        
+        if (!contentDiv) {
+            this.hideTyping();
+        }
+        return true;
+    }
 }
 
 // Инициализация при загрузке страницы
@@ -39,7 +39,7 @@ class Config:
     # Mail (для контактной формы)
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.strato.de')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
-    MAIL_USE_TLS = True
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() == 'true'
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'info@hermitage-frankfurt.de')
@@ -47,14 +47,82 @@ class Config:
     # Контактный email для получения заявок
     CONTACT_EMAIL = 'info@hermitage-frankfurt.de'
     
+    # Очередь писем (outbox): фоновая отправка с повторами
+    MAIL_OUTBOX_SENDER = os.environ.get('MAIL_OUTBOX_SENDER', 'true').lower() == 'true'
+    MAIL_OUTBOX_INTERVAL = int(os.environ.get('MAIL_OUTBOX_INTERVAL', 30))  # секунды
+    MAIL_LEAD_DIGEST_DELAY = int(os.environ.get('MAIL_LEAD_DIGEST_DELAY', 300))  # секунды
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', 8))
+    
     # Chatbot
     CHATBOT_MODEL = os.environ.get('CHATBOT_MODEL', 'gpt-4o-mini')
     CHATBOT_MAX_TOKENS = 500
+    # Файл-метка версии базы знаний (по умолчанию instance/knowledge.version)
+    KNOWLEDGE_VERSION_FILE = os.environ.get('KNOWLEDGE_VERSION_FILE')
+    # Файл векторного индекса (по умолчанию instance/vector_index.npz)
+    VECTOR_INDEX_FILE = os.environ.get('VECTOR_INDEX_FILE')
+    
+    # Прокси перед приложением (Render - один балансировщик): ProxyFix берёт
+    # remote_addr из последних N адресов X-Forwarded-For (0 - без прокси)
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 1))
+    
+    # Ограничение частоты запросов к чатботу (token bucket, общий для воркеров)
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_DB = os.environ.get('RATE_LIMIT_DB')  # по умолчанию instance/ratelimit.sqlite3
+    RATE_LIMIT_CHAT_IP_PER_MINUTE = int(os.environ.get('RATE_LIMIT_CHAT_IP_PER_MINUTE', 20))
+    RATE_LIMIT_CHAT_IP_BURST = int(os.environ.get('RATE_LIMIT_CHAT_IP_BURST', 10))
+    RATE_LIMIT_CHAT_SESSION_PER_MINUTE = int(os.environ.get('RATE_LIMIT_CHAT_SESSION_PER_MINUTE', 8))
+    RATE_LIMIT_CHAT_SESSION_BURST = int(os.environ.get('RATE_LIMIT_CHAT_SESSION_BURST', 4))
+    RATE_LIMIT_LEAD_IP_PER_MINUTE = int(os.environ.get('RATE_LIMIT_LEAD_IP_PER_MINUTE', 3))
+    RATE_LIMIT_LEAD_IP_BURST = int(os.environ.get('RATE_LIMIT_LEAD_IP_BURST', 3))
+    # Максимум одновременных запросов к OpenAI на все воркеры
+    CHAT_MAX_INFLIGHT = int(os.environ.get('CHAT_MAX_INFLIGHT', 12))
+    # Через сколько секунд слот упавшего воркера освобождается
+    # (по умолчанию - по тайм-аутам и повторам клиента OpenAI)
+    CHAT_INFLIGHT_TTL = float(os.environ.get('CHAT_INFLIGHT_TTL', 0))
+    
+    # Отложенная запись истории чата (write-behind)
+    CHAT_WRITE_BEHIND = os.environ.get('CHAT_WRITE_BEHIND', 'true').lower() == 'true'
+    CHAT_FLUSH_INTERVAL = float(os.environ.get('CHAT_FLUSH_INTERVAL', 0.5))  # секунды
+    CHAT_FLUSH_BATCH_SIZE = int(os.environ.get('CHAT_FLUSH_BATCH_SIZE', 200))
+    CHAT_SESSION_CACHE_SIZE = int(os.environ.get('CHAT_SESSION_CACHE_SIZE', 1000))
+    # Секунды до полного перечитывания сессии из БД; свежесть (сообщения других
+    # воркеров) дополнительно сверяется по max(id) сообщений при каждом запросе
+    CHAT_SESSION_CACHE_TTL = int(os.environ.get('CHAT_SESSION_CACHE_TTL', 600))
+    # Сообщений на сессию в памяти - как окно истории чатбота
+    CHAT_SESSION_CACHE_MESSAGES = int(os.environ.get('CHATBOT_HISTORY_MAX_MESSAGES', 40))
+    
+    # Хранение сессий чата: не-лиды старше N дней уходят в архив
+    CHAT_RETENTION_DAYS = int(os.environ.get('CHAT_RETENTION_DAYS', 90))
+    CHAT_ARCHIVE_DIR = os.environ.get('CHAT_ARCHIVE_DIR')  # по умолчанию instance/chat_archive
     
     # Blog
     BLOG_POSTS_PER_PAGE = 10
     AUTO_BLOG_ENABLED = True
     MAX_BLOG_ARTICLES = int(os.environ.get('MAX_BLOG_ARTICLES', 30))
+    # HTTP-кэширование страниц блога (ETag/Last-Modified + Cache-Control)
+    BLOG_CACHE_MAX_AGE = int(os.environ.get('BLOG_CACHE_MAX_AGE', 300))  # секунды
+    # Версия выкладки для ETag (по умолчанию - время изменения шаблонов/статики)
+    RELEASE_ID = os.environ.get('RELEASE_ID') or os.environ.get('RENDER_GIT_COMMIT')
+    # Количество статей и ETag списков кэшируются в воркере; сброс - instance/blog.version.
+    # Файл видят только процессы на том же диске (воркеры одного инстанса Render,
+    # CLI на той же машине). При нескольких инстансах или генераторе статей на
+    # другой машине списки обновятся не позже чем через BLOG_LISTING_CACHE_TTL
+    BLOG_VERSION_FILE = os.environ.get('BLOG_VERSION_FILE')
+    BLOG_LISTING_CACHE_TTL = int(os.environ.get('BLOG_LISTING_CACHE_TTL', 300))  # секунды
+    # Пре-рендер публичных страниц (`flask prerender`) и его отдача middleware
+    PRERENDER_DIR = os.environ.get('PRERENDER_DIR')
+    PRERENDER_SERVE = os.environ.get('PRERENDER_SERVE', 'true').lower() == 'true'
+    # Адрес сайта для абсолютных ссылок в пре-рендере (рендеринг идёт без запроса)
+    PRERENDER_BASE_URL = os.environ.get('PRERENDER_BASE_URL', 'https://hermitage-frankfurt.de')
+    # Файлы static/build (имя с хэшем содержимого) кэшируются браузером на год
+    STATIC_IMMUTABLE_MAX_AGE = 31536000
+    # Просмотры статей пишутся в БД пакетом раз в N секунд (0 - сразу)
+    VIEW_COUNT_FLUSH_INTERVAL = int(os.environ.get('VIEW_COUNT_FLUSH_INTERVAL', 30))
+    # Похожие статьи: сколько хранить и вес пересечения тегов (остальное - TF-IDF текста)
+    RELATED_POSTS_COUNT = 3
+    RELATED_POSTS_TAG_WEIGHT = float(os.environ.get('RELATED_POSTS_TAG_WEIGHT', 0.4))
+    # Полный пересчёт вместо точечного не реже раза в N секунд (дрейф IDF)
+    RELATED_POSTS_REBUILD_INTERVAL = int(os.environ.get('RELATED_POSTS_REBUILD_INTERVAL', 86400))
 
 
 class DevelopmentConfig(Config):
@@ -0,0 +1,59 @@
+"""
+Конфигурация Gunicorn для Render.com
+
+По умолчанию используется воркер gevent: ожидание ответа OpenAI не держит
+поток ОС, поэтому всплеск запросов к чатботу не блокирует обычные страницы.
+Число одновременных запросов к LLM ограничивается семафором в ChatbotService
+(CHATBOT_MAX_CONCURRENCY).
+
+Запуск:
+    gunicorn wsgi:app -c gunicorn.conf.py
+"""
+
+import os
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+timeout = 120
+
+# gevent (асинхронный) или gthread (прежний режим --workers 2 --threads 4)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 200))
+
+
+def on_starting(server):
+    """Время запуска: экспорт пре-рендера до него не отдаётся (см. app/services/prerender.py)."""
+    os.environ['PRERENDER_STARTED_AT'] = str(time.time())
+
+
+def post_fork(server, worker):
+    """Делает psycopg2 совместимым с gevent (если установлен psycogreen)."""
+    if worker_class != 'gevent':
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        server.log.warning('psycogreen nicht installiert - psycopg2 blockiert den Worker')
+
+
+def post_worker_init(worker):
+    """
+    Запускает отправку писем из outbox сразу, а не с первым письмом воркера,
+    и (в фоне) пре-рендер, если его ещё нет для этого запуска.
+    """
+    from app.services.mailer import start_sender
+    from app.services.prerender import start_prerender
+    with worker.wsgi.app_context():
+        start_sender()
+        start_prerender()
+
+
+def worker_exit(server, worker):
+    """Записывает буферы воркера (сообщения чата, просмотры) перед остановкой."""
+    from app.services.chat_store import chat_store
+    from app.services.view_counter import view_counter
+    chat_store.shutdown()
+    view_counter.shutdown()
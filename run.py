@@ -4,6 +4,7 @@ Hermitage Frankfurt - Flask Application Entry Point
 """
 
 import os
+import click
 from app import create_app, db
 from app.models import Admin, Page, BlogPost, ChatbotInstruction
 
@@ -185,8 +186,135 @@ def seed_data():
 
     
     db.session.commit()
+    
+    from app.services.knowledge import bump_knowledge_version
+    bump_knowledge_version()
+    
     print('Database seeded with initial data!')
 
 
+@app.cli.command('migrate-chat-messages')
+def migrate_chat_messages():
+    """Move chat history from chat_sessions.messages JSON into chat_messages."""
+    from app.models import ChatSession
+    
+    count = ChatSession.migrate_legacy_messages()
+    print(f'{count} chat messages migrated.')
+
+
+@app.cli.command('rebuild-vector-index')
+def rebuild_vector_index():
+    """Rebuild the chatbot semantic search index."""
+    from app.services.vector_index import rebuild_vector_index as rebuild
+    
+    count = rebuild()
+    print(f'Vector index rebuilt: {count} entries.')
+
+
+
+@app.cli.command('archive-chat-sessions')
+@click.option('--days', type=int, default=None, help='Age in days (default: CHAT_RETENTION_DAYS).')
+@click.option('--dry-run', is_flag=True, help='Only count matching sessions.')
+def archive_chat_sessions(days, dry_run):
+    """Archive and delete non-lead chat sessions older than N days."""
+    from app.services.chat_retention import archive_chat_sessions as archive
+    
+    if days is None:
+        days = app.config['CHAT_RETENTION_DAYS']
+    count, path = archive(days=days, dry_run=dry_run)
+    if dry_run:
+        print(f'{count} chat sessions older than {days} days would be archived.')
+    else:
+        print(f'{count} chat sessions archived' + (f' to {path}.' if path else '.'))
+
+
+@app.cli.command('partition-chat-sessions')
+@click.option('--months-ahead', type=int, default=3, help='Monthly partitions to create in advance.')
+def partition_chat_sessions(months_ahead):
+    """Convert chat_sessions to monthly partitions (PostgreSQL) or add upcoming ones."""
+    from app.services.chat_retention import partition_chat_sessions as partition
+    
+    created = partition(months_ahead=months_ahead)
+    print(f'{len(created)} partitions created: {", ".join(created) or "-"}')
+
+
+
+@app.cli.command('send-mail')
+def send_mail():
+    """Send all due mails from the outbox now."""
+    from app.services.mailer import MailSender
+    
+    sent, failed = MailSender(app.config).send_all()
+    print(f'{sent} mails sent, {failed} failed (will be retried).')
+
+
+
+@app.cli.command('render-blog-content')
+@click.option('--all', 'render_all', is_flag=True, help='Re-render posts that already have HTML.')
+def render_blog_content(render_all):
+    """Render blog Markdown to stored HTML, TOC and reading time."""
+    from app.services.blog_listing import bump_blog_version
+    
+    query = BlogPost.query.order_by(BlogPost.id)
+    if not render_all:
+        query = query.filter(BlogPost.content_html.is_(None))
+    
+    count = 0
+    last_id = 0
+    while True:
+        posts = query.filter(BlogPost.id > last_id).limit(100).all()
+        if not posts:
+            break
+        for post in posts:
+            post.render_content()
+        last_id = posts[-1].id
+        count += len(posts)
+        db.session.commit()
+    bump_blog_version()
+    print(f'{count} blog posts rendered.')
+
+
+
+@app.cli.command('rebuild-related-posts')
+def rebuild_related_posts():
+    """Recompute the related posts table for all published posts."""
+    from app.services.related_posts import rebuild_related_posts as rebuild
+    
+    count = rebuild()
+    print(f'Related posts rebuilt for {count} posts.')
+
+
+
+@app.cli.command('prerender')
+@click.option('--clean', is_flag=True, help='Remove previously exported files first.')
+@click.option('--post', 'post_slug', default=None, help='Re-render one blog post (and listings).')
+@click.option('--page', 'page_slug', default=None, help='Re-render the route of one Page slug.')
+def prerender_site(clean, post_slug, page_slug):
+    """Export public pages, blog posts and the sitemap to static files."""
+    from app.services import prerender
+    
+    if post_slug:
+        post = BlogPost.query.filter_by(slug=post_slug).first()
+        if post is None:
+            raise click.ClickException(f'Blog post "{post_slug}" not found.')
+        count = prerender.refresh_post(post)
+    elif page_slug:
+        count = prerender.refresh_page(page_slug)
+    else:
+        count = prerender.prerender_all(clean=clean)
+    print(f'{count} files prerendered.')
+
+
+
+@app.cli.command('build-assets')
+def build_assets():
+    """Fingerprint static files into static/build with .gz/.br variants."""
+    from app.services.assets import build_assets as build
+    
+    manifest = build(app.static_folder)
+    app.extensions['asset_manifest'] = manifest
+    print(f'{len(manifest)} static files fingerprinted.')
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
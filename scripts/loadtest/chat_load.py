@@ -0,0 +1,314 @@
+"""
+Нагрузочный тест чатбота (/api/chat и /api/chat/stream)
+
+Виртуальные посетители проходят многошаговые сценарии (scenarios.py) со
+своими cookie-сессиями и паузами между сообщениями. В конце выводятся
+пропускная способность, p50/p95/p99 задержки и доля ошибок.
+
+Сравнение конфигураций gunicorn (воркер:число воркеров:потоки) - заглушка
+LLM и серверы запускаются автоматически, каждый со своей SQLite-базой:
+    python scripts/loadtest/chat_load.py --compare gthread:2:4 gevent:2:200 --users 30
+
+Тест уже запущенного сервера (приложение должно смотреть на заглушку,
+см. stub_llm.py):
+    python scripts/loadtest/chat_load.py --url http://127.0.0.1:5000 --users 10
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import requests
+from scenarios import SCRIPTS
+from stub_llm import add_stub_arguments, start_stub, stub_settings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# ============ Результаты ============
+
+def percentile(values, p):
+    """Перцентиль по ближайшему рангу."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(p / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Results:
+    """Потокобезопасный сбор результатов запросов."""
+
+    def __init__(self):
+        self.latencies = []
+        self.ttft = []
+        self.errors = {}
+        self.requests = 0
+        self.sessions = 0
+        self._lock = threading.Lock()
+
+    def add(self, latency, error=None, ttft=None):
+        with self._lock:
+            self.requests += 1
+            if error:
+                self.errors[error] = self.errors.get(error, 0) + 1
+            else:
+                self.latencies.append(latency)
+                if ttft is not None:
+                    self.ttft.append(ttft)
+
+    def session_done(self):
+        with self._lock:
+            self.sessions += 1
+
+    def summary(self, duration):
+        failed = sum(self.errors.values())
+        return {
+            'requests': self.requests,
+            'sessions': self.sessions,
+            'throughput': self.requests / duration if duration else 0.0,
+            'error_rate': failed / self.requests if self.requests else 0.0,
+            'errors': dict(self.errors),
+            'p50': percentile(self.latencies, 50),
+            'p95': percentile(self.latencies, 95),
+            'p99': percentile(self.latencies, 99),
+            'ttft_p50': percentile(self.ttft, 50) if self.ttft else None,
+            'ttft_p95': percentile(self.ttft, 95) if self.ttft else None,
+        }
+
+
+# ============ Виртуальные посетители ============
+
+def send_message(http, base_url, message, stream, timeout):
+    """
+    Отправляет одно сообщение.
+
+    Returns:
+        (ошибка или None, время до первого токена или None)
+    """
+    payload = {'message': message, 'page_url': '/loadtest/'}
+    if not stream:
+        response = http.post(f'{base_url}/api/chat', json=payload, timeout=timeout)
+        if response.status_code != 200:
+            return f'HTTP {response.status_code}', None
+        data = response.json()
+        if data.get('error'):
+            return 'app error', None
+        # Заглушка FALLBACK_/BUSY_RESPONSE приходит с кодом 200, но это отказ
+        if data.get('fallback'):
+            return 'fallback', None
+        return None, None
+
+    started = time.perf_counter()
+    ttft = None
+    with http.post(f'{base_url}/api/chat/stream', json=payload, timeout=timeout, stream=True) as response:
+        if response.status_code != 200:
+            return f'HTTP {response.status_code}', None
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith('event:'):
+                event = line[6:].strip()
+            elif line.startswith('data:'):
+                if event == 'error':
+                    return 'stream error', None
+                if event == 'done':
+                    if json.loads(line[5:]).get('fallback'):
+                        return 'fallback', None
+                    return None, ttft
+                if ttft is None and 'token' in json.loads(line[5:]):
+                    ttft = time.perf_counter() - started
+            elif not line:
+                event = None
+    return 'stream incomplete', ttft
+
+
+def visitor(base_url, results, deadline, args, rng):
+    """Проходит сценарии до окончания теста."""
+    while time.monotonic() < deadline:
+        script = rng.choice(SCRIPTS)
+        http = requests.Session()
+        for message in script:
+            if time.monotonic() >= deadline:
+                return
+            started = time.perf_counter()
+            try:
+                error, ttft = send_message(http, base_url, message, args.stream, args.timeout)
+            except requests.RequestException as e:
+                error, ttft = type(e).__name__, None
+            results.add(time.perf_counter() - started, error, ttft)
+            # Посетитель читает ответ и печатает следующий вопрос
+            time.sleep(rng.uniform(0.5, 1.5) * args.think)
+        results.session_done()
+
+
+def run_load(base_url, args):
+    """Запускает args.users посетителей на args.duration секунд."""
+    results = Results()
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = []
+    for i in range(args.users):
+        rng = random.Random(args.seed + i)
+        thread = threading.Thread(
+            target=visitor, args=(base_url, results, deadline, args, rng), daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+        # Плавный разгон
+        time.sleep(args.ramp_up / max(1, args.users))
+    for thread in threads:
+        thread.join(args.timeout + args.think * 2)
+    return results.summary(time.monotonic() - started)
+
+
+# ============ Серверы gunicorn ============
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def parse_config(value):
+    """'gthread:2:4' -> (worker_class, workers, threads)."""
+    parts = value.split(':')
+    worker_class = parts[0]
+    workers = int(parts[1]) if len(parts) > 1 else 2
+    threads = int(parts[2]) if len(parts) > 2 else 1
+    return worker_class, workers, threads
+
+
+def server_env(stub_url, workdir, extra):
+    env = dict(os.environ)
+    env.update({
+        'OPENAI_BASE_URL': stub_url,
+        'OPENAI_API_KEY': 'stub',
+        'DATABASE_URL': 'sqlite:///' + os.path.join(workdir, 'loadtest.db'),
+        'RATE_LIMIT_ENABLED': 'false',
+        'RATE_LIMIT_DB': os.path.join(workdir, 'ratelimit.sqlite3'),
+        'KNOWLEDGE_VERSION_FILE': os.path.join(workdir, 'knowledge.version'),
+        'VECTOR_INDEX_FILE': os.path.join(workdir, 'vector_index.npz'),
+        'CHAT_LOG_SAMPLE_RATE': '0',
+        'MAIL_OUTBOX_SENDER': 'false',
+    })
+    env.update(extra)
+    return env
+
+
+def start_server(config, stub_url, extra_env):
+    """Запускает gunicorn с отдельной базой и ждёт готовности."""
+    worker_class, workers, threads = parse_config(config)
+    workdir = tempfile.mkdtemp(prefix='hermitage-loadtest-')
+    env = server_env(stub_url, workdir, extra_env)
+
+    # Таблицы создаём один раз, иначе воркеры создают их наперегонки
+    subprocess.run([sys.executable, '-c', 'import wsgi'], cwd=ROOT, env=env, check=True)
+
+    port = free_port()
+    command = [
+        sys.executable, '-m', 'gunicorn', 'wsgi:app', '-c', 'gunicorn.conf.py',
+        '--bind', f'127.0.0.1:{port}',
+        '--worker-class', worker_class,
+        '--workers', str(workers),
+        '--threads', str(threads),
+    ]
+    if worker_class == 'gevent':
+        command += ['--worker-connections', str(threads)]
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn {config} завершился:\n{process.stderr.read().decode()}')
+        try:
+            requests.get(base_url + '/', timeout=1)
+            return process, base_url, workdir
+        except requests.RequestException:
+            time.sleep(0.3)
+    process.terminate()
+    raise RuntimeError(f'gunicorn {config} не отвечает')
+
+
+def stop_server(process, workdir):
+    process.terminate()
+    try:
+        process.wait(15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ============ Отчёт ============
+
+def print_report(rows):
+    header = (f'{"Конфигурация":<20}{"Req":>7}{"Req/s":>8}{"p50 s":>8}{"p95 s":>8}'
+              f'{"p99 s":>8}{"TTFT95":>8}{"Ошибки":>8}')
+    print()
+    print(header)
+    print('-' * len(header))
+    for name, s in rows:
+        ttft = f'{s["ttft_p95"]:.2f}' if s['ttft_p95'] is not None else '-'
+        print(f'{name:<20}{s["requests"]:>7}{s["throughput"]:>8.2f}{s["p50"]:>8.2f}'
+              f'{s["p95"]:>8.2f}{s["p99"]:>8.2f}{ttft:>8}{s["error_rate"]:>8.1%}')
+        if s['errors']:
+            details = ', '.join(f'{k}: {v}' for k, v in sorted(s['errors'].items()))
+            print(f'{"":<20}{details}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест /api/chat')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', help='Уже запущенный сервер (без автозапуска)')
+    target.add_argument('--compare', nargs='+', metavar='CLASS:WORKERS:THREADS',
+                        default=['gthread:2:4', 'gevent:2:200'],
+                        help='Конфигурации gunicorn (по умолчанию gthread:2:4 gevent:2:200)')
+    parser.add_argument('--users', type=int, default=20, help='Одновременных посетителей')
+    parser.add_argument('--duration', type=float, default=60, help='Длительность, с')
+    parser.add_argument('--ramp-up', type=float, default=5, help='Разгон, с')
+    parser.add_argument('--think', type=float, default=1.0, help='Пауза между сообщениями, с')
+    parser.add_argument('--timeout', type=float, default=60, help='Таймаут запроса, с')
+    parser.add_argument('--stream', action='store_true', help='Тестировать /api/chat/stream')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='Дополнительные переменные окружения для gunicorn')
+    parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    rows = []
+    if args.url:
+        rows.append((args.url, run_load(args.url.rstrip('/'), args)))
+    else:
+        extra_env = dict(item.split('=', 1) for item in args.env)
+        stub, stub_url = start_stub(**stub_settings(args))
+        print(f'Заглушка LLM: {stub_url} (задержка {args.latency:.0f} мс, '
+              f'{args.tokens_per_second:g} ток/с, {args.tokens} токенов)')
+        try:
+            for config in args.compare:
+                print(f'{config}: {args.users} посетителей, {args.duration:g} с ...')
+                process, base_url, workdir = start_server(config, stub_url, extra_env)
+                try:
+                    rows.append((config, run_load(base_url, args)))
+                finally:
+                    stop_server(process, workdir)
+        finally:
+            stub.shutdown()
+
+    print_report(rows)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({name: summary for name, summary in rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
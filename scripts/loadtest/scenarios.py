@@ -0,0 +1,49 @@
+"""
+Сценарии диалогов для нагрузочного теста чатбота
+
+Каждый сценарий - одна сессия посетителя из нескольких сообщений.
+Смесь повторяет реальный трафик: кнопки быстрых ответов (первый вопрос
+часто одинаковый), короткие вопросы о часах работы и адресе, длинные
+консультации по продуктам.
+"""
+
+SCRIPTS = [
+    # Кнопка быстрого ответа и уточнения
+    [
+        'Welche Fliesen eignen sich für ein kleines Bad?',
+        'Und welche Farben machen den Raum größer?',
+        'Haben Sie Großformate im Showroom?',
+    ],
+    # Короткие служебные вопросы
+    [
+        'Hallo',
+        'Wann haben Sie geöffnet?',
+        'Gibt es Parkplätze?',
+    ],
+    # Консультация по ремонту ванной
+    [
+        'Wir planen eine Badsanierung, 8 Quadratmeter, bodengleiche Dusche.',
+        'Welche Fliesen sind rutschfest genug für die Dusche?',
+        'Wie lange dauert die Verlegung ungefähr?',
+        'Bieten Sie auch die Verlegung an oder nur den Verkauf?',
+        'Kann ich einen Beratungstermin am Samstag bekommen?',
+    ],
+    # Вопросы о материалах и уходе
+    [
+        'Was ist der Unterschied zwischen Feinsteinzeug und Keramik?',
+        'Kann man Feinsteinzeug auch draußen auf der Terrasse verlegen?',
+        'Wie reinige ich matte Fliesen am besten?',
+    ],
+    # Интерьер и мебель
+    [
+        'Verkaufen Sie auch Badmöbel?',
+        'Passen Holzoptik-Fliesen zu weißen Möbeln?',
+        'Welche Trends gibt es dieses Jahr bei Küchenfliesen?',
+        'Danke, das hilft mir weiter!',
+    ],
+    # Быстрый вопрос с переходом к лиду
+    [
+        'Wo finde ich Ihren Showroom?',
+        'Können Sie mich zurückrufen? Ich möchte ein Angebot für 40 m² Wohnzimmer.',
+    ],
+]
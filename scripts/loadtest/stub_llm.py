@@ -0,0 +1,218 @@
+"""
+Локальная заглушка OpenAI-совместимого API для нагрузочных тестов
+
+Отвечает на /v1/chat/completions (обычный и потоковый режим) и
+/v1/embeddings с настраиваемой задержкой до первого токена и скоростью
+генерации, поэтому нагрузочный тест меряет наш сервер, а не OpenAI.
+
+Запуск отдельно:
+    python scripts/loadtest/stub_llm.py --port 8100 --latency 400 --tokens-per-second 60
+
+Приложение направляется на заглушку переменными окружения:
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stub
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    'Gerne helfe ich Ihnen bei der Auswahl der passenden Fliesen für Ihr Bad. '
+    'Großformatige Feinsteinzeugfliesen wirken modern und sind pflegeleicht. '
+    'Besuchen Sie unseren Showroom in der Hanauer Landstraße für eine persönliche Beratung.'
+).split()
+
+
+class StubSettings:
+    """Параметры ответа заглушки (общие для всех потоков сервера)."""
+
+    def __init__(self, latency=0.4, tokens_per_second=60.0, tokens=80, error_rate=0.0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def next_request(self):
+        """Номер запроса; каждый 1/error_rate-й завершается ошибкой 500."""
+        with self._lock:
+            self.requests += 1
+            number = self.requests
+        failing = self.error_rate > 0 and number % max(1, round(1 / self.error_rate)) == 0
+        return number, failing
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов в формате OpenAI API."""
+
+    protocol_version = 'HTTP/1.1'
+    settings = StubSettings()
+
+    def log_message(self, format, *args):
+        pass  # Не засоряем вывод нагрузочного теста
+
+    def _json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.path.endswith('/chat/completions'):
+            self._chat(payload)
+        elif self.path.endswith('/embeddings'):
+            self._embeddings(payload)
+        else:
+            self._json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+    def _chat(self, payload):
+        settings = self.settings
+        _, failing = settings.next_request()
+        time.sleep(settings.latency)
+        if failing:
+            self._json(500, {'error': {'message': 'Stub failure', 'type': 'server_error'}})
+            return
+
+        words = [WORDS[i % len(WORDS)] for i in range(settings.tokens)]
+        delay = 1.0 / settings.tokens_per_second if settings.tokens_per_second else 0
+        prompt_tokens = sum(len(m.get('content') or '') for m in payload.get('messages', [])) // 4
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': len(words),
+            'total_tokens': prompt_tokens + len(words),
+        }
+        completion_id = f'chatcmpl-{uuid.uuid4().hex[:12]}'
+        model = payload.get('model', 'stub')
+
+        if not payload.get('stream'):
+            time.sleep(delay * len(words))
+            self._json(200, {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': ' '.join(words)},
+                    'finish_reason': 'stop',
+                }],
+                'usage': usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        def chunk(delta, finish_reason=None, chunk_usage=None):
+            data = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+                if chunk_usage is None else [],
+            }
+            if chunk_usage is not None:
+                data['usage'] = chunk_usage
+            self.wfile.write(f'data: {json.dumps(data)}\n\n'.encode())
+            self.wfile.flush()
+
+        for i, word in enumerate(words):
+            chunk({'content': word if i == 0 else ' ' + word})
+            time.sleep(delay)
+        chunk({}, finish_reason='stop')
+        if (payload.get('stream_options') or {}).get('include_usage'):
+            chunk({}, chunk_usage=usage)
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _embeddings(self, payload):
+        inputs = payload.get('input')
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dim = payload.get('dimensions') or 256
+        data = []
+        for index, text in enumerate(inputs or []):
+            seed = zlib.crc32(str(text).encode())
+            data.append({
+                'object': 'embedding',
+                'index': index,
+                'embedding': [((seed >> (i % 24)) & 0xFF) / 255.0 - 0.5 for i in range(dim)],
+            })
+        self._json(200, {
+            'object': 'list',
+            'data': data,
+            'model': payload.get('model', 'stub'),
+            'usage': {'prompt_tokens': 0, 'total_tokens': 0},
+        })
+
+
+def start_stub(host='127.0.0.1', port=0, **settings):
+    """
+    Запускает заглушку в фоновом потоке.
+
+    Returns:
+        (server, base_url) - server.shutdown() останавливает заглушку
+    """
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'settings': StubSettings(**settings)
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='stub-llm', daemon=True)
+    thread.start()
+    return server, f'http://{host}:{server.server_address[1]}/v1'
+
+
+def add_stub_arguments(parser):
+    """Общие параметры заглушки для CLI."""
+    parser.add_argument('--latency', type=float, default=400,
+                        help='Задержка до первого токена, мс (по умолчанию 400)')
+    parser.add_argument('--tokens-per-second', type=float, default=60,
+                        help='Скорость генерации (по умолчанию 60)')
+    parser.add_argument('--tokens', type=int, default=80,
+                        help='Длина ответа в токенах (по умолчанию 80)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Доля ответов 500 (по умолчанию 0)')
+
+
+def stub_settings(args):
+    return {
+        'latency': args.latency / 1000.0,
+        'tokens_per_second': args.tokens_per_second,
+        'tokens': args.tokens,
+        'error_rate': args.error_rate,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Заглушка OpenAI API для нагрузочных тестов')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_stub(args.host, args.port, **stub_settings(args))
+    print(f'Заглушка запущена: OPENAI_BASE_URL={base_url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
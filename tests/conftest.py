@@ -0,0 +1,34 @@
+"""
+Общие фикстуры: приложение на временной SQLite-базе.
+"""
+
+import pytest
+from config import Config
+from app import create_app, db as _db
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        KNOWLEDGE_VERSION_FILE = str(tmp_path / 'knowledge.version')
+        BLOG_VERSION_FILE = str(tmp_path / 'blog.version')
+        VECTOR_INDEX_FILE = str(tmp_path / 'vector_index.npz')
+        RATE_LIMIT_DB = str(tmp_path / 'ratelimit.sqlite3')
+        PRERENDER_DIR = str(tmp_path / 'prerender')
+        PRERENDER_SERVE = False
+        MAIL_OUTBOX_SENDER = False
+        MAIL_LEAD_DIGEST_DELAY = 0
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        yield app
+        _db.session.remove()
+
+
+@pytest.fixture
+def db(app):
+    return _db
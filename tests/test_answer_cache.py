@@ -0,0 +1,31 @@
+"""
+Кэш ответов первой фразы: сброс при изменении базы знаний и блога.
+"""
+
+from app.services.answer_cache import AnswerCache, answer_cache_version
+from app.services.blog_listing import bump_blog_version
+from app.services.knowledge import bump_knowledge_version
+
+
+def test_normalized_question_hits():
+    cache = AnswerCache()
+    cache.set('Was kostet eine Renovierung?', 'v1', 'Antwort')
+
+    assert cache.get('was kostet eine renovierung', 'v1') == 'Antwort'
+
+
+def test_knowledge_change_invalidates(app):
+    cache = AnswerCache()
+    cache.set('Preise', answer_cache_version(), 'Antwort')
+    bump_knowledge_version()
+
+    assert cache.get('Preise', answer_cache_version()) is None
+
+
+def test_blog_change_invalidates(app):
+    # Ответы ссылаются на статьи блога: после публикации или удаления ссылки устаревают
+    cache = AnswerCache()
+    cache.set('Preise', answer_cache_version(), 'Siehe /blog/alt/')
+    bump_blog_version()
+
+    assert cache.get('Preise', answer_cache_version()) is None
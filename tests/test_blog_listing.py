@@ -0,0 +1,91 @@
+"""
+Keyset-пагинация списков блога.
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from app.models import BlogPost
+from app.services.blog_listing import decode_cursor, encode_cursor, keyset_page
+
+
+def _add_posts(db, count, published_at=None):
+    start = datetime(2025, 1, 1, 10, 30)
+    posts = []
+    for i in range(count):
+        post = BlogPost(
+            slug=f'post-{i}', title=f'Artikel {i}', content='Text', excerpt='Kurz',
+            category='Tipps', is_published=True,
+            published_at=published_at or start + timedelta(hours=i, microseconds=i)
+        )
+        db.session.add(post)
+        posts.append(post)
+    db.session.commit()
+    # От новых к старым, как на странице
+    return sorted(posts, key=lambda p: (p.published_at, p.id), reverse=True)
+
+
+def _cursor(value):
+    return decode_cursor(value)
+
+
+def test_cursor_round_trip():
+    post = BlogPost(id=42, slug='x', title='x', content='x',
+                    published_at=datetime(2025, 1, 2, 10, 30, 0, 123456))
+
+    assert encode_cursor(post) == '20250102103000123456-42'
+    assert decode_cursor(encode_cursor(post)) == (post.published_at, 42)
+
+
+@pytest.mark.parametrize('value', [None, '', 'abc', '20250102-x', '2025-42', '20251340103000000000-1'])
+def test_broken_cursor(value):
+    assert decode_cursor(value) is None
+
+
+def test_first_page(db):
+    posts = _add_posts(db, 5)
+
+    page = keyset_page(BlogPost.listing_query(), 2, total=5)
+
+    assert [p.id for p in page] == [p.id for p in posts[:2]]
+    assert not page.has_prev and page.prev_cursor is None
+    assert page.has_next and decode_cursor(page.next_cursor) == (posts[1].published_at, posts[1].id)
+
+
+def test_walk_forward_and_back(db):
+    posts = _add_posts(db, 5)
+    query = BlogPost.listing_query()
+
+    second = keyset_page(query, 2, after=_cursor(keyset_page(query, 2).next_cursor))
+    assert [p.id for p in second] == [p.id for p in posts[2:4]]
+    assert second.has_prev and second.has_next
+
+    last = keyset_page(query, 2, after=_cursor(second.next_cursor))
+    assert [p.id for p in last] == [posts[4].id]
+    assert last.has_prev and not last.has_next and last.next_cursor is None
+
+    # Назад с последней страницы - снова вторая, в том же порядке
+    back = keyset_page(query, 2, before=_cursor(last.prev_cursor))
+    assert [p.id for p in back] == [p.id for p in posts[2:4]]
+    assert back.has_prev and back.has_next
+
+    first = keyset_page(query, 2, before=_cursor(back.prev_cursor))
+    assert [p.id for p in first] == [p.id for p in posts[:2]]
+    assert not first.has_prev and first.prev_cursor is None
+
+
+def test_same_timestamp_is_ordered_by_id(db):
+    posts = _add_posts(db, 3, published_at=datetime(2025, 3, 1, 12, 0))
+    query = BlogPost.listing_query()
+
+    first = keyset_page(query, 2)
+    rest = keyset_page(query, 2, after=_cursor(first.next_cursor))
+
+    assert [p.id for p in first] + [p.id for p in rest] == [p.id for p in posts]
+
+
+def test_after_last_post_is_empty(db):
+    posts = _add_posts(db, 2)
+
+    page = keyset_page(BlogPost.listing_query(), 2, after=(posts[-1].published_at, posts[-1].id))
+
+    assert page.items == [] and page.has_prev and not page.has_next
@@ -0,0 +1,49 @@
+"""
+Полнотекстовый поиск по блогу (SQLite FTS5).
+"""
+
+from datetime import datetime
+import pytest
+from app.models import BlogPost
+from app.services.blog_search import MAX_QUERY_WORDS, _sqlite_query, highlight, search_posts
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('Fliesen', '"fliesen"*'),
+    ('  Große  Fliesen ', '"große"* "fliesen"*'),
+    # Синтаксис FTS5 посетителя не доходит до MATCH
+    ('bad OR "küche" NEAR(x)', '"bad"* "or"* "küche"* "near"* "x"*'),
+    ('fugen-* ^reinigen', '"fugen"* "reinigen"*'),
+    ('', ''),
+    ('?!', ''),
+])
+def test_sqlite_query(query, expected):
+    assert _sqlite_query(query) == expected
+
+
+def test_sqlite_query_word_limit():
+    words = [f'wort{i}' for i in range(MAX_QUERY_WORDS + 3)]
+    assert _sqlite_query(' '.join(words)).count('*') == MAX_QUERY_WORDS
+
+
+def test_highlight_escapes_html():
+    assert highlight('<b>\x01Fliesen\x02</b>') == '&lt;b&gt;<mark>Fliesen</mark>&lt;/b&gt;'
+
+
+def test_search_posts(db):
+    db.session.add_all([
+        BlogPost(slug='gross', title='Großformatige Fliesen', content='Fliesen im Bad verlegen',
+                 excerpt='', is_published=True, published_at=datetime(2025, 1, 1)),
+        BlogPost(slug='parkett', title='Parkett pflegen', content='Holzboden ölen',
+                 excerpt='', is_published=True, published_at=datetime(2025, 1, 2)),
+        BlogPost(slug='entwurf', title='Fliesen Entwurf', content='Fliesen',
+                 excerpt='', is_published=False),
+    ])
+    db.session.commit()
+
+    total, results = search_posts(db, 'fliese')
+
+    assert total == 1
+    assert results[0]['post'].slug == 'gross'
+    assert '<mark>' in results[0]['snippet']
+    assert search_posts(db, '***') == (0, [])
@@ -0,0 +1,48 @@
+"""
+Условные запросы: валидаторы учитывают выкладку.
+"""
+
+from datetime import datetime, timezone
+from werkzeug.http import http_date
+from app.services import http_cache
+from app.services.http_cache import cached_response, make_etag, not_modified
+
+POST_MODIFIED = datetime(2025, 3, 1, 12, 0)
+
+
+def _timestamp(value):
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def _if_modified_since(app, monkeypatch, release):
+    monkeypatch.setitem(http_cache._release, 'mtime', _timestamp(release))
+    headers = {'If-Modified-Since': http_date(POST_MODIFIED.replace(tzinfo=timezone.utc))}
+    with app.test_request_context(headers=headers):
+        return not_modified('etag', POST_MODIFIED)
+
+
+def test_not_modified_since_content_date(app, monkeypatch):
+    assert _if_modified_since(app, monkeypatch, release=datetime(2025, 1, 1)).status_code == 304
+
+
+def test_deploy_after_content_date_is_modified(app, monkeypatch):
+    # Новые шаблоны после правки статьи: 304 отдал бы HTML прошлой выкладки
+    assert _if_modified_since(app, monkeypatch, release=datetime(2025, 4, 1)) is None
+
+
+def test_last_modified_not_before_release(app, monkeypatch):
+    release = datetime(2025, 4, 1)
+    monkeypatch.setitem(http_cache._release, 'mtime', _timestamp(release))
+    with app.test_request_context():
+        response = cached_response('body', 'etag', POST_MODIFIED)
+
+    assert response.last_modified == release.replace(tzinfo=timezone.utc)
+
+
+def test_etag_changes_with_release(app, monkeypatch):
+    with app.test_request_context():
+        monkeypatch.setitem(app.config, 'RELEASE_ID', 'a')
+        first = make_etag('post', 1)
+        monkeypatch.setitem(app.config, 'RELEASE_ID', 'b')
+
+        assert make_etag('post', 1) != first
@@ -0,0 +1,73 @@
+"""
+Быстрый путь чатбота: распознавание простых вопросов и статистика.
+"""
+
+import pytest
+from app.services.intents import IntentClassifier
+
+
+@pytest.fixture
+def classifier():
+    return IntentClassifier()
+
+
+@pytest.mark.parametrize('message, intents', [
+    ('Hallo!', ['greeting']),
+    ('Wie sind Ihre Öffnungszeiten?', ['opening_hours']),
+    ('Wann habt ihr am Samstag offen?', ['opening_hours']),
+    ('Habt ihr heute auf?', ['opening_hours']),
+    ('Wo seid ihr?', ['address']),
+    ('Wie ist die Adresse?', ['address']),
+    ('Wo finde ich Sie?', ['address']),
+    ('Gibt es Parkplätze?', ['parking']),
+    ('Wie ist Ihre Telefonnummer?', ['phone']),
+    ('Hallo, wie sind die Öffnungszeiten?', ['greeting', 'opening_hours']),
+])
+def test_simple_questions(classifier, message, intents):
+    assert classifier.classify(message) == intents
+
+
+@pytest.mark.parametrize('message', [
+    # Просьба о звонке - это лид, а не вопрос о номере
+    'Können Sie mich anrufen?',
+    'Rufen Sie mich bitte zurück',
+    'Ich hätte gern einen Rückruf',
+    # Вопросы о товарах с «телефонными» и «адресными» словами
+    'Welche Nummer hat die Fliese?',
+    'Wo finde ich Marmor?',
+    'Wo sind die Preise?',
+    'Ist das Parkett auch heute offen verfügbar?',
+    # Нет опорного термина
+    'Wie komme ich an einen Rabatt?',
+    'Nummer?',
+])
+def test_misfires_go_to_llm(classifier, message):
+    assert classifier.classify(message) == []
+    assert classifier.answer(message) is None
+
+
+def test_answer_combines_greeting_and_topic(classifier):
+    answer = classifier.answer('Hallo, wo seid ihr?')
+    assert answer.startswith('Hallo!')
+    assert 'Hanauer Landstraße 421' in answer
+
+
+def test_handled_rate_counts_messages(classifier):
+    classifier.answer('Hallo, wie sind die Öffnungszeiten?')  # два интента
+    classifier.answer('Was kostet eine Badsanierung?')
+
+    stats = classifier.stats()
+    assert stats['hits']['greeting'] == 1
+    assert stats['hits']['opening_hours'] == 1
+    assert stats['handled'] == 1
+    assert stats['fallthrough'] == 1
+    assert stats['handled_rate'] == 0.5
+
+
+def test_quick_response_only_on_first_turn():
+    from app.services.chatbot import ChatbotService
+    chatbot = ChatbotService.__new__(ChatbotService)  # без клиента OpenAI
+
+    assert 'Hanauer Landstraße 421' in chatbot.quick_response('Wo seid ihr?', first_turn=True)
+    # В разговоре «Und wo seid ihr?» может относиться к чему угодно - отвечает LLM
+    assert chatbot.quick_response('Wo seid ihr?', first_turn=False) is None
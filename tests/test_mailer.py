@@ -0,0 +1,74 @@
+"""
+Очередь писем (outbox): сборка писем и отправка пакета.
+"""
+
+import pytest
+from app.models import ChatSession, OutboxMail
+from app.services import mailer
+from app.services.mailer import MailSender, queue_contact_message, queue_lead_notification
+
+
+class FakeSMTP:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, message):
+        self.sent.append(message)
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def smtp(app, monkeypatch):
+    fake = FakeSMTP()
+    monkeypatch.setattr(MailSender, '_connect', lambda self: fake)
+    return fake
+
+
+def _lead(db, session_id, name, email='kunde@example.com'):
+    chat_session = ChatSession(session_id=session_id, user_name=name, user_email=email)
+    db.session.add(chat_session)
+    db.session.flush()
+    queue_lead_notification(chat_session)
+
+
+def test_newline_in_visitor_name(app, db, smtp):
+    queue_contact_message('Eve\r\nBcc: a@b', 'eve@example.com', '', 'Hallo')
+    _lead(db, 's1', 'Eve\nBcc: a@b')
+    db.session.commit()
+
+    sent, failed = MailSender(app.config).send_pending()
+
+    assert (sent, failed) == (2, 0)
+    for message in smtp.sent:
+        assert 'Bcc' not in message
+        assert '\n' not in message['Subject']
+    assert 'Eve Bcc: a@b' in smtp.sent[1]['Subject']
+    assert OutboxMail.query.filter_by(status=OutboxMail.STATUS_PENDING).count() == 0
+
+
+def test_broken_mail_does_not_block_batch(app, db, smtp, monkeypatch):
+    queue_contact_message('Anna', 'anna@example.com', '', 'Frage')
+    _lead(db, 's1', 'Bernd')
+    _lead(db, 's2', 'Kaputt')
+    db.session.commit()
+
+    build_message = mailer.build_message
+
+    def build(group, sender):
+        if any((m.payload or {}).get('name') == 'Kaputt' for m in group):
+            raise ValueError('Header values may not contain linefeed')
+        return build_message(group, sender)
+    monkeypatch.setattr(mailer, 'build_message', build)
+
+    sent, failed = MailSender(app.config).send_pending()
+
+    # Дайджест пересобран без сломанного лида, остальные письма ушли
+    assert (sent, failed) == (2, 1)
+    assert [m['Subject'] for m in smtp.sent] == [
+        'Kontaktanfrage von Anna', 'Neuer Lead aus dem Chat: Bernd'
+    ]
+    broken = OutboxMail.query.filter_by(status=OutboxMail.STATUS_FAILED).one()
+    assert broken.payload['name'] == 'Kaputt' and broken.claim_token is None
+    assert MailSender(app.config).send_pending() == (0, 0)
@@ -0,0 +1,63 @@
+"""
+Отдача пре-рендера: только экспорт текущей выкладки после запуска сервера.
+"""
+
+import json
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+from app.services import prerender
+from app.services.http_cache import get_release_id
+
+
+def _fallback(environ, start_response):
+    return Response('dynamic')(environ, start_response)
+
+
+@pytest.fixture
+def export(app, tmp_path):
+    root = tmp_path / 'prerender'
+    root.mkdir()
+    (root / 'index.html').write_text('static')
+
+    def write(generated_at):
+        manifest = {'release': get_release_id(), 'generated_at': generated_at, 'posts': {}}
+        (root / prerender.MANIFEST).write_text(json.dumps(manifest))
+    return write
+
+
+def _get(app, path='/'):
+    client = Client(prerender.PrerenderMiddleware(_fallback, app))
+    return client.get(path).get_data(as_text=True)
+
+
+def test_export_after_start_is_served(app, export, monkeypatch):
+    monkeypatch.setenv(prerender.STARTED_AT_ENV, '1000')
+    export(2000)
+
+    assert _get(app) == 'static'
+
+
+def test_export_before_start_is_not_served(app, export, monkeypatch):
+    # Экспорт сборки или прошлого запуска: диск мог сброситься без перерисовок
+    monkeypatch.setenv(prerender.STARTED_AT_ENV, '1000')
+    export(500)
+
+    assert _get(app) == 'dynamic'
+    assert prerender.refresh_page('home') == 0
+
+
+def test_export_without_start_time(app, export, monkeypatch):
+    # flask run / CLI: время запуска не задано
+    monkeypatch.delenv(prerender.STARTED_AT_ENV, raising=False)
+    export(500)
+
+    assert _get(app) == 'static'
+
+
+def test_start_prerender_skips_current_export(app, export, monkeypatch):
+    monkeypatch.setenv(prerender.STARTED_AT_ENV, '1000')
+    monkeypatch.setitem(app.config, 'PRERENDER_SERVE', True)
+    export(2000)
+
+    assert prerender.start_prerender() is None
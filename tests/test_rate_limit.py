@@ -0,0 +1,30 @@
+"""
+Лимитер: режим журнала и глобальные слоты LLM.
+"""
+
+from types import SimpleNamespace
+from app.services import rate_limit
+from app.services.openai_client import max_request_seconds
+from app.services.rate_limit import acquire_llm_slot, get_rate_limiter
+
+
+def test_wal_mode(app):
+    conn = get_rate_limiter()._connection()
+
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+
+def test_slot_ttl_covers_slowest_request(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'CHAT_MAX_INFLIGHT', 1)
+    monkeypatch.setenv('OPENAI_TIMEOUT', '60')
+    monkeypatch.setenv('OPENAI_MAX_RETRIES', '2')
+    now = 1000.0
+    monkeypatch.setattr(rate_limit, 'time', SimpleNamespace(time=lambda: now))
+
+    assert acquire_llm_slot()
+    # Запрос с повторами ещё идёт - слот не отбирается
+    now += 150
+    assert acquire_llm_slot() is None
+    # Воркер упал: слот освобождается после худшего времени запроса
+    now += max_request_seconds()
+    assert acquire_llm_slot()
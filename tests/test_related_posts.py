@@ -0,0 +1,81 @@
+"""
+Похожие статьи: top-k по матрице сходства и обновление таблицы.
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from app.models import BlogPost, RelatedPost
+from app.services import related_posts
+from app.services.related_posts import SimilarityMatrix, refresh_related_posts
+
+
+def _post(id, title, content, tags=()):
+    return SimpleNamespace(id=id, title=title, content=content, excerpt='', tags=list(tags))
+
+
+@pytest.fixture
+def matrix():
+    return SimilarityMatrix([
+        _post(1, 'Fliesen im Bad', 'Große Fliesen im Badezimmer verlegen', ['bad']),
+        _post(2, 'Badfliesen reinigen', 'Fliesen im Badezimmer richtig reinigen', ['bad']),
+        _post(3, 'Fliesen in der Küche', 'Fliesen für die Küche auswählen', ['küche']),
+        _post(4, 'Parkett ölen', 'Holzboden pflegen und ölen', ['holz']),
+    ], tag_weight=0.4)
+
+
+def test_top_sorted_without_self(matrix):
+    top = matrix.top(1, 2)
+
+    assert [post_id for post_id, _ in top] == [2, 3]
+    assert top[0][1] > top[1][1] > 0
+
+
+def test_top_skips_unrelated(matrix):
+    # Про паркет нет общих слов и тегов - нулевое сходство не выдаётся
+    assert 4 not in [post_id for post_id, _ in matrix.top(1, 10)]
+    assert matrix.top(4, 3) == []
+
+
+def test_top_k_larger_than_posts(matrix):
+    assert len(matrix.top(2, 10)) == 2
+
+
+def test_tags_raise_score(matrix):
+    assert matrix.score(1, 2) > matrix.score(1, 3)
+    assert matrix.score(1, 2) == pytest.approx(matrix.score(2, 1))
+
+
+def test_single_and_empty():
+    assert SimilarityMatrix([_post(1, 'Fliesen', 'Fliesen')], 0.4).top(1, 3) == []
+    assert SimilarityMatrix([], 0.4).ids == []
+
+
+def _related(post_id):
+    return [r.related_id for r in
+            RelatedPost.query.filter_by(post_id=post_id).order_by(RelatedPost.rank)]
+
+
+def test_refresh_rebuilds_when_due(db, monkeypatch):
+    posts = [
+        BlogPost(slug='a', title='Fliesen im Bad', content='Fliesen Badezimmer', tags=['bad'],
+                 is_published=True, published_at=datetime(2025, 1, 1)),
+        BlogPost(slug='b', title='Badfliesen reinigen', content='Fliesen Badezimmer reinigen', tags=['bad'],
+                 is_published=True, published_at=datetime(2025, 1, 2)),
+    ]
+    db.session.add_all(posts)
+    db.session.commit()
+    monkeypatch.setitem(related_posts._last_rebuild, 'at', None)
+
+    # Первое изменение в процессе - полный пересчёт
+    assert refresh_related_posts(posts[0]) == {posts[0].id, posts[1].id}
+    assert _related(posts[1].id) == [posts[0].id]
+
+    # Дальше - точечно
+    post = BlogPost(slug='c', title='Fliesen Bad Ideen', content='Fliesen Badezimmer Ideen', tags=['bad'],
+                    is_published=True, published_at=datetime(2025, 1, 3))
+    db.session.add(post)
+    db.session.commit()
+    monkeypatch.setattr(related_posts, '_rebuild', lambda: pytest.fail('unexpected rebuild'))
+    assert post.id in refresh_related_posts(post)
+    assert set(_related(post.id)) == {posts[0].id, posts[1].id}
@@ -0,0 +1,54 @@
+"""
+Векторный индекс: точечные обновления и восстановление из БД.
+"""
+
+import pytest
+from app.models import ChatbotInstruction
+from app.services import vector_index
+from app.services.vector_index import VectorIndex, get_embedder, sync_instruction
+
+
+@pytest.fixture
+def instructions(db):
+    items = [
+        ChatbotInstruction(title=f'Frage {i}', content=f'Antwort {i}', keywords=[f'wort{i}'])
+        for i in range(5)
+    ]
+    db.session.add_all(items)
+    db.session.commit()
+    return items
+
+
+def _keys(app):
+    index = VectorIndex.load(app.config['VECTOR_INDEX_FILE'], get_embedder())
+    return sorted(index.keys)
+
+
+def test_update_patches_existing_index(app, db, instructions):
+    vector_index.rebuild_vector_index()
+    instructions[0].is_active = False
+    db.session.commit()
+
+    sync_instruction(instructions[0])
+
+    assert _keys(app) == sorted(f'instruction:{i.id}' for i in instructions[1:])
+
+
+def test_update_without_file_rebuilds_from_db(app, db, instructions):
+    # Файла нет (сброс диска): правка одной записи не оставляет индекс из одной записи
+    instructions[0].title = 'Neue Frage'
+    db.session.commit()
+
+    sync_instruction(instructions[0])
+
+    assert _keys(app) == sorted(f'instruction:{i.id}' for i in instructions)
+
+
+def test_update_with_other_embedder_rebuilds(app, db, instructions, monkeypatch):
+    vector_index.rebuild_vector_index()
+    monkeypatch.setattr(vector_index, 'get_embedder', lambda: vector_index.HashingEmbedder(dim=64))
+
+    sync_instruction(instructions[0])
+
+    index = VectorIndex.load(app.config['VECTOR_INDEX_FILE'], vector_index.HashingEmbedder(dim=64))
+    assert len(index) == len(instructions)